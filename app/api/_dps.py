@@ -1,22 +1,31 @@
 from typing import List, Literal
-from PyPDF2 import PdfReader
-import docx2txt
 from app.crud.roomid_chatid_dict import RoomidChatidDictCRUD
 from app.crud.wechat import WechatMessageCRUD, WechatUserCRUD
-from app.database.db import main_db
+from app.database.db import main_async_db, main_db
+from app.crud.async_crud_base import AsyncCRUDBase
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import models
 from fastapi import Body, Depends, File, HTTPException, UploadFile, status
 from fastapi.security import OAuth2PasswordBearer
-from app.core.security import verify_access_token
+from app.core.security import TokenData, verify_access_token
+from app.service.user_state import user_state_cache
 from sqlalchemy.orm import Session
-from app.service.gingai import GingAIClient, GingAIOptions
+from app.service.gingai import AsyncGingAIClient, GingAIClient, GingAIOptions
 from app.service.user import UserService
 from app.service.verification_code import VerificationCodeService
 from app.crud.user import UserCRUD
-from app.crud.verification_code import VerificationCodeCRUD
+from app.crud.verification_code import (
+    MemoryVerificationCodeStore,
+    VerificationCodeCRUD,
+)
 from langchain_community.utilities import BingSearchAPIWrapper
 from app.core.config import CONFIG
 from app.service.wcf import WcfClient
+from app.service.clients import http_clients
+from app.service.chat_session import ChatIdMap, chat_id_map
+from app.service.wcf_cache import WcfDirectory, wcf_directory
+from app.service.vector_index import MessageVectorIndex, message_index
+from app.service.document import DocumentTooLarge, document_extractor
 from app.schemas.wechat import WechatMessage
 from app.service.wechat import WechatService
 
@@ -29,12 +38,17 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with main_async_db.get_db() as db:
+        yield db
+
+
 def get_user_crud():
     return UserCRUD(models.User)
 
 
 def get_verification_code_crud():
-    return VerificationCodeCRUD(models.VerificationCode)
+    return VerificationCodeService.get_store()
 
 
 def get_user_service(user_crud: UserCRUD = Depends(get_user_crud)):
@@ -42,7 +56,9 @@ def get_user_service(user_crud: UserCRUD = Depends(get_user_crud)):
 
 
 def get_verification_code_service(
-    verification_code_crud: VerificationCodeCRUD = Depends(get_verification_code_crud),
+    verification_code_crud: VerificationCodeCRUD | MemoryVerificationCodeStore = Depends(
+        get_verification_code_crud
+    ),
 ):
     return VerificationCodeService(verification_code_crud)
 
@@ -58,14 +74,37 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     token_data = verify_access_token(token, credentials_exception)
+    # 信任 token 中的用户信息，只检查内存中的封禁/变更列表，不查询数据库
+    if CONFIG.JWT.TRUST_CLAIMS and token_data.role is not None:
+        if not user_state_cache.check(token_data):
+            raise credentials_exception
+        return token_data
     user = user_service.get(db, token_data.id)
     if user is None:
         raise credentials_exception
     return user
 
 
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(OAuth2PasswordBearer(tokenUrl="v1/login/token")),
+):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token 无效",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_data = verify_access_token(token, credentials_exception)
+    user = await AsyncCRUDBase(models.User).get(db, token_data.id)
+    if user is None:
+        raise credentials_exception
+    return user
+
+
 def check_role(required_roles: List[Literal["admin", "user"]]):
-    def role_checker(current_user: models.User = Depends(get_current_user)):
+    def role_checker(
+        current_user: models.User | TokenData = Depends(get_current_user),
+    ):
         if current_user.role not in required_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -79,23 +118,16 @@ def check_role(required_roles: List[Literal["admin", "user"]]):
 def file_to_text(file: UploadFile = File(...)) -> str:
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file uploaded.")
-    if file.size is None or file.size > (1 * 1024 * 1024):  # 1 MB
-        raise HTTPException(status_code=413, detail="File size exceeds 1MB limit.")
+    if file.size is not None and file.size > document_extractor.max_bytes:
+        limit = document_extractor.max_bytes // 1024 // 1024
+        raise HTTPException(
+            status_code=413, detail=f"File size exceeds {limit}MB limit."
+        )
 
-    ext = file.filename.split(".")[-1].lower()
     try:
-        if ext == "pdf":
-            pdf_reader = PdfReader(file.file)
-            text = "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
-        elif ext in ["doc", "docx"]:
-            text = docx2txt.process(file.file)
-        elif ext in ["md", "txt"]:
-            content = file.file.read()
-            if not content.strip():
-                raise ValueError("The file is empty.")
-            text = content.decode("utf-8")
-        else:
-            raise ValueError(f"Unsupported file type: .{ext}")
+        text = document_extractor.extract_text(file.file, file.filename)
+    except DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing file: {e}")
 
@@ -115,7 +147,11 @@ def get_bing_search_wrapper():
 
 
 def get_wcf_client():
-    return WcfClient(CONFIG.WCF.API_BASE)
+    return http_clients.wcf()
+
+
+def get_wcf_directory():
+    return wcf_directory
 
 
 def receive_wechat_message(wechat_message: WechatMessage = Body(...)):
@@ -137,21 +173,25 @@ def get_roomid_chatid_dict_crud():
 def get_gingai_client(options: GingAIOptions | Literal["default"] = "default"):
     def gingai_client_factory():
         if options == "default":
-            return GingAIClient(
-                api_base=CONFIG.GINGAI.API_BASE,
-                api_key=CONFIG.GINGAI.API_KEY,
-                application_id=CONFIG.GINGAI.APP_ID,
-            )
+            return http_clients.gingai()
         else:
-            return GingAIClient(
-                api_base=options.api_base,
-                api_key=options.api_key,
-                application_id=options.application_id,
-            )
+            return http_clients.gingai(options)
 
     return gingai_client_factory
 
 
+def get_chat_id_map():
+    return chat_id_map
+
+
+def get_async_gingai_client():
+    return http_clients.async_gingai()
+
+
+def get_message_index():
+    return message_index
+
+
 def get_wechat_service(
     wechat_message_crud: WechatMessageCRUD = Depends(get_wechat_message_crud),
     wechat_user_crud: WechatUserCRUD = Depends(get_wechat_user_crud),
@@ -160,6 +200,10 @@ def get_wechat_service(
     roomid_chatid_dict_crud: RoomidChatidDictCRUD = Depends(
         get_roomid_chatid_dict_crud
     ),
+    wcf_directory: WcfDirectory = Depends(get_wcf_directory),
+    chat_id_map: ChatIdMap = Depends(get_chat_id_map),
+    async_gingai_client: AsyncGingAIClient | None = Depends(get_async_gingai_client),
+    message_index: MessageVectorIndex | None = Depends(get_message_index),
 ):
     return WechatService(
         wechat_user_crud,
@@ -167,4 +211,8 @@ def get_wechat_service(
         wcf_client,
         gingai_client,
         roomid_chatid_dict_crud,
+        wcf_directory,
+        chat_id_map,
+        async_gingai_client,
+        message_index,
     )
@@ -29,13 +29,13 @@ def login_google_redirect(redirect_uri: str | None = None):
     response_model=security.Token,
     summary="google登录 传入redirect_uri 和 code",
 )
-def login_google(
+async def login_google(
     code: str,
     redirect_uri: str,
     db: Session = Depends(_dps.get_db),
     user_service: UserService = Depends(_dps.get_user_service),
 ):
-    return user_service.login_with_google(db, code, GOOGLE, redirect_uri)
+    return await user_service.login_with_google(db, code, GOOGLE, redirect_uri)
 
 
 # @router.get("/login/google/callback", response_model=security.Token)
@@ -51,13 +51,13 @@ def login_google(
 
 
 @router.post("/login/token", response_model=security.Token, summary="用户名密码登录")
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(_dps.get_db),
     user_service: UserService = Depends(_dps.get_user_service),
 ):
 
-    return user_service.login(db, form_data.username, form_data.password)
+    return await user_service.login(db, form_data.username, form_data.password)
 
 
 @router.post(
@@ -90,7 +90,7 @@ def get_verify_code(
 @router.post(
     "/register", response_model=user_schemas.UserInResponse, summary="用户注册"
 )
-def register_user(
+async def register_user(
     user: user_schemas.UserRegister,
     db: Session = Depends(_dps.get_db),
     user_service: UserService = Depends(_dps.get_user_service),
@@ -98,4 +98,4 @@ def register_user(
         _dps.get_verification_code_service
     ),
 ):
-    return user_service.register_user(db, user, verification_code_service)
+    return await user_service.register_user(db, user, verification_code_service)
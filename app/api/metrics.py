@@ -0,0 +1,84 @@
+import hmac
+from typing import Any, Callable
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.pool import Pool, QueuePool
+from app.core.config import CONFIG
+from app.core.email import email_queue
+from app.core.log import logging_stats
+from app.core.metrics import LabelValues, registry
+from app.core.security import token_cache
+from app.database.db import main_async_db, main_db
+from app.service.wechat import reply_pool
+
+router = APIRouter(tags=["metrics"])
+
+POOLS: dict[str, Pool] = {
+    "main": main_db.engine.pool,
+    "main_async": main_async_db.engine.sync_engine.pool,
+}
+
+COMPONENT_STATS: dict[str, Callable[[], dict[str, Any]]] = {
+    "reply_pool": reply_pool.stats,
+    "email_queue": email_queue.stats,
+    "token_cache": token_cache.stats,
+    "logging": logging_stats,
+}
+
+
+def collect_pool_usage() -> dict[LabelValues, float]:
+    values: dict[LabelValues, float] = {}
+    for name, pool in POOLS.items():
+        if not isinstance(pool, QueuePool):
+            continue
+        values[(name, "size")] = pool.size()
+        values[(name, "checked_in")] = pool.checkedin()
+        values[(name, "checked_out")] = pool.checkedout()
+        values[(name, "overflow")] = max(pool.overflow(), 0)
+    return values
+
+
+def collect_component_stats() -> dict[LabelValues, float]:
+    """各组件 stats() 中的数值项，列表等其他类型的值忽略"""
+    values: dict[LabelValues, float] = {}
+    for component, stats in COMPONENT_STATS.items():
+        for key, value in stats().items():
+            if isinstance(value, (int, float)):
+                values[(component, key)] = value
+    return values
+
+
+registry.gauge(
+    "db_pool_connections",
+    "Database connection pool usage",
+    ["db", "state"],
+).set_function(collect_pool_usage)
+registry.gauge(
+    "app_component_stat",
+    "Numeric stats reported by background components",
+    ["component", "stat"],
+).set_function(collect_component_stats)
+
+
+def check_metrics_token(authorization: str | None):
+    if CONFIG.METRICS.TOKEN is None:
+        return
+    expected = f"Bearer {CONFIG.METRICS.TOKEN}"
+    if authorization is None or not hmac.compare_digest(authorization, expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+        )
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+async def metrics(authorization: str | None = Header(default=None)):
+    check_metrics_token(authorization)
+    # 多进程模式下需要读取其他进程的快照文件
+    body = await run_in_threadpool(registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
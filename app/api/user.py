@@ -1,5 +1,8 @@
+from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.concurrency import run_in_threadpool
 from app.schemas import user_schemas
+from app.schemas.pagination import CountStrategy
 from app.database import models
 from app.service.verification_code import VerificationCodeService
 from . import _dps
@@ -12,7 +15,9 @@ router = APIRouter(prefix="/users", tags=["用户相关"])
 @router.get(
     "/me", response_model=user_schemas.UserInResponse, summary="获取当前用户信息"
 )
-def read_users_me(currernt_user: models.User = Depends(_dps.get_current_user)):
+async def read_users_me(
+    currernt_user: models.User = Depends(_dps.get_current_user_async),
+):
     return currernt_user
 
 
@@ -40,11 +45,26 @@ def read_users(
     keyword: str | None = Query(default=None, description="搜索关键字", max_length=20),
     page: int = Query(1, description="页码", ge=1),
     per_page: int = Query(10, description="每页条数", ge=1, le=100),
+    paginate: Literal["offset", "cursor"] = Query(
+        "offset", description="分页方式，cursor 时忽略 page 并返回 next_cursor"
+    ),
+    cursor: str | None = Query(default=None, description="上一页返回的游标"),
+    count: CountStrategy = Query(
+        "exact", description="总数计算方式：exact/cached/estimated/none"
+    ),
+    search: Literal["like", "fulltext"] = Query(
+        "like",
+        description="搜索方式，fulltext 使用全文索引搜索用户名、昵称和邮箱，"
+        "按相关度排序并使用游标分页",
+    ),
     db: Session = Depends(_dps.get_db),
     user_service: UserService = Depends(_dps.get_user_service),
 ):
-
-    return user_service.search(db, keyword, page, per_page)
+    if search == "fulltext" and keyword:
+        return user_service.search_ranked(db, keyword, cursor, per_page)
+    if paginate == "cursor" or cursor is not None:
+        return user_service.search_by_cursor(db, keyword, cursor, per_page)
+    return user_service.search(db, keyword, page, per_page, count)
 
 
 @router.post(
@@ -52,18 +72,22 @@ def read_users(
     response_model=user_schemas.UserInResponse,
     summary="修改当前用户密码",
 )
-def update_my_password(
+async def update_my_password(
     req: user_schemas.UserChangePassword,
     db: Session = Depends(_dps.get_db),
     current_user: user_schemas.User = Depends(_dps.get_current_user),
     user_service: UserService = Depends(_dps.get_user_service),
 ):
-    if req.old_password != current_user.password:
+    # 信任 token 时 current_user 不包含密码，需要读取完整的用户记录
+    current_user = await run_in_threadpool(user_service.get, db, current_user.id)
+    if not await user_service.verify_password(
+        req.old_password, str(current_user.password)
+    ):
         raise HTTPException(status_code=400, detail="Old password is incorrect.")
     if req.old_password == req.new_password:
         raise HTTPException(
             status_code=400, detail="New password cannot be the same as old password."
         )
-    return user_service.update(
+    return await user_service.update(
         db, current_user.id, user_schemas.UserUpdate(password=req.new_password)
     )
@@ -6,21 +6,129 @@ from app.service.verification_code import VerificationCodeService
 from app.service.wechat import WechatService
 from . import _dps
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
 from app.service.user import UserService
 from app.service.wcf import WcfClient
 import logging
 from app.service.gingai import GingAIClient
+from app.core.config import CONFIG
+from app.core.log import log_payload
+from app.core.metrics import messages_received
+from app.service.wechat import reply_pool
+from app.service.vector_index import message_index
 
 router = APIRouter(prefix="/wechat", tags=["wechat"])
 
+logger = logging.getLogger(__name__)
+
 
 @router.post("/webhook", summary="微信webhook")
-def webhook(
+async def webhook(
     message: wechat.WechatMessage = Depends(_dps.receive_wechat_message),
     wechat_service: WechatService = Depends(_dps.get_wechat_service),
-    db: Session = Depends(_dps.get_db),
+    db: AsyncSession = Depends(_dps.get_async_db),
 ):
-    logging.info(f"receive wechat message: {message.model_dump(exclude={'xml'})}")
-    wechat_service.save_message(db, wechat.WechatMessageCreate(**message.model_dump()))
-    wechat_service.bot_reply_process(db, message)
+    log_payload(
+        logger,
+        "receive wechat message: %s",
+        build=lambda: message.model_dump(exclude={"xml"}),
+    )
+    messages_received.inc(type=message.type.name)
+    needs_reply = True
+    if CONFIG.WEBHOOK.BUFFER_MESSAGES:
+        # is_at_bot 在缓存未命中时会同步请求 WCF，不能在事件循环中执行
+        try:
+            needs_reply = await run_in_threadpool(wechat_service.needs_reply, message)
+        except Exception as e:
+            # 无法判断时按需要回复处理，同步入库，保证消息不丢
+            logger.warning(f"Failed to check whether message needs reply: {e}")
+    await wechat_service.save_message_async(
+        db,
+        wechat.WechatMessageCreate(**message.model_dump()),
+        buffered=not needs_reply,
+    )
+    if CONFIG.WEBHOOK.ASYNC_REPLY:
+        wechat_service.submit_bot_reply(message)
+    else:
+        await run_in_threadpool(wechat_service.bot_reply_in_new_session, message)
     return {"message": "ok"}
+
+
+@router.get(
+    "/reply-queue",
+    dependencies=[Depends(_dps.check_role(["admin"]))],
+    summary="机器人回复队列状态",
+)
+def reply_queue_stats():
+    return reply_pool.stats()
+
+
+@router.get(
+    "/rooms/{roomid}/messages",
+    response_model=wechat.WechatMessagesResponse,
+    dependencies=[Depends(_dps.check_role(["admin"]))],
+    summary="获取群聊消息记录",
+)
+def read_room_messages(
+    roomid: str = Path(..., description="群聊ID"),
+    start_ts: int | None = Query(default=None, description="起始时间戳（秒，包含）"),
+    end_ts: int | None = Query(default=None, description="结束时间戳（秒，不包含）"),
+    sender: str | None = Query(default=None, description="发送者wxid"),
+    cursor: str | None = Query(default=None, description="上一页返回的游标"),
+    limit: int = Query(50, description="每页条数", ge=1, le=200),
+    db: Session = Depends(_dps.get_db),
+    wechat_service: WechatService = Depends(_dps.get_wechat_service),
+):
+    return wechat_service.list_room_messages(
+        db, roomid, start_ts, end_ts, sender, cursor, limit
+    )
+
+
+@router.get(
+    "/messages/search",
+    response_model=wechat.WechatMessageSearchResponse,
+    dependencies=[Depends(_dps.check_role(["admin"]))],
+    summary="全文搜索消息记录",
+)
+def search_messages(
+    q: str = Query(..., description="搜索内容", min_length=1),
+    roomid: str | None = Query(default=None, description="群聊ID"),
+    sender: str | None = Query(default=None, description="发送者wxid"),
+    start_ts: int | None = Query(default=None, description="起始时间戳（秒，包含）"),
+    end_ts: int | None = Query(default=None, description="结束时间戳（秒，不包含）"),
+    cursor: str | None = Query(default=None, description="上一页返回的游标"),
+    limit: int = Query(20, description="每页条数", ge=1, le=100),
+    db: Session = Depends(_dps.get_db),
+    wechat_service: WechatService = Depends(_dps.get_wechat_service),
+):
+    return wechat_service.search_messages(
+        db, q, roomid, sender, start_ts, end_ts, cursor, limit
+    )
+
+
+@router.get(
+    "/messages/similar",
+    response_model=list[wechat.ScoredWechatMessage],
+    dependencies=[Depends(_dps.check_role(["admin"]))],
+    summary="按语义搜索相似的历史消息",
+)
+def search_similar_messages(
+    q: str = Query(..., description="搜索内容", min_length=1),
+    roomid: str | None = Query(default=None, description="只搜索该群聊的消息"),
+    k: int = Query(10, description="返回条数", ge=1, le=100),
+    db: Session = Depends(_dps.get_db),
+    wechat_service: WechatService = Depends(_dps.get_wechat_service),
+):
+    return wechat_service.search_similar_messages(db, q, roomid, k)
+
+
+@router.get(
+    "/messages/similar/stats",
+    dependencies=[Depends(_dps.check_role(["admin"]))],
+    summary="向量索引状态",
+)
+def message_index_stats():
+    if message_index is None:
+        raise HTTPException(status_code=404, detail="Vector index is disabled")
+    return message_index.stats()
@@ -1,4 +1,4 @@
-from typing import Any, Dict
+from typing import Any, Dict, Literal
 from pydantic import BaseModel
 import yaml
 
@@ -9,12 +9,21 @@ class MYSQLSettings(BaseModel):
     USER: str
     PASSWORD: str
     DATABASE: str
+    PARTITION_WECHAT_MESSAGE: bool = False  # wechat_message 表按月对 ts 做范围分区
+    PARTITION_MONTHS_AHEAD: int = 3  # 提前创建的未来月份分区数
+    ASYNC_DRIVER: str = "aiomysql"  # 异步引擎使用的驱动
+    FULLTEXT_WECHAT_MESSAGE: bool = False  # content 建立 ngram 全文索引，不能与分区同时开启
+    FULLTEXT_USERS: bool = False  # users 的用户名、昵称、邮箱建立 ngram 全文索引
+    ASYNC_URL: str | None = None  # 覆盖异步引擎连接串，例如测试时 sqlite+aiosqlite:///./test.db
 
 
 class JWTSettings(BaseModel):
     SECRET_KEY: str
     ALGORITHM: str
     EXPIRE_MINUTES: int
+    TRUST_CLAIMS: bool = False  # 直接信任 token 中的用户信息，不再每次请求查询 users 表
+    STATE_REFRESH_INTERVAL: float = 5  # 信任 token 时，封禁/角色变更的同步间隔（秒）
+    CACHE_SIZE: int = 4096  # 已验证 token 的缓存数量，0 表示不缓存
 
 
 class AppSettings(BaseModel):
@@ -29,6 +38,13 @@ class EmailSettings(BaseModel):
     USER: str
     PASSWORD: str
     FROM: str
+    POOL_SIZE: int = 2  # SMTP 长连接数，同时也是发送线程数
+    TIMEOUT: float = 30  # SMTP 连接和发送超时时间（秒）
+    IDLE_CHECK: float = 60  # 连接空闲超过该时间（秒）后，使用前先检查连接是否可用
+    QUEUE_SIZE: int = 1000  # 待发送邮件队列长度上限
+    SEND_RETRIES: int = 3  # 发送失败后的重试次数
+    RETRY_BACKOFF: float = 2  # 第一次重试前的等待时间（秒），之后每次翻倍
+    DRAIN_TIMEOUT: float = 10  # 停机时等待邮件发送完毕的最长时间（秒）
 
 
 class BingSettings(BaseModel):
@@ -49,12 +65,109 @@ class GOOGLESettings(BaseModel):
 
 class WCFSettings(BaseModel):
     API_BASE: str
+    CACHE_TTL: float = 300  # 机器人信息、联系人、群成员缓存有效期（秒）
+    CACHE_REFRESH_INTERVAL: float = 30  # 后台刷新检查间隔（秒）
 
 
 class GingAISettings(BaseModel):
     API_BASE: str
     API_KEY: str
     APP_ID: str
+    STREAM: bool = False  # 使用流式接口，按句子分段发送回复
+    STREAM_MIN_SEGMENT: int = 30  # 分段发送时每段的最小字数
+    STREAM_MAX_SEGMENT: int = 500  # 没有遇到句子结尾时，超过该字数也会发送
+    CHAT_ID_CACHE_SIZE: int = 10000  # 内存中缓存的 roomid -> chat_id 数量
+
+
+class HTTPClientSettings(BaseModel):
+    POOL_CONNECTIONS: int = 10  # 连接池缓存的主机数
+    POOL_MAXSIZE: int = 20  # 每个主机保持长连接的最大数量
+    POOL_BLOCK: bool = False  # 为 True 时 POOL_MAXSIZE 同时是每个主机的并发连接上限
+    TIMEOUT: float = 60  # 请求超时时间（秒）
+    MAX_CONNECTIONS: int = 100  # 异步客户端的并发连接上限
+    KEEPALIVE_EXPIRY: float = 30  # 异步客户端空闲长连接的保持时间（秒）
+
+
+class PasswordSettings(BaseModel):
+    BCRYPT_ROUNDS: int = 12  # bcrypt 成本因子，调高后旧密码会在登录成功时重新哈希
+    EXECUTOR: Literal["thread", "process"] = "thread"  # 哈希计算使用的执行器
+    WORKERS: int = 2  # 哈希计算的线程/进程数
+    MAX_PENDING: int = 32  # 排队中的哈希任务上限，超过时直接拒绝
+
+
+class VerificationCodeSettings(BaseModel):
+    BACKEND: Literal["database", "memory"] = "database"  # memory 仅适用于单进程部署
+    EXPIRE_MINUTES: int = 5  # 验证码有效期（分钟）
+    RESEND_INTERVAL: int = 60  # 同一邮箱两次发送验证码的最小间隔（秒）
+    PURGE_INTERVAL: int = 600  # 清理过期和已使用验证码的间隔（秒）
+
+
+class VectorIndexSettings(BaseModel):
+    ENABLED: bool = False  # 为微信消息建立本地向量索引，并在回复时附带相关历史消息
+    PATH: str = "./data/wechat_message.faiss"  # 索引文件路径
+    EMBEDDER: str = "hashing"  # hashing 或 "模块路径:工厂函数"，工厂函数接收 DIM 参数
+    DIM: int = 256  # 向量维度
+    MMAP: bool = True  # 以 mmap 方式加载索引文件
+    BATCH_SIZE: int = 64  # 每批向量化的消息数
+    FLUSH_INTERVAL: float = 2  # 新消息批量加入索引的间隔（秒）
+    SAVE_INTERVAL: float = 60  # 索引保存到磁盘的间隔（秒），也是其他进程看到新消息的最大延迟
+    SYNC_INTERVAL: float = 10  # 从数据库补齐、检查索引文件更新的间隔（秒）
+    BACKFILL_OVERLAP: int = 60  # 从数据库补齐时向前多读的秒数
+    MAX_PENDING: int = 10000  # 待加入索引的消息数上限
+    CONTEXT_TOP_K: int = 3  # 回复时附带的相关历史消息数，0 表示不附带
+    CONTEXT_MIN_SCORE: float = 0.3  # 相关历史消息的最低相似度
+
+
+class DocumentSettings(BaseModel):
+    MAX_BYTES: int = 20 * 1024 * 1024  # 上传文档大小上限（字节）
+    MAX_PAGES: int = 500  # PDF 最多解析的页数
+    PAGE_TIMEOUT: float = 10  # PDF 单页解析超时时间（秒）
+    WORKERS: int = 2  # 解析 PDF 的进程数
+    SPOOL_DIR: str | None = None  # 上传文件临时目录，默认使用系统临时目录
+    CACHE_ENABLED: bool = True  # 按文件内容的 SHA-256 缓存提取结果
+    CACHE_DIR: str = "./data/extraction_cache"  # 提取结果缓存目录
+    CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 缓存总大小上限（字节），超过时淘汰最久未使用的
+
+
+class LogSettings(BaseModel):
+    LEVEL: str = "INFO"  # 日志级别
+    QUEUE: bool = True  # 日志先进入队列，由独立线程格式化并写入
+    QUEUE_SIZE: int = 10000  # 日志队列长度上限，队列满时丢弃新日志
+    JSON: bool = False  # 日志文件使用 JSON Lines 格式（logs/log.jsonl）
+    PAYLOAD_RATE: float = 5  # 消息内容、请求数据等大体积日志每个调用位置每秒的条数上限
+    PAYLOAD_BURST: int = 20  # 大体积日志允许的突发条数
+    PAYLOAD_SAMPLE_RATE: float = 1.0  # 大体积日志的采样比例（0~1）
+
+
+class MetricsSettings(BaseModel):
+    ENABLED: bool = True  # 是否提供 /metrics 接口
+    TOKEN: str | None = None  # 设置后 /metrics 需要携带 Authorization: Bearer <TOKEN>
+    MULTIPROCESS_DIR: str | None = None  # 多 worker 部署时的指标快照目录，启动前需清空
+    SNAPSHOT_INTERVAL: float = 5  # 多 worker 部署时写入指标快照的间隔（秒）
+
+
+class TracingSettings(BaseModel):
+    ENABLED: bool = True  # 为每个请求记录 span，并在日志中带上请求 ID
+    SLOW_REQUEST_MS: float = 1000  # 耗时超过该值（毫秒）的请求记录带 span 树的日志，0 表示不记录
+    MAX_SPANS: int = 500  # 单个请求最多记录的 span 数
+    EXPORT_PATH: str | None = None  # 以 OTLP/JSON 格式导出 trace 的文件路径，None 表示不导出
+    EXPORT_SAMPLE_RATE: float = 1.0  # 导出比例（0~1），慢请求总是导出
+    EXPORT_QUEUE_SIZE: int = 1000  # 待导出的 trace 数上限，超过时丢弃
+
+
+class PaginationSettings(BaseModel):
+    COUNT_CACHE_TTL: float = 30  # count=cached 时总数的缓存时间（秒）
+
+
+class WebhookSettings(BaseModel):
+    ASYNC_REPLY: bool = True  # 入库后立即返回，机器人回复交给后台线程池处理
+    REPLY_WORKERS: int = 4  # 回复线程数
+    REPLY_QUEUE_SIZE: int = 1000  # 回复队列长度上限，队列满时丢弃新的回复任务
+    REPLY_QUEUE_SIZE_PER_KEY: int = 50  # 单个群（私聊为单个发送者）的回复队列长度上限
+    DRAIN_TIMEOUT: float = 30  # 停机时等待队列排空的最长时间（秒）
+    BUFFER_MESSAGES: bool = True  # 不需要回复的消息先写入内存缓冲区，批量入库
+    BUFFER_MAX_SIZE: int = 200  # 缓冲区达到该条数时立即批量写入
+    BUFFER_FLUSH_INTERVAL: float = 1  # 缓冲区定时写入间隔（秒）
 
 
 class AppConfig(BaseModel):
@@ -66,6 +179,16 @@ class AppConfig(BaseModel):
     GOOGLE: GOOGLESettings
     WCF: WCFSettings
     GINGAI: GingAISettings
+    WEBHOOK: WebhookSettings = WebhookSettings()
+    HTTP_CLIENT: HTTPClientSettings = HTTPClientSettings()
+    PAGINATION: PaginationSettings = PaginationSettings()
+    PASSWORD: PasswordSettings = PasswordSettings()
+    VERIFICATION_CODE: VerificationCodeSettings = VerificationCodeSettings()
+    VECTOR_INDEX: VectorIndexSettings = VectorIndexSettings()
+    DOCUMENT: DocumentSettings = DocumentSettings()
+    LOG: LogSettings = LogSettings()
+    METRICS: MetricsSettings = MetricsSettings()
+    TRACING: TracingSettings = TracingSettings()
 
     @classmethod
     def from_yaml(cls, file_path: str):
@@ -1,101 +1,64 @@
 import logging
+import queue
+import secrets
 import smtplib
-import random
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from string import Template
+from typing import Iterator, Optional
+from app.core.config import CONFIG
+from app.core.tracing import current_request_id, span, tracer
+from app.core.worker import WorkerPool
 
+logger = logging.getLogger(__name__)
 
-class EmailVerification:
-    def __init__(
-        self,
-        smtp_server: str,
-        smtp_port: int,
-        sender_email: str,
-        sender_password: str,
-    ):
-        self.smtp_server = smtp_server
-        self.smtp_port = smtp_port
-        self.sender_email = sender_email
-        self.sender_password = sender_password
-        self.verification_code: Optional[str] = None
-        self.server: Optional[smtplib.SMTP] = None
-
-        # 初始化时创建 SMTP 连接
-        self._connect()
-
-    def _connect(self):
-        """创建并初始化 SMTP 连接"""
-        try:
-            self.server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-            self.server.login(self.sender_email, self.sender_password)
-            logging.info("SMTP connection established.")
-        except Exception as e:
-            logging.error(f"Failed to establish SMTP connection: {e}")
-            raise
-
-    def __del__(self):
-        """析构时关闭 SMTP 连接"""
-        if self.server:
-            try:
-                self.server.quit()
-                logging.info("SMTP connection closed.")
-            except Exception as e:
-                logging.error(f"Failed to close SMTP connection: {e}")
-
-    def generate_verification_code(self):
-        """生成 4 位验证码"""
-        self.verification_code = "".join([str(random.randint(0, 9)) for _ in range(4)])
-        return self.verification_code
-
-    def send_verification_email(self, receiver_email: str) -> bool:
-        """发送验证码邮件"""
-        if not self.verification_code:
-            self.generate_verification_code()
 
-        subject = "Your Verification Code"
-
-        # HTML 邮件内容
-        html_content = f"""
+# 模板只在导入时解析一次，发送时只替换验证码
+VERIFICATION_SUBJECT = "Your Verification Code"
+VERIFICATION_TEMPLATE = Template(
+    """
         <html>
         <head>
             <style>
-                body {{
+                body {
                     font-family: Arial, sans-serif;
                     background-color: #f4f4f4;
                     padding: 20px;
-                }}
-                .email-container {{
+                }
+                .email-container {
                     background-color: #ffffff;
                     padding: 20px;
                     border-radius: 8px;
                     box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
                     max-width: 600px;
                     margin: 0 auto;
-                }}
-                .email-header {{
+                }
+                .email-header {
                     font-size: 24px;
                     color: #333333;
                     text-align: center;
                     margin-bottom: 20px;
-                }}
-                .email-body {{
+                }
+                .email-body {
                     font-size: 16px;
                     color: #555555;
                     text-align: center;
-                }}
-                .verification-code {{
+                }
+                .verification-code {
                     font-size: 32px;
                     font-weight: bold;
                     color: #28a745;
                     margin: 20px 0;
-                }}
-                .email-footer {{
+                }
+                .email-footer {
                     font-size: 14px;
                     color: #888888;
                     text-align: center;
                     margin-top: 20px;
-                }}
+                }
             </style>
         </head>
         <body>
@@ -103,8 +66,8 @@ class EmailVerification:
                 <div class="email-header">Your Verification Code</div>
                 <div class="email-body">
                     <p>Please use the following verification code to complete your request:</p>
-                    <div class="verification-code">{self.verification_code}</div>
-                    <p>This code will expire in 5 minutes.</p>
+                    <div class="verification-code">$code</div>
+                    <p>This code will expire in $expire_minutes minutes.</p>
                 </div>
                 <div class="email-footer">
                     <p>If you did not request this code, please ignore this email.</p>
@@ -113,28 +76,248 @@ class EmailVerification:
         </body>
         </html>
         """
+)
+
+
+def generate_verification_code() -> str:
+    """生成 4 位验证码"""
+    return "".join(str(secrets.randbelow(10)) for _ in range(4))
 
-        # 创建 MIMEMultipart 对象
-        msg = MIMEMultipart()
-        msg["From"] = self.sender_email
-        msg["To"] = receiver_email
-        msg["Subject"] = subject
 
-        # 添加 HTML 内容
-        msg.attach(MIMEText(html_content, "html"))
+def render_verification_email(
+    sender_email: str, receiver_email: str, code: str
+) -> str:
+    """渲染验证码邮件，返回可直接发送的邮件内容"""
+    msg = MIMEMultipart()
+    msg["From"] = sender_email
+    msg["To"] = receiver_email
+    msg["Subject"] = VERIFICATION_SUBJECT
+    body = VERIFICATION_TEMPLATE.substitute(
+        code=code, expire_minutes=CONFIG.VERIFICATION_CODE.EXPIRE_MINUTES
+    )
+    msg.attach(MIMEText(body, "html"))
+    return msg.as_string()
+
+
+class _PooledConnection:
+    def __init__(self):
+        self.server: Optional[smtplib.SMTP] = None
+        self.used_at = 0.0
 
+
+class SMTPConnectionPool:
+    """
+    SMTP_SSL 长连接池，连接按需建立并复用。
+    空闲较久的连接在使用前用 NOOP 检查，断开的连接自动重连。
+    """
+
+    def __init__(
+        self,
+        smtp_server: str,
+        smtp_port: int,
+        sender_email: str,
+        sender_password: str,
+        size: int = 2,
+        timeout: float = 30,
+        idle_check: float = 60,
+    ):
+        """
+        初始化 SMTPConnectionPool。
+
+        :param size: 连接数上限，同时也是并发发送数上限。
+        :param timeout: 连接和发送超时时间（秒）。
+        :param idle_check: 连接空闲超过该时间（秒）后，使用前先发送 NOOP 检查。
+        """
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._idle: queue.LifoQueue[_PooledConnection] = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(_PooledConnection())
+
+    def _connect(self) -> smtplib.SMTP:
+        """创建并登录 SMTP 连接"""
+        server = smtplib.SMTP_SSL(
+            self.smtp_server, self.smtp_port, timeout=self.timeout
+        )
+        try:
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        logger.info("SMTP connection established.")
+        return server
+
+    @staticmethod
+    def _close(conn: _PooledConnection):
+        if conn.server is None:
+            return
         try:
-            # 发送邮件
-            if self.server:
-                self.server.sendmail(self.sender_email, receiver_email, msg.as_string())
-                logging.info(
-                    f"Email sent to {receiver_email} - [{self.verification_code}]"
+            conn.server.quit()
+        except Exception:
+            conn.server.close()
+        conn.server = None
+
+    def _ensure_alive(self, conn: _PooledConnection):
+        idle = time.monotonic() - conn.used_at
+        if conn.server is not None and idle > self.idle_check:
+            try:
+                if conn.server.noop()[0] != 250:
+                    self._close(conn)
+            except (smtplib.SMTPException, OSError):
+                conn.server.close()
+                conn.server = None
+        if conn.server is None:
+            conn.server = self._connect()
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        """取出一个可用连接，用完后放回连接池；发生异常时丢弃该连接"""
+        conn = self._idle.get()
+        try:
+            self._ensure_alive(conn)
+            assert conn.server is not None
+            yield conn.server
+            conn.used_at = time.monotonic()
+        except Exception:
+            self._close(conn)
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def sendmail(self, receiver_email: str, message: str):
+        """
+        发送邮件。连接在发送前已断开时重连后再试一次，其他错误直接抛出。
+        """
+        try:
+            with self.connection() as server:
+                server.sendmail(self.sender_email, receiver_email, message)
+        except smtplib.SMTPServerDisconnected:
+            with self.connection() as server:
+                server.sendmail(self.sender_email, receiver_email, message)
+
+    def close(self):
+        """关闭所有空闲连接"""
+        conns = []
+        while True:
+            try:
+                conns.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for conn in conns:
+            self._close(conn)
+            self._idle.put(conn)
+        logger.info("SMTP connections closed.")
+
+
+class EmailQueue:
+    """
+    后台发送邮件的队列，失败时按指数退避重试。
+    """
+
+    def __init__(
+        self,
+        smtp_pool: SMTPConnectionPool,
+        workers: int = 2,
+        queue_size: int = 1000,
+        retries: int = 3,
+        retry_backoff: float = 2,
+    ):
+        """
+        初始化 EmailQueue。
+
+        :param smtp_pool: 发送邮件使用的连接池。
+        :param workers: 发送线程数，不应超过连接池大小。
+        :param queue_size: 排队邮件数上限。
+        :param retries: 首次发送失败后的重试次数。
+        :param retry_backoff: 第一次重试前的等待时间（秒），之后每次翻倍。
+        """
+        self.smtp_pool = smtp_pool
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._pool = WorkerPool("email", workers, queue_size)
+        self._stopping = threading.Event()
+
+    def _send(
+        self,
+        receiver_email: str,
+        message: str,
+        description: str,
+        request_id: str | None = None,
+    ):
+        with tracer.trace("email.send", request_id):
+            self._send_with_retries(receiver_email, message, description)
+
+    def _send_with_retries(self, receiver_email: str, message: str, description: str):
+        for attempt in range(self.retries + 1):
+            try:
+                with span("smtp.sendmail", attempt=attempt):
+                    self.smtp_pool.sendmail(receiver_email, message)
+                logger.info(f"Email sent to {receiver_email} - [{description}]")
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    logger.error(
+                        f"Failed to send email to {receiver_email} "
+                        f"after {attempt + 1} attempts: {e}"
+                    )
+                    return
+                delay = self.retry_backoff * 2**attempt
+                logger.warning(
+                    f"Failed to send email to {receiver_email}: {e}, "
+                    f"retry in {delay}s"
                 )
-                return True
-            logging.error(
-                f"Failed to send email to {receiver_email}: Server not connected"
-            )
-            return False
-        except Exception as e:
-            logging.error(f"Failed to send email to {receiver_email}: {e}")
-            return False
+                # 停机时不再等待退避，直接重试剩余次数
+                self._stopping.wait(delay)
+
+    def submit(self, receiver_email: str, message: str, description: str = "") -> bool:
+        """
+        提交一封邮件。
+
+        :param message: 完整的邮件内容。
+        :param description: 写入日志的说明。
+        :return: 是否进入队列，未启动或队列已满时返回 False。
+        """
+        return self._pool.submit(
+            self._send, receiver_email, message, description, current_request_id()
+        )
+
+    def send_verification_code(self, receiver_email: str, code: str) -> bool:
+        """提交一封验证码邮件"""
+        message = render_verification_email(
+            self.smtp_pool.sender_email, receiver_email, code
+        )
+        return self.submit(receiver_email, message, code)
+
+    def start(self):
+        self._stopping.clear()
+        self._pool.start()
+
+    def shutdown(self, timeout: float | None = None):
+        """等待队列中的邮件发送完毕，然后关闭连接"""
+        self._stopping.set()
+        self._pool.shutdown(timeout)
+        self.smtp_pool.close()
+
+    def stats(self):
+        return self._pool.stats()
+
+
+email_queue = EmailQueue(
+    SMTPConnectionPool(
+        CONFIG.EMAIL.HOST,
+        CONFIG.EMAIL.PORT,
+        CONFIG.EMAIL.USER,
+        CONFIG.EMAIL.PASSWORD,
+        size=CONFIG.EMAIL.POOL_SIZE,
+        timeout=CONFIG.EMAIL.TIMEOUT,
+        idle_check=CONFIG.EMAIL.IDLE_CHECK,
+    ),
+    workers=CONFIG.EMAIL.POOL_SIZE,
+    queue_size=CONFIG.EMAIL.QUEUE_SIZE,
+    retries=CONFIG.EMAIL.SEND_RETRIES,
+    retry_backoff=CONFIG.EMAIL.RETRY_BACKOFF,
+)
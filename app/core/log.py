@@ -1,17 +1,158 @@
+import copy
+import json
 import logging
+import queue
+import random
+import threading
+import time
 import colorlog
 import os
-from logging.handlers import RotatingFileHandler
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Hashable
+from app.core.config import CONFIG
+
+
+# 当前请求的 ID，由 TracingMiddleware 设置，后台任务沿用提交时的请求 ID
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+class RequestIdFilter(logging.Filter):
+    """在日志记录上添加 request_id 字段，需要挂在产生日志的线程中执行的 handler 上"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    队列满时丢弃日志而不是阻塞或抛出异常，保证请求线程不会被日志拖慢。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只合并参数并保留异常文本，格式化交给写入线程中的各个 handler
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class PayloadLimiter:
+    """
+    大体积日志（请求、消息内容等）的采样和限流。
+    按调用位置分别计数，每个位置每秒最多 rate 条，允许 burst 条突发。
+    """
+
+    def __init__(self, rate: float = 5, burst: int = 20, sample_rate: float = 1.0):
+        """
+        初始化 PayloadLimiter。
+
+        :param rate: 每个调用位置每秒允许的条数，0 表示不限流。
+        :param burst: 令牌桶容量。
+        :param sample_rate: 采样比例（0~1），在限流之前生效。
+        """
+        self.rate = rate
+        self.burst = burst
+        self.sample_rate = sample_rate
+        self.suppressed = 0
+        self._buckets: dict[Hashable, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: Hashable) -> bool:
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.suppressed += 1
+                return False
+            self._buckets[key] = (tokens - 1, now)
+            return True
+
+
+payload_limiter = PayloadLimiter(
+    rate=CONFIG.LOG.PAYLOAD_RATE,
+    burst=CONFIG.LOG.PAYLOAD_BURST,
+    sample_rate=CONFIG.LOG.PAYLOAD_SAMPLE_RATE,
+)
+
+
+def log_payload(
+    logger: logging.Logger,
+    msg: str,
+    *args: Any,
+    build: Callable[[], Any],
+    level: int = logging.INFO,
+):
+    """
+    记录包含大体积内容的日志。
+    只有在日志级别开启且未被采样/限流丢弃时才调用 build 生成内容。
+
+    :param msg: % 格式的日志模板，build 的结果作为最后一个参数。
+    :param build: 生成日志内容的函数，例如 lambda: message.model_dump()。
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if not payload_limiter.allow((logger.name, msg)):
+        return
+    logger.log(level, msg, *args, build(), stacklevel=2)
+
+
+_listener: QueueListener | None = None
+_queue_handler: DroppingQueueHandler | None = None
 
 
 def init_logger():
+    global _listener, _queue_handler
     # 检查并创建 logs 文件夹
     if not os.path.exists("./logs"):
         os.makedirs("./logs")
 
     # 创建自定义的日志格式器
     color_formatter = colorlog.ColoredFormatter(
-        "%(log_color)s%(levelname)s%(reset)s:     %(asctime)s     %(message)s",
+        "%(log_color)s%(levelname)s%(reset)s:     %(asctime)s     "
+        "[%(request_id)s] %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
         reset=True,
         log_colors={
@@ -25,8 +166,13 @@ def init_logger():
         style="%",
     )
 
-    file_formatter = logging.Formatter(
-        "%(levelname)s:     %(asctime)s     %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+    file_formatter = (
+        JSONFormatter()
+        if CONFIG.LOG.JSON
+        else logging.Formatter(
+            "%(levelname)s:     %(asctime)s     [%(request_id)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
     )
 
     # 创建流处理器（控制台输出）
@@ -35,12 +181,42 @@ def init_logger():
 
     # 创建轮转文件处理器（文件输出）
     file_handler = RotatingFileHandler(
-        "./logs/log.log",
+        "./logs/log.jsonl" if CONFIG.LOG.JSON else "./logs/log.log",
         maxBytes=5 * 1024 * 1024,  # 文件大小限制（5MB）
         backupCount=5,  # 保留的旧日志文件数
         encoding="utf-8",
     )
     file_handler.setFormatter(file_formatter)
 
+    handlers: list[logging.Handler] = [stream_handler, file_handler]
+    if CONFIG.LOG.QUEUE and _listener is None:
+        # 请求线程只把日志放入队列，格式化和写文件在独立线程中进行
+        _queue_handler = DroppingQueueHandler(queue.Queue(CONFIG.LOG.QUEUE_SIZE))
+        _listener = QueueListener(
+            _queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        _listener.start()
+        handlers = [_queue_handler]
+    for handler in handlers:
+        # 队列模式下只挂在 QueueHandler 上，在产生日志的线程中读取请求 ID
+        handler.addFilter(RequestIdFilter())
+
     # 配置全局日志记录器
-    logging.basicConfig(level=logging.INFO, handlers=[stream_handler, file_handler])
+    logging.basicConfig(level=CONFIG.LOG.LEVEL, handlers=handlers)
+
+
+def stop_logger():
+    """停止日志写入线程，写完队列中剩余的日志"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+
+
+def logging_stats() -> dict[str, int]:
+    return {
+        "queue_depth": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+        "payload_suppressed": payload_limiter.suppressed,
+    }
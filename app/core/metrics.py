@@ -0,0 +1,434 @@
+import bisect
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Sequence
+from app.core.config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)  # fmt: skip
+
+LabelValues = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> LabelValues:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, "
+                f"got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> list[list]:
+        """返回可 JSON 序列化的样本，用于渲染和多进程快照"""
+        raise NotImplementedError
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": self.samples(),
+        }
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[list]:
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """
+    可增可减的瞬时值。
+    通过 set_function 设置回调时，每次采集时调用回调读取当前值。
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._function: Callable[[], dict[LabelValues, float]] | None = None
+
+    def set(self, value: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], dict[LabelValues, float]]):
+        """
+        :param function: 返回 {标签值元组: 值} 的回调。
+        """
+        self._function = function
+
+    def samples(self) -> list[list]:
+        if self._function is not None:
+            try:
+                values = self._function()
+            except Exception:
+                logger.exception(f"Failed to collect gauge {self.name}")
+                values = {}
+            return [[list(k), v] for k, v in values.items()]
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    """按固定区间统计耗时等数值的分布"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签：[各区间计数（不累加，最后一个为 +Inf）, 总和]
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """统计代码块的耗时（秒），代码块抛出异常时同样记录"""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def samples(self) -> list[list]:
+        with self._lock:
+            return [[list(k), list(c), s[0]] for k, (c, s) in self._values.items()]
+
+    def describe(self) -> dict[str, Any]:
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+
+def _merge(
+    snapshots: list[dict[str, Any]], gauge_pid: bool = False
+) -> dict[str, dict[str, Any]]:
+    """
+    合并多个进程的快照：计数和分布相加。
+
+    :param gauge_pid: 瞬时值加上 pid 标签按进程分别输出，而不是相加。
+    """
+    merged: dict[str, dict[str, Any]] = {}
+    for snapshot in snapshots:
+        pid = str(snapshot["pid"])
+        for name, metric in snapshot["metrics"].items():
+            is_gauge = metric["type"] == "gauge"
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**metric, "values": {}}
+                if is_gauge and gauge_pid:
+                    target["labelnames"] = [*metric["labelnames"], "pid"]
+            values = target["values"]
+            for sample in metric["samples"]:
+                key = tuple(sample[0])
+                if is_gauge and gauge_pid:
+                    key = (*key, pid)
+                if metric["type"] == "histogram":
+                    if len(sample[1]) != len(target["buckets"]) + 1:
+                        # 区间定义在进程之间不一致（例如升级过程中），跳过旧进程的数据
+                        continue
+                    counts, total = values.get(key, ([0] * len(sample[1]), 0.0))
+                    values[key] = (
+                        [a + b for a, b in zip(counts, sample[1])],
+                        total + sample[2],
+                    )
+                else:
+                    values[key] = values.get(key, 0) + sample[1]
+    return merged
+
+
+def _render(merged: dict[str, dict[str, Any]]) -> str:
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        labelnames = metric["labelnames"]
+        lines.append(f"# HELP {name} {_escape(metric['help'])}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key in sorted(metric["values"]):
+            value = metric["values"][key]
+            if metric["type"] != "histogram":
+                # 计数器的名称注册时已带 _total，样本名和 TYPE 行保持一致
+                labels = _format_labels(labelnames, key)
+                lines.append(f"{name}{labels} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], math.inf], counts):
+                cumulative += count
+                labels = _format_labels(
+                    [*labelnames, "le"], [*key, _format_value(bound)]
+                )
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _format_labels(labelnames, key)
+            lines.append(f"{name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{name}_count{labels} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """
+    进程内的指标注册表，以 Prometheus 文本格式输出。
+
+    多进程部署（gunicorn 多个 worker）时指定 multiprocess_dir：每个进程由后台线程
+    定期把自己的快照写入 <目录>/<pid>.json，采集时合并目录下所有进程的快照。
+    计数和分布在进程之间相加（已退出进程的数据保留），瞬时值加上 pid 标签
+    按进程分别输出，只包含仍在运行的进程。
+    """
+
+    def __init__(self, multiprocess_dir: str | None = None, interval: float = 5):
+        """
+        初始化 MetricsRegistry。
+
+        :param multiprocess_dir: 多进程快照目录，None 表示只输出当前进程的指标。
+            服务启动前需要清空该目录。
+        :param interval: 写入快照的间隔（秒）。
+        """
+        self.multiprocess_dir = multiprocess_dir
+        self.interval = interval
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        """:param name: 按 Prometheus 约定以 _total 结尾。"""
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter name must end with _total: {name}")
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "pid": os.getpid(),
+            "metrics": {m.name: m.describe() for m in metrics},
+        }
+
+    def _snapshot_path(self, pid: int) -> str:
+        assert self.multiprocess_dir is not None
+        return os.path.join(self.multiprocess_dir, f"{pid}.json")
+
+    def write_snapshot(self):
+        """写入临时文件后替换，避免其他进程读到写了一半的快照"""
+        if self.multiprocess_dir is None:
+            return
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.multiprocess_dir)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, self._snapshot_path(os.getpid()))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _read_snapshots(self) -> list[dict[str, Any]]:
+        assert self.multiprocess_dir is not None
+        snapshots = []
+        for filename in os.listdir(self.multiprocess_dir):
+            stem, ext = os.path.splitext(filename)
+            if ext != ".json" or not stem.isdigit() or int(stem) == os.getpid():
+                continue
+            try:
+                with open(os.path.join(self.multiprocess_dir, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(snapshot["pid"]):
+                for metric in snapshot["metrics"].values():
+                    if metric["type"] == "gauge":
+                        metric["samples"] = []
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式，当前进程使用实时数据"""
+        snapshots = [self.snapshot()]
+        if self.multiprocess_dir is None:
+            return _render(_merge(snapshots))
+        if os.path.isdir(self.multiprocess_dir):
+            snapshots.extend(self._read_snapshots())
+        return _render(_merge(snapshots, gauge_pid=True))
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write_snapshot()
+            except Exception:
+                logger.exception("Failed to write metrics snapshot")
+
+    def start(self):
+        """启动定期写入快照的后台线程，未指定 multiprocess_dir 时不做任何事"""
+        if self.multiprocess_dir is None or self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程并写入最后一次快照"""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopped.set()
+        thread.join()
+        self.write_snapshot()
+
+
+registry = MetricsRegistry(
+    CONFIG.METRICS.MULTIPROCESS_DIR, CONFIG.METRICS.SNAPSHOT_INTERVAL
+)
+
+# webhook 各阶段的耗时，stage 取值见各调用位置
+stage_latency = registry.histogram(
+    "wechat_stage_duration_seconds",
+    "Duration of webhook processing stages",
+    ["stage"],
+)
+messages_received = registry.counter(
+    "wechat_messages_received_total",
+    "WeChat messages received by type",
+    ["type"],
+)
+http_request_latency = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+
+
+class MetricsMiddleware:
+    """
+    按路由模板（而不是实际路径）统计请求耗时，避免路径参数导致标签数量无限增长。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        started_at = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 路由匹配后 FastAPI 会把匹配的路由写入 scope
+            route = scope.get("route")
+            http_request_latency.observe(
+                time.perf_counter() - started_at,
+                method=scope["method"],
+                route=getattr(route, "path", "<unmatched>"),
+                status=status,
+            )
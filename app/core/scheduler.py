@@ -0,0 +1,29 @@
+import logging
+from typing import Any, Callable
+from apscheduler.schedulers.background import BackgroundScheduler
+
+logger = logging.getLogger(__name__)
+
+
+scheduler = BackgroundScheduler()
+
+
+def add_interval_job(job_id: str, func: Callable[..., Any], seconds: float, **kwargs):
+    """
+    添加定时任务。同一个任务不会并发执行，错过的多次执行只补一次。
+
+    :param job_id: 任务 ID，重复添加时替换原有任务。
+    :param func: 任务函数。
+    :param seconds: 执行间隔（秒）。
+    """
+    scheduler.add_job(
+        func,
+        "interval",
+        seconds=seconds,
+        id=job_id,
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        **kwargs,
+    )
+    logger.info(f"Scheduled job {job_id} every {seconds}s")
@@ -1,7 +1,19 @@
+import asyncio
 import bcrypt
+import hashlib
+import hmac
 import jwt
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Literal, Optional
 from pydantic import BaseModel
 from app.core.config import CONFIG
 
@@ -10,6 +22,9 @@ class TokenData(BaseModel):
     id: int
     username: str
     email: str
+    role: Literal["admin", "user"] | None = None
+    level: int | None = None
+    is_banned: bool | None = None
 
 
 class Token(BaseModel):
@@ -29,7 +44,81 @@ def create_access_token(data: TokenData, expires_delta: timedelta | None = None)
     return encoded_jwt
 
 
+class TokenCache:
+    """
+    已验证 token 的 LRU 缓存，键为 token 的 SHA-256 摘要，缓存到 token 的 exp 为止。
+    每次读写时比较当前的 (算法, 密钥) 和缓存建立时的值（只比较字符串，不计算摘要），
+    运行中更换密钥或算法时自动清空缓存，让旧密钥签发的 token 重新走完整的签名校验。
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: OrderedDict[bytes, tuple[TokenData, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._secret = (CONFIG.JWT.ALGORITHM, CONFIG.JWT.SECRET_KEY)
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+
+    def _check_secret(self):
+        """调用方需持有 _lock"""
+        secret = (CONFIG.JWT.ALGORITHM, CONFIG.JWT.SECRET_KEY)
+        if secret != self._secret:
+            self._data.clear()
+            self._secret = secret
+            self.rotations += 1
+
+    def get(self, token: str) -> TokenData | None:
+        if self.maxsize <= 0:
+            return None
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        with self._lock:
+            self._check_secret()
+            item = self._data.get(key)
+            if item is None or item[1] <= time.time():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, token: str, token_data: TokenData, exp: float):
+        if self.maxsize <= 0:
+            return
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        with self._lock:
+            self._check_secret()
+            self._data[key] = (token_data, exp)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "secret_rotations": self.rotations,
+            }
+
+
+token_cache = TokenCache(CONFIG.JWT.CACHE_SIZE)
+
+
 def verify_access_token(token: str, credentials_exception: Exception):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(
             token, CONFIG.JWT.SECRET_KEY, algorithms=[CONFIG.JWT.ALGORITHM]
@@ -39,20 +128,145 @@ def verify_access_token(token: str, credentials_exception: Exception):
         username: str | None = payload.get("username")
         if email is None or id is None or username is None:
             raise credentials_exception
-        return TokenData(email=email, id=id, username=username)
+        token_data = TokenData(
+            email=email,
+            id=id,
+            username=username,
+            role=payload.get("role"),
+            level=payload.get("level"),
+            is_banned=payload.get("is_banned"),
+        )
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            token_cache.set(token, token_data, exp)
+        return token_data
     except jwt.PyJWTError:
         raise credentials_exception
 
 
-def hash_password(password: str) -> str:
-    """Hash a password for storing."""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode("utf-8"), salt)
-    return hashed.decode("utf-8")
+def _hashpw(password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a stored password against one provided by user."""
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(
         plain_password.encode("utf-8"), hashed_password.encode("utf-8")
     )
+
+
+def is_password_hash(value: str) -> bool:
+    """是否为 bcrypt 哈希（历史数据中的密码是明文）"""
+    return value.startswith(("$2a$", "$2b$", "$2y$"))
+
+
+def hash_password(password: str) -> str:
+    """
+    Hash a password for storing.
+
+    会阻塞当前线程直到计算完成，只用于启动时创建管理员等请求之外的场景，
+    请求中使用 await password_hasher.hash()。
+    """
+    return password_hasher.hash_sync(password)
+
+
+class PasswordHasherBusy(Exception):
+    """排队中的哈希任务超过上限"""
+
+
+class PasswordHasher:
+    """
+    在独立的有界线程池/进程池中执行 bcrypt 计算，避免占用 API 线程池。
+    排队任务超过上限时抛出 PasswordHasherBusy，而不是无限排队。
+    """
+
+    def __init__(
+        self,
+        rounds: int = 12,
+        executor: Literal["thread", "process"] = "thread",
+        workers: int = 2,
+        max_pending: int = 32,
+    ):
+        """
+        初始化 PasswordHasher。
+
+        :param rounds: bcrypt 成本因子。
+        :param executor: thread 使用线程池（bcrypt 计算时释放 GIL），process 使用进程池。
+        :param workers: 线程/进程数。
+        :param max_pending: 排队和执行中的任务总数上限。
+        """
+        self.rounds = rounds
+        self.executor_type = executor
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.executor_type == "process":
+                        self._executor = ProcessPoolExecutor(self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            self.workers, thread_name_prefix="password-hasher"
+                        )
+        return self._executor
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Too many pending password hashing tasks")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _verify_task(self, plain_password: str, hashed_password: str):
+        if is_password_hash(hashed_password):
+            return self._submit(_checkpw, plain_password, hashed_password)
+        # 历史明文密码直接比较，不需要进入执行器
+        future: Future = Future()
+        future.set_result(
+            hmac.compare_digest(
+                plain_password.encode("utf-8"), hashed_password.encode("utf-8")
+            )
+        )
+        return future
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """明文密码或成本因子低于当前配置的哈希需要重新计算"""
+        if not is_password_hash(hashed_password):
+            return True
+        try:
+            return int(hashed_password.split("$")[2]) < self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(_hashpw, password, self.rounds))
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(
+            self._verify_task(plain_password, hashed_password)
+        )
+
+    def hash_sync(self, password: str) -> str:
+        return self._submit(_hashpw, password, self.rounds).result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher(
+    rounds=CONFIG.PASSWORD.BCRYPT_ROUNDS,
+    executor=CONFIG.PASSWORD.EXECUTOR,
+    workers=CONFIG.PASSWORD.WORKERS,
+    max_pending=CONFIG.PASSWORD.MAX_PENDING,
+)
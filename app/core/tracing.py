@@ -0,0 +1,460 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+from app.core.config import CONFIG
+from app.core.log import request_id_var
+from app.core.worker import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+# 客户端传入的请求 ID 只接受这些字符，避免日志注入
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class Span:
+    """一段耗时操作，子 span 按开始顺序记录在 children 中"""
+
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+        "children",
+    )
+
+    def __init__(
+        self, name: str, parent_id: str | None, attributes: dict[str, Any]
+    ):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.error: str | None = None
+        self.children: list[Span] = []
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_tree(self, origin_ns: int) -> dict[str, Any]:
+        """转换为慢请求日志中的 span 树，时间相对于 origin_ns（毫秒）"""
+        node: dict[str, Any] = {
+            "name": self.name,
+            "offset_ms": round((self.start_ns - origin_ns) / 1e6, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attributes:
+            node["attributes"] = self.attributes
+        if self.error:
+            node["error"] = self.error
+        if self.children:
+            node["children"] = [c.to_tree(origin_ns) for c in self.children]
+        return node
+
+
+class Trace:
+    """
+    一次请求（或一个后台任务）内的全部 span。
+    run_in_threadpool / asyncio.to_thread 会复制 contextvars，线程中的 span
+    同样记录到所属的 Trace 中，因此添加子 span 时需要加锁。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        request_id: str,
+        attributes: dict[str, Any],
+        max_spans: int = 500,
+    ):
+        self.trace_id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.root = Span(name, None, attributes)
+        self.max_spans = max_spans
+        self.span_count = 1
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, parent: Span, span: Span) -> bool:
+        """
+        :return: 是否记录，超过 span 数量上限时返回 False。
+        """
+        with self._lock:
+            if self.span_count >= self.max_spans:
+                self.dropped += 1
+                return False
+            self.span_count += 1
+            parent.children.append(span)
+            return True
+
+    def to_tree(self) -> dict[str, Any]:
+        tree = self.root.to_tree(self.root.start_ns)
+        if self.dropped:
+            tree["dropped_spans"] = self.dropped
+        return tree
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("span", default=None)
+
+
+def current_request_id() -> str | None:
+    return request_id_var.get()
+
+
+def new_request_id(header: str | None = None) -> str:
+    """使用客户端传入的请求 ID（格式合法时），否则生成新的"""
+    if header and _REQUEST_ID.match(header):
+        return header
+    return uuid.uuid4().hex
+
+
+def _reset(var: ContextVar, token):
+    try:
+        var.reset(token)
+    except ValueError:
+        # 异步生成器被垃圾回收时会在其他上下文中关闭，此时无法也无需还原
+        pass
+
+
+@contextmanager
+def span(
+    name: str, _activate: bool = True, **attributes: Any
+) -> Iterator[Span | None]:
+    """
+    在当前 Trace 中记录一段子操作。不在任何 Trace 中时不做任何事，返回 None。
+    代码块抛出的异常记录在 span 上后继续抛出。
+
+    :param _activate: 是否在代码块内作为当前 span（即之后的 span 的父节点）。
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    if trace is None or parent is None:
+        yield None
+        return
+    current = Span(name, parent.span_id, attributes)
+    if not trace.add(parent, current):
+        yield None
+        return
+    token = _current_span.set(current) if _activate else None
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end()
+        if token is not None:
+            _reset(_current_span, token)
+
+
+def traced(
+    name: str | None = None,
+    attributes: Callable[..., dict[str, Any]] | None = None,
+):
+    """
+    将函数（同步函数、协程函数或异步生成器）的每次调用记录为 span。
+
+    :param name: span 名称，默认为函数的 __qualname__。
+    :param attributes: 根据调用参数生成 span 属性的函数，接收与被装饰函数相同的参数。
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        def make_span(args, kwargs, activate=True):
+            extra = attributes(*args, **kwargs) if attributes else {}
+            return span(span_name, activate, **extra)
+
+        if inspect.isasyncgenfunction(func):
+
+            @functools.wraps(func)
+            async def asyncgen_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                # 生成器挂起期间调用方的代码仍在执行，不能把它作为当前 span；
+                # 调用方提前停止迭代时 span 在生成器被关闭时结束
+                with make_span(args, kwargs, activate=False):
+                    async with aclosing(func(*args, **kwargs)) as items:
+                        async for item in items:
+                            yield item
+
+            return asyncgen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with make_span(args, kwargs):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with make_span(args, kwargs):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+def to_otlp(trace: Trace, service_name: str) -> dict[str, Any]:
+    """转换为 OTLP/JSON 的 ExportTraceServiceRequest 格式"""
+    spans = []
+    for s in trace.root.walk():
+        attributes = dict(s.attributes)
+        if s is trace.root:
+            attributes["request_id"] = trace.request_id
+        otlp_span: dict[str, Any] = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            # 1: INTERNAL，2: SERVER
+            "kind": 2 if s is trace.root else 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": _otlp_attributes(attributes),
+            # 1: OK，2: ERROR
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes({"service.name": service_name})
+                },
+                "scopeSpans": [{"scope": {"name": "app"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class TraceExporter:
+    """
+    将 Trace 以 OTLP/JSON 格式逐行追加写入本地文件（与 OpenTelemetry Collector
+    file exporter 的格式一致），写文件在后台线程中进行。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        service_name: str,
+        sample_rate: float = 1.0,
+        queue_size: int = 1000,
+    ):
+        """
+        初始化 TraceExporter。
+
+        :param path: 输出文件路径。
+        :param service_name: 写入 resource 的 service.name。
+        :param sample_rate: 导出比例（0~1），慢请求总是导出。
+        :param queue_size: 待写入的 Trace 数上限，超过时丢弃。
+        """
+        self.path = path
+        self.service_name = service_name
+        self.sample_rate = sample_rate
+        self._pool = WorkerPool("trace-export", workers=1, queue_size=queue_size)
+
+    def _write(self, trace: Trace):
+        line = json.dumps(to_otlp(trace, self.service_name), ensure_ascii=False)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def export(self, trace: Trace, slow: bool = False):
+        if not slow and random.random() >= self.sample_rate:
+            return
+        self._pool.submit(self._write, trace)
+
+    def start(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._pool.start()
+
+    def shutdown(self, timeout: float | None = None):
+        self._pool.shutdown(timeout)
+
+
+class Tracer:
+    """创建 Trace，并在结束时记录慢请求日志和导出"""
+
+    def __init__(
+        self,
+        slow_threshold_ms: float = 1000,
+        max_spans: int = 500,
+        exporter: TraceExporter | None = None,
+    ):
+        """
+        初始化 Tracer。
+
+        :param slow_threshold_ms: 耗时超过该值（毫秒）时记录慢请求日志，0 表示不记录。
+        :param max_spans: 单个 Trace 最多记录的 span 数。
+        :param exporter: OTLP 文件导出，None 表示不导出。
+        """
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_spans = max_spans
+        self.exporter = exporter
+
+    @contextmanager
+    def trace(
+        self, name: str, request_id: str | None = None, **attributes: Any
+    ) -> Iterator[Span | None]:
+        """
+        开始一个 Trace，已经在 Trace 中时等同于 span()。
+
+        :param request_id: 请求 ID，后台任务传入提交时的请求 ID，None 表示生成新的。
+        """
+        if _current_trace.get() is not None:
+            with span(name, **attributes) as current:
+                yield current
+            return
+        trace = Trace(name, request_id or new_request_id(), attributes, self.max_spans)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        request_token = request_id_var.set(trace.request_id)
+        try:
+            yield trace.root
+        except BaseException as e:
+            trace.root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            trace.root.end()
+            _reset(_current_span, span_token)
+            _reset(_current_trace, trace_token)
+            self.finish(trace)
+            # 慢请求日志需要带上请求 ID，最后再还原
+            _reset(request_id_var, request_token)
+
+    def finish(self, trace: Trace):
+        duration_ms = trace.root.duration_ms
+        slow = 0 < self.slow_threshold_ms <= duration_ms
+        # 慢请求日志不经过 payload 日志的采样和限流，每个慢请求都要记录
+        if slow and logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                "Slow request %s took %.0f ms: %s",
+                trace.root.name,
+                duration_ms,
+                json.dumps(trace.to_tree(), ensure_ascii=False),
+            )
+        if self.exporter is not None:
+            self.exporter.export(trace, slow)
+
+    def start(self):
+        if self.exporter is not None:
+            self.exporter.start()
+
+    def shutdown(self, timeout: float | None = None):
+        if self.exporter is not None:
+            self.exporter.shutdown(timeout)
+
+
+tracer = Tracer(
+    slow_threshold_ms=CONFIG.TRACING.SLOW_REQUEST_MS,
+    max_spans=CONFIG.TRACING.MAX_SPANS,
+    exporter=(
+        TraceExporter(
+            CONFIG.TRACING.EXPORT_PATH,
+            CONFIG.APP.NAME,
+            sample_rate=CONFIG.TRACING.EXPORT_SAMPLE_RATE,
+            queue_size=CONFIG.TRACING.EXPORT_QUEUE_SIZE,
+        )
+        if CONFIG.TRACING.EXPORT_PATH
+        else None
+    ),
+)
+
+
+class TracingMiddleware:
+    """
+    为每个 HTTP 请求开始一个 Trace：读取或生成 X-Request-ID 并在响应中返回，
+    请求内的日志都带上该 ID，耗时超过阈值时记录带 span 树的慢请求日志。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = None
+        for key, value in scope["headers"]:
+            if key == b"x-request-id":
+                header = value.decode("latin-1")
+                break
+        request_id = new_request_id(header)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        with tracer.trace(
+            f"{scope['method']} {scope['path']}",
+            request_id,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        ) as root:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                assert root is not None
+                root.attributes["http.status_code"] = status
+                route = scope.get("route")
+                if route is not None:
+                    # 使用路由模板作为名称，便于按接口汇总
+                    root.name = f"{scope['method']} {route.path}"
+                    root.attributes["http.route"] = route.path
@@ -0,0 +1,353 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Hashable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Task(NamedTuple):
+    func: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    enqueued_at: float
+
+
+class _PoolStats:
+    """
+    线程池的吞吐和延迟统计，调用方负责加锁。
+    """
+
+    def __init__(self):
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def record(self, wait: float, elapsed: float, failed: bool):
+        if failed:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.run_total += elapsed
+        self.run_max = max(self.run_max, elapsed)
+
+    def snapshot(self) -> dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_avg_ms": self.wait_total / finished * 1000 if finished else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+            "run_avg_ms": self.run_total / finished * 1000 if finished else 0.0,
+            "run_max_ms": self.run_max * 1000,
+        }
+
+
+def _run_task(pool_name: str, task: _Task) -> tuple[float, float, bool]:
+    """执行任务，返回 (排队耗时, 执行耗时, 是否失败)"""
+    started_at = time.perf_counter()
+    failed = False
+    try:
+        task.func(*task.args, **task.kwargs)
+    except Exception:
+        failed = True
+        logger.exception(f"Worker pool {pool_name} task failed")
+    return (
+        started_at - task.enqueued_at,
+        time.perf_counter() - started_at,
+        failed,
+    )
+
+
+class WorkerPool:
+    """
+    进程内的后台线程池，带有有界队列。
+    队列满时拒绝新任务而不是阻塞调用方，停机时等待队列排空。
+    """
+
+    def __init__(self, name: str, workers: int = 4, queue_size: int = 1000):
+        """
+        初始化 WorkerPool。
+
+        :param name: 线程池名称，用于线程名和日志。
+        :param workers: 工作线程数。
+        :param queue_size: 队列长度上限。
+        """
+        self.name = name
+        self.workers = workers
+        self._queue: queue.Queue[_Task | None] = queue.Queue(maxsize=queue_size)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._accepting = False
+        self._stats = _PoolStats()
+
+    def start(self):
+        """启动工作线程"""
+        with self._lock:
+            if self._threads:
+                return
+            self._accepting = True
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Worker pool {self.name} started with {self.workers} workers")
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> bool:
+        """
+        提交任务。
+
+        :return: 任务是否进入队列，未启动或队列已满时返回 False。
+        """
+        with self._lock:
+            if not self._accepting:
+                return False
+            try:
+                self._queue.put_nowait(_Task(func, args, kwargs, time.perf_counter()))
+            except queue.Full:
+                self._stats.rejected += 1
+                logger.warning(f"Worker pool {self.name} queue is full, task rejected")
+                return False
+            self._stats.submitted += 1
+            return True
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                result = _run_task(self.name, task)
+                with self._lock:
+                    self._stats.record(*result)
+            finally:
+                self._queue.task_done()
+
+    def shutdown(self, timeout: float | None = None):
+        """
+        停止接收新任务，等待已入队的任务执行完毕后退出工作线程。
+
+        :param timeout: 等待排空的最长时间（秒），None 表示一直等待。
+        """
+        with self._lock:
+            if not self._threads:
+                return
+            self._accepting = False
+            threads, self._threads = self._threads, []
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0, deadline - time.monotonic())
+
+        for _ in threads:
+            # 哨兵排在已有任务之后，保证先排空队列
+            try:
+                self._queue.put(None, timeout=remaining())
+            except queue.Full:
+                break
+        for thread in threads:
+            thread.join(remaining())
+        pending = self._queue.qsize()
+        if pending:
+            logger.warning(
+                f"Worker pool {self.name} shut down with {pending} tasks not drained"
+            )
+        else:
+            logger.info(f"Worker pool {self.name} drained and stopped")
+
+    def stats(self) -> dict[str, Any]:
+        """返回队列深度、吞吐和延迟统计"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                **self._stats.snapshot(),
+            }
+
+
+class KeyedExecutor:
+    """
+    按 key 有序执行的后台线程池：同一个 key 的任务严格按提交顺序串行执行，
+    不同 key 的任务并行执行。每个 key 的队列长度和总队列长度都有上限。
+    """
+
+    # 累计提交次数统计最多保留的 key 数量
+    MAX_TRACKED_KEYS = 10000
+
+    def __init__(
+        self,
+        name: str,
+        workers: int = 4,
+        queue_size: int = 1000,
+        queue_size_per_key: int = 50,
+    ):
+        """
+        初始化 KeyedExecutor。
+
+        :param name: 线程池名称，用于线程名和日志。
+        :param workers: 工作线程数。
+        :param queue_size: 所有 key 排队任务总数上限。
+        :param queue_size_per_key: 单个 key 排队任务数上限。
+        """
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_size_per_key = queue_size_per_key
+        self._pending: dict[Hashable, deque[_Task]] = {}
+        self._pending_total = 0
+        # 有待执行任务且没有线程在处理的 key
+        self._ready: deque[Hashable] = deque()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._accepting = False
+        self._stopping = False
+        self._running = 0
+        self._stats = _PoolStats()
+        self._submitted_by_key: Counter[Hashable] = Counter()
+
+    def start(self):
+        """启动工作线程"""
+        with self._cond:
+            if self._threads:
+                return
+            self._accepting = True
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Keyed executor {self.name} started with {self.workers} workers")
+
+    def submit(
+        self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> bool:
+        """
+        提交任务，同一个 key 的任务按提交顺序执行。
+
+        :return: 任务是否进入队列，未启动或队列已满时返回 False。
+        """
+        with self._cond:
+            if not self._accepting:
+                return False
+            tasks = self._pending.get(key)
+            if self._pending_total >= self.queue_size or (
+                tasks is not None and len(tasks) >= self.queue_size_per_key
+            ):
+                self._stats.rejected += 1
+                logger.warning(
+                    f"Keyed executor {self.name} queue is full for {key}, task rejected"
+                )
+                return False
+            if tasks is None:
+                tasks = self._pending[key] = deque()
+                # key 不在处理中，加入就绪队列
+                self._ready.append(key)
+                self._cond.notify()
+            tasks.append(_Task(func, args, kwargs, time.perf_counter()))
+            self._pending_total += 1
+            self._stats.submitted += 1
+            self._track(key)
+            return True
+
+    def _track(self, key: Hashable):
+        self._submitted_by_key[key] += 1
+        if len(self._submitted_by_key) > self.MAX_TRACKED_KEYS:
+            self._submitted_by_key = Counter(
+                dict(self._submitted_by_key.most_common(self.MAX_TRACKED_KEYS // 2))
+            )
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                key = self._ready.popleft()
+                task = self._pending[key].popleft()
+                self._pending_total -= 1
+                self._running += 1
+            result = _run_task(self.name, task)
+            with self._cond:
+                self._running -= 1
+                self._stats.record(*result)
+                if self._pending[key]:
+                    # 排到就绪队列末尾，避免繁忙的 key 饿死其他 key
+                    self._ready.append(key)
+                else:
+                    del self._pending[key]
+                self._cond.notify_all()
+
+    def shutdown(self, timeout: float | None = None):
+        """
+        停止接收新任务，等待已入队的任务执行完毕后退出工作线程。
+
+        :param timeout: 等待排空的最长时间（秒），None 表示一直等待。
+        """
+        with self._cond:
+            if not self._threads:
+                return
+            self._accepting = False
+            threads, self._threads = self._threads, []
+            drained = self._cond.wait_for(
+                lambda: self._pending_total == 0 and self._running == 0, timeout
+            )
+            pending = self._pending_total
+            self._stopping = True
+            self._cond.notify_all()
+        if drained:
+            for thread in threads:
+                thread.join()
+            logger.info(f"Keyed executor {self.name} drained and stopped")
+        else:
+            # 超时后不再等待正在执行的任务，工作线程为守护线程
+            logger.warning(
+                f"Keyed executor {self.name} shut down with {pending} tasks not drained"
+            )
+
+    def stats(self, top: int = 10) -> dict[str, Any]:
+        """
+        返回队列深度、吞吐和延迟统计，以及当前排队最多和累计提交最多的 key。
+
+        :param top: 返回的 key 数量。
+        """
+        with self._cond:
+            busiest_pending = sorted(
+                ((str(k), len(v)) for k, v in self._pending.items()),
+                key=lambda item: item[1],
+                reverse=True,
+            )[:top]
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "queue_depth": self._pending_total,
+                "queue_size": self.queue_size,
+                "queue_size_per_key": self.queue_size_per_key,
+                "active_keys": len(self._pending),
+                "running": self._running,
+                **self._stats.snapshot(),
+                "busiest_pending_keys": [
+                    {"key": k, "pending": n} for k, n in busiest_pending
+                ],
+                "busiest_keys": [
+                    {"key": str(k), "submitted": n}
+                    for k, n in self._submitted_by_key.most_common(top)
+                ],
+            }
@@ -0,0 +1,210 @@
+from typing import Any, Generic, List, Tuple, Type
+from sqlalchemy import func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from app.core.tracing import traced
+from app.crud.crud_base import (
+    CRUDBase,
+    CreateSchemaType,
+    ModelType,
+    UpdateSchemaType,
+    _table_attributes,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    CRUDBase 的异步版本，接口与 CRUDBase 保持一致，使用 AsyncSession。
+    """
+
+    def __init__(self, model: Type[ModelType]):
+        """
+        初始化 AsyncCRUDBase 类。
+
+        :param model: 数据库模型类（SQLAlchemy 模型）。
+        """
+        self.model = model
+
+    @traced(attributes=_table_attributes)
+    async def get(self, db: AsyncSession, model_id: int) -> ModelType | None:
+        """
+        根据 ID 查询单个记录。
+
+        :param db: SQLAlchemy 的 AsyncSession 对象，用于数据库操作。
+        :param model_id: 要查询的记录的主键 ID。
+        :return: 查询到的记录对象，如果未找到则返回 None。
+        """
+        result = await db.execute(
+            select(self.model).where(getattr(self.model, "id") == model_id).limit(1)
+        )
+        return result.scalars().first()
+
+    @traced(attributes=_table_attributes)
+    async def get_by_filter(
+        self,
+        db: AsyncSession,
+        filter: ColumnElement[bool],
+    ) -> ModelType | None:
+        """
+        根据条件查询单个记录。
+
+        :param db: SQLAlchemy 的 AsyncSession 对象，用于数据库操作。
+        :param filter: SQLAlchemy 的过滤条件（布尔表达式）。
+        :return: 查询到的记录对象，如果未找到则返回 None。
+        """
+        result = await db.execute(select(self.model).where(filter).limit(1))
+        return result.scalars().first()
+
+    @traced(attributes=_table_attributes)
+    async def create(self, db: AsyncSession, obj_in: CreateSchemaType) -> ModelType:
+        """
+        创建一条新记录。
+
+        :param db: SQLAlchemy 的 AsyncSession 对象，用于数据库操作。
+        :param obj_in: 包含新记录数据的 Pydantic Schema 对象。
+        :return: 新创建的记录对象。
+        """
+        db_obj = self.model(**obj_in.model_dump())
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    @traced(attributes=_table_attributes)
+    async def update(
+        self, db: AsyncSession, model_id: int, obj_in: UpdateSchemaType
+    ) -> ModelType | None:
+        """
+        更新一条记录。
+
+        :param db: SQLAlchemy 的 AsyncSession 对象，用于数据库操作。
+        :param model_id: 要更新的记录的主键 ID。
+        :param obj_in: 包含更新数据的 Pydantic Schema 对象。
+        :return: 更新后的记录对象，如果未找到记录则返回 None。
+        """
+        db_obj = await self.get(db, model_id)
+        if db_obj:
+            for field, value in obj_in.model_dump(exclude_unset=True).items():
+                setattr(db_obj, field, value)
+            await db.commit()
+            await db.refresh(db_obj)
+            return db_obj
+        return None
+
+    @traced(attributes=_table_attributes)
+    async def delete(self, db: AsyncSession, model_id: int) -> ModelType | None:
+        """
+        删除一条记录。
+
+        :param db: SQLAlchemy 的 AsyncSession 对象，用于数据库操作。
+        :param model_id: 要删除的记录的主键 ID。
+        :return: 被删除的记录对象，如果未找到记录则返回 None。
+        """
+        db_obj = await self.get(db, model_id)
+        if db_obj:
+            await db.delete(db_obj)
+            await db.commit()
+            return db_obj
+        return None
+
+    @traced(attributes=_table_attributes)
+    async def get_multi(
+        self, db: AsyncSession, page: int = 1, per_page: int = 100
+    ) -> Tuple[int, List[ModelType]]:
+        """
+        分页查询多条记录。
+
+        :param db: SQLAlchemy 的 AsyncSession 对象，用于数据库操作。
+        :param page: 当前页码（从 1 开始）。
+        :param per_page: 每页的记录数量。
+        :return: 包含总数和当前页数据的元组：(total, data)。
+        """
+        return await self.get_multi_by_filter(db, true(), page, per_page)
+
+    @traced(attributes=_table_attributes)
+    async def get_multi_by_filter(
+        self,
+        db: AsyncSession,
+        filter: ColumnElement[bool],
+        page: int = 1,
+        per_page: int = 100,
+    ) -> Tuple[int, List[ModelType]]:
+        """
+        根据条件分页查询多条记录。
+
+        :param db: SQLAlchemy 的 AsyncSession 对象，用于数据库操作。
+        :param filter: SQLAlchemy 的过滤条件（布尔表达式）。
+        :param page: 当前页码（从 1 开始）。
+        :param per_page: 每页的记录数量。
+        :return: 包含总数和当前页数据的元组：(total, data)。
+        """
+        total = await db.scalar(
+            select(func.count()).select_from(self.model).where(filter)
+        )
+        result = await db.execute(
+            select(self.model)
+            .where(filter)
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+        )
+        return total or 0, list(result.scalars().all())
+
+    @traced(attributes=_table_attributes)
+    async def get_multi_by_cursor(
+        self,
+        db: AsyncSession,
+        filter: ColumnElement[bool] | None = None,
+        cursor: str | None = None,
+        per_page: int = 100,
+        order_by: str = "id",
+        desc: bool = False,
+    ) -> Tuple[List[ModelType], str | None]:
+        """
+        基于游标（keyset）的分页查询，参数和返回值与 CRUDBase.get_multi_by_cursor 相同。
+
+        :raises ValueError: 游标格式不正确。
+        """
+        id_column = getattr(self.model, "id")
+        columns = [getattr(self.model, order_by)]
+        if order_by != "id":
+            columns.append(id_column)
+
+        statement = select(self.model).where(filter if filter is not None else true())
+        if cursor is not None:
+            values = decode_cursor(cursor)
+            if len(values) != len(columns):
+                raise ValueError("Invalid cursor")
+            values = [
+                CRUDBase._cursor_value(column, value)
+                for column, value in zip(columns, values)
+            ]
+            statement = statement.where(CRUDBase._after(columns, values, desc))
+        statement = statement.order_by(
+            *[c.desc() if desc else c.asc() for c in columns]
+        ).limit(per_page + 1)
+        data = list((await db.execute(statement)).scalars().all())
+
+        next_cursor = None
+        if len(data) > per_page:
+            data = data[:per_page]
+            last = data[-1]
+            next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+        return data, next_cursor
+
+    @traced(attributes=_table_attributes)
+    async def list(self, db: AsyncSession):
+        """
+        获取所有数据
+        """
+        result = await db.execute(select(self.model))
+        return result.scalars().all()
+
+    @traced(attributes=_table_attributes)
+    async def list_by_filter(self, db: AsyncSession, filter: Any):
+        """
+        根据过滤条件获取所有数据
+        """
+        result = await db.execute(select(self.model).where(filter))
+        return result.scalars().all()
@@ -1,8 +1,17 @@
-from sqlalchemy.orm import Session
-from typing import Any, Generic, List, Tuple, Type, TypeVar
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy.orm import Query, Session
+from typing import Any, Generic, List, NamedTuple, Tuple, Type, TypeVar
 from pydantic import BaseModel
-from sqlalchemy import or_
+from sqlalchemy import and_, or_, select, text, true
 from sqlalchemy.sql.elements import ColumnElement
+from app.schemas.pagination import CountStrategy
+from app.core.tracing import traced
 
 # 定义泛型类型
 ModelType = TypeVar("ModelType", bound=Any)
@@ -10,6 +19,74 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+class Page(NamedTuple, Generic[ModelType]):
+    data: List[ModelType]
+    total: int | None
+    has_more: bool
+    count_strategy: CountStrategy
+
+
+class _CountCache:
+    """
+    按过滤条件缓存 COUNT 结果的有界缓存。
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Any, Tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> int | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key: Any, value: int, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+count_cache = _CountCache()
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    将排序键的值编码为不透明的游标字符串。
+    """
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    解码游标字符串，格式不正确时抛出 ValueError。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _table_attributes(self, *args, **kwargs) -> dict[str, str]:
+    return {"db.table": self.model.__tablename__}
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """
     基础的 CRUD 操作类，提供通用的增删改查功能。
@@ -24,6 +101,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
+    @traced(attributes=_table_attributes)
     def get(self, db: Session, model_id: int) -> ModelType | None:
         """
         根据 ID 查询单个记录。
@@ -36,6 +114,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.query(self.model).filter(getattr(self.model, "id") == model_id).first()
         )
 
+    @traced(attributes=_table_attributes)
     def get_by_filter(
         self,
         db: Session,
@@ -50,6 +129,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         return db.query(self.model).filter(filter).first()
 
+    @traced(attributes=_table_attributes)
     def create(self, db: Session, obj_in: CreateSchemaType) -> ModelType:
         """
         创建一条新记录。
@@ -64,6 +144,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db.refresh(db_obj)
         return db_obj
 
+    @traced(attributes=_table_attributes)
     def update(
         self, db: Session, model_id: int, obj_in: UpdateSchemaType
     ) -> ModelType | None:
@@ -86,6 +167,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             return db_obj
         return None
 
+    @traced(attributes=_table_attributes)
     def delete(self, db: Session, model_id: int) -> ModelType | None:
         """
         删除一条记录。
@@ -103,6 +185,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             return db_obj
         return None
 
+    @traced(attributes=_table_attributes)
     def get_multi(
         self, db: Session, page: int = 1, per_page: int = 100
     ) -> Tuple[int, List[ModelType]]:
@@ -118,6 +201,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         data = db.query(self.model).offset((page - 1) * per_page).limit(per_page).all()
         return total, data
 
+    @traced(attributes=_table_attributes)
     def get_multi_by_filter(
         self,
         db: Session,
@@ -139,12 +223,246 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         data = query.offset((page - 1) * per_page).limit(per_page).all()
         return total, data
 
+    @traced(attributes=_table_attributes)
+    def get_page(
+        self,
+        db: Session,
+        filter: ColumnElement[bool] | None = None,
+        page: int = 1,
+        per_page: int = 100,
+        count: CountStrategy = "exact",
+        cache_ttl: float = 30,
+    ) -> Page[ModelType]:
+        """
+        分页查询，可选择总数的计算方式。
+
+        :param db: SQLAlchemy 的 Session 对象，用于数据库操作。
+        :param filter: SQLAlchemy 的过滤条件（布尔表达式），None 表示不过滤。
+        :param page: 当前页码（从 1 开始）。
+        :param per_page: 每页的记录数量。
+        :param count: 总数计算方式，见 CountStrategy。
+        :param cache_ttl: count 为 cached 时的缓存时间（秒）。
+        :return: Page，count_strategy 为实际使用的计算方式
+                 （例如非 MySQL 数据库无法估算时会退回 exact）。
+        """
+        query = db.query(self.model)
+        if filter is not None:
+            query = query.filter(filter)
+        # 多取一条用于判断是否还有下一页
+        data = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+        has_more = len(data) > per_page
+        data = data[:per_page]
+
+        total: int | None = None
+        if count == "none":
+            pass
+        elif count == "cached":
+            total = self._cached_count(query, filter, cache_ttl)
+        elif count == "estimated":
+            total = self._estimated_count(db, query, filter)
+            if total is None:
+                count = "exact"
+                total = query.count()
+        else:
+            total = query.count()
+        return Page(data, total, has_more, count)
+
+    def _cached_count(
+        self, query: Query, filter: ColumnElement[bool] | None, ttl: float
+    ) -> int:
+        key: Any = (self.model.__tablename__, None)
+        if filter is not None:
+            compiled = filter.compile()
+            key = (
+                self.model.__tablename__,
+                str(compiled),
+                tuple(sorted((k, repr(v)) for k, v in compiled.params.items())),
+            )
+        total = count_cache.get(key)
+        if total is None:
+            total = query.count()
+            count_cache.set(key, total, ttl)
+        return total
+
+    def _estimated_count(
+        self, db: Session, query: Query, filter: ColumnElement[bool] | None
+    ) -> int | None:
+        """
+        MySQL 下无过滤条件时读取表统计信息，有过滤条件时读取执行计划的预估行数。
+        其他数据库返回 None。
+        """
+        if db.get_bind().dialect.name != "mysql":
+            return None
+        if filter is None:
+            rows = db.execute(
+                text(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+                ),
+                {"table": self.model.__tablename__},
+            ).scalar()
+            return None if rows is None else int(rows)
+        try:
+            compiled = query.statement.compile(
+                dialect=db.get_bind().dialect,
+                compile_kwargs={"literal_binds": True},
+            )
+            plan = (
+                db.connection()
+                .exec_driver_sql(f"EXPLAIN {compiled}")
+                .mappings()
+                .first()
+            )
+        except Exception:
+            # 参数无法渲染为字面量等情况下放弃估算
+            return None
+        if plan is None or plan.get("rows") is None:
+            return None
+        # filtered 为过滤条件命中比例的百分比估算
+        filtered = float(plan.get("filtered") or 100)
+        return int(int(plan["rows"]) * filtered / 100)
+
+    @traced(attributes=_table_attributes)
+    def get_multi_by_cursor(
+        self,
+        db: Session,
+        filter: ColumnElement[bool] | None = None,
+        cursor: str | None = None,
+        per_page: int = 100,
+        order_by: str = "id",
+        desc: bool = False,
+    ) -> Tuple[List[ModelType], str | None]:
+        """
+        基于游标（keyset）的分页查询，不使用 OFFSET，翻页耗时与页码无关。
+        排序键相同时以主键 id 作为次序，保证顺序稳定。
+
+        :param db: SQLAlchemy 的 Session 对象，用于数据库操作。
+        :param filter: SQLAlchemy 的过滤条件（布尔表达式），None 表示不过滤。
+        :param cursor: 上一页返回的游标，None 表示第一页。
+        :param per_page: 每页的记录数量。
+        :param order_by: 排序字段名，应当是有索引的字段。
+        :param desc: 是否倒序。
+        :return: 包含当前页数据和下一页游标的元组：(data, next_cursor)，
+                 没有下一页时 next_cursor 为 None。
+        :raises ValueError: 游标格式不正确。
+        """
+        id_column = getattr(self.model, "id")
+        columns = [getattr(self.model, order_by)]
+        if order_by != "id":
+            columns.append(id_column)
+
+        query = db.query(self.model).filter(filter if filter is not None else true())
+        if cursor is not None:
+            values = decode_cursor(cursor)
+            if len(values) != len(columns):
+                raise ValueError("Invalid cursor")
+            values = [
+                self._cursor_value(column, value)
+                for column, value in zip(columns, values)
+            ]
+            query = query.filter(self._after(columns, values, desc))
+        query = query.order_by(*[c.desc() if desc else c.asc() for c in columns])
+        data = query.limit(per_page + 1).all()
+
+        next_cursor = None
+        if len(data) > per_page:
+            data = data[:per_page]
+            last = data[-1]
+            next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+        return data, next_cursor
+
+    @traced(attributes=_table_attributes)
+    def get_multi_by_relevance(
+        self,
+        db: Session,
+        score: ColumnElement[Any],
+        filter: ColumnElement[bool] | None = None,
+        cursor: str | None = None,
+        per_page: int = 20,
+    ) -> Tuple[List[Tuple[ModelType, float]], str | None]:
+        """
+        按相关度（例如 MATCH ... AGAINST 的结果）倒序分页，相关度相同时按 id 倒序。
+        只返回相关度大于 0 的记录，游标为 (相关度, id)。
+
+        :param db: SQLAlchemy 的 Session 对象，用于数据库操作。
+        :param score: 相关度表达式。
+        :param filter: SQLAlchemy 的过滤条件（布尔表达式），None 表示不过滤。
+        :param cursor: 上一页返回的游标，None 表示第一页。
+        :param per_page: 每页的记录数量。
+        :return: 包含 (记录, 相关度) 列表和下一页游标的元组：(data, next_cursor)。
+        :raises ValueError: 游标格式不正确。
+        """
+        id_column = getattr(self.model, "id")
+        conditions = [score > 0]
+        if filter is not None:
+            conditions.append(filter)
+        if cursor is not None:
+            values = decode_cursor(cursor)
+            if len(values) != 2:
+                raise ValueError("Invalid cursor")
+            try:
+                last_score, last_id = float(values[0]), int(values[1])
+            except (TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+            conditions.append(
+                self._after([score, id_column], [last_score, last_id], desc=True)
+            )
+        rows = db.execute(
+            select(self.model, score)
+            .where(and_(*conditions))
+            .order_by(score.desc(), id_column.desc())
+            .limit(per_page + 1)
+        ).all()
+        data = [(row[0], float(row[1])) for row in rows]
+
+        next_cursor = None
+        if len(data) > per_page:
+            data = data[:per_page]
+            last, last_score = data[-1]
+            next_cursor = encode_cursor([last_score, getattr(last, "id")])
+        return data, next_cursor
+
+    @staticmethod
+    def _cursor_value(column: Any, value: Any) -> Any:
+        """
+        把游标中的值转换为排序列的类型，类型不符时抛出 ValueError，
+        避免构造的游标把列表、对象等值传给数据库。
+        """
+        if value is None:
+            return None
+        python_type = column.type.python_type
+        if python_type in (datetime, date) and isinstance(value, str):
+            return python_type.fromisoformat(value)
+        # bool 是 int 的子类，只有布尔列接受布尔值
+        if isinstance(value, bool) != (python_type is bool):
+            raise ValueError("Invalid cursor")
+        if isinstance(value, python_type):
+            return value
+        if python_type in (float, Decimal) and isinstance(value, (int, float)):
+            return python_type(value)
+        raise ValueError("Invalid cursor")
+
+    @staticmethod
+    def _after(columns: List[Any], values: List[Any], desc: bool):
+        """
+        构造 (c1, c2, ...) 在 (v1, v2, ...) 之后的条件：
+        c1 > v1 OR (c1 = v1 AND c2 > v2) ...，倒序时使用 <。
+        """
+        conditions = []
+        for i, (column, value) in enumerate(zip(columns, values)):
+            compare = column < value if desc else column > value
+            equals = [c == v for c, v in zip(columns[:i], values[:i])]
+            conditions.append(and_(*equals, compare))
+        return or_(*conditions)
+
+    @traced(attributes=_table_attributes)
     def list(self, db: Session):
         """
         获取所有数据
         """
         return db.query(self.model).all()
 
+    @traced(attributes=_table_attributes)
     def list_by_filter(self, db: Session, filter: Any):
         """
         根据过滤条件获取所有数据
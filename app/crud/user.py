@@ -1,3 +1,5 @@
+from typing import List, Tuple
+from sqlalchemy.dialects.mysql import match
 from sqlalchemy.orm import Session
 from app.crud.crud_base import CRUDBase
 from ..database import models
@@ -7,3 +9,34 @@ from ..schemas import user_schemas
 class UserCRUD(CRUDBase[models.User, user_schemas.UserCreate, user_schemas.UserUpdate]):
     def __init__(self, model: type[models.User]):
         super().__init__(model)
+
+    # ngram 分词的默认长度（MySQL ngram_token_size），更短的关键字无法命中全文索引
+    MIN_FULLTEXT_KEYWORD = 2
+
+    def search_ranked(
+        self, db: Session, keyword: str, cursor: str | None = None, per_page: int = 20
+    ) -> Tuple[List[Tuple[models.User, float]], str | None]:
+        """
+        使用 (username, nickname, email) 上的 ngram FULLTEXT 索引搜索，按相关度排序。
+        关键字短于分词长度时退化为 username 前缀匹配（可以使用 username 索引）。
+
+        :param db: SQLAlchemy 的 Session 对象，用于数据库操作。
+        :param keyword: 搜索关键字。
+        :param cursor: 上一页返回的游标，None 表示第一页。
+        :param per_page: 每页的记录数量。
+        :return: 包含 (用户, 相关度) 列表和下一页游标的元组：(data, next_cursor)。
+        :raises ValueError: 游标格式不正确。
+        """
+        if len(keyword) < self.MIN_FULLTEXT_KEYWORD:
+            filter = self.model.username.startswith(keyword, autoescape=True)
+            data, next_cursor = self.get_multi_by_cursor(
+                db, filter, cursor, per_page, order_by="username"
+            )
+            return [(user, 1.0) for user in data], next_cursor
+        score = match(
+            self.model.username,
+            self.model.nickname,
+            self.model.email,
+            against=keyword,
+        ).in_natural_language_mode()
+        return self.get_multi_by_relevance(db, score, None, cursor, per_page)
@@ -1,3 +1,8 @@
+import itertools
+import threading
+from datetime import datetime
+from typing import NamedTuple
+from sqlalchemy import and_, delete, or_, select, update
 from sqlalchemy.orm import Session
 from app.crud.crud_base import CRUDBase
 from ..database import models
@@ -13,3 +18,138 @@ class VerificationCodeCRUD(
 ):
     def __init__(self, model: type[models.VerificationCode]):
         super().__init__(model)
+
+    def get_latest(self, db: Session, email: str) -> models.VerificationCode | None:
+        """
+        获取该邮箱最新的一条验证码，走 (email, created_at) 索引。
+        """
+        return db.scalars(
+            select(self.model)
+            .where(self.model.email == email)
+            .order_by(self.model.created_at.desc())
+            .limit(1)
+        ).first()
+
+    def consume(
+        self, db: Session, email: str, code: str, valid_since: datetime
+    ) -> bool:
+        """
+        校验并标记验证码为已使用。
+
+        :param valid_since: 早于该时间创建的验证码视为过期。
+        :return: 是否存在有效的验证码。
+        """
+        # 条件更新，同一个验证码并发校验时只有一个请求能成功
+        result = db.execute(
+            update(self.model)
+            .where(
+                and_(
+                    self.model.email == email,
+                    self.model.code == code,
+                    self.model.is_used.is_(False),
+                    self.model.created_at > valid_since,
+                )
+            )
+            .values(is_used=True)
+        )
+        db.commit()
+        return result.rowcount > 0
+
+    def purge(
+        self, db: Session, expired_before: datetime, batch_size: int = 1000
+    ) -> int:
+        """
+        分批删除过期或已使用的验证码，避免长时间锁表。
+
+        :return: 删除的记录数。
+        """
+        deleted = 0
+        while True:
+            ids = db.scalars(
+                select(self.model.id)
+                .where(
+                    or_(
+                        self.model.is_used.is_(True),
+                        self.model.created_at < expired_before,
+                    )
+                )
+                .limit(batch_size)
+            ).all()
+            if not ids:
+                return deleted
+            db.execute(delete(self.model).where(self.model.id.in_(ids)))
+            db.commit()
+            deleted += len(ids)
+
+
+class StoredCode(NamedTuple):
+    id: int
+    email: str
+    code: str
+    created_at: datetime
+
+
+class MemoryVerificationCodeStore:
+    """
+    进程内的验证码存储，接口与 VerificationCodeCRUD 中验证码服务用到的方法一致。
+    不访问数据库，多进程或多节点部署时不能使用。
+    """
+
+    def __init__(self):
+        self._codes: dict[str, list[StoredCode]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create(
+        self, db: Session | None, obj_in: verification_code_schemas.VerificationCodeCreate
+    ) -> StoredCode:
+        record = StoredCode(next(self._ids), obj_in.email, obj_in.code, datetime.now())
+        with self._lock:
+            self._codes.setdefault(record.email, []).append(record)
+        return record
+
+    def delete(self, db: Session | None, model_id: int) -> StoredCode | None:
+        with self._lock:
+            for email, records in self._codes.items():
+                for record in records:
+                    if record.id == model_id:
+                        records.remove(record)
+                        if not records:
+                            del self._codes[email]
+                        return record
+        return None
+
+    def get_latest(self, db: Session | None, email: str) -> StoredCode | None:
+        with self._lock:
+            records = self._codes.get(email)
+            return records[-1] if records else None
+
+    def consume(
+        self, db: Session | None, email: str, code: str, valid_since: datetime
+    ) -> bool:
+        with self._lock:
+            records = self._codes.get(email, [])
+            for record in records:
+                if record.code == code and record.created_at > valid_since:
+                    # 已使用的验证码直接删除
+                    records.remove(record)
+                    if not records:
+                        del self._codes[email]
+                    return True
+        return False
+
+    def purge(self, db: Session | None, expired_before: datetime) -> int:
+        deleted = 0
+        with self._lock:
+            for email in list(self._codes):
+                records = self._codes[email]
+                kept = [r for r in records if r.created_at >= expired_before]
+                deleted += len(records) - len(kept)
+                if kept:
+                    self._codes[email] = kept
+                else:
+                    del self._codes[email]
+        return deleted
+
+
+memory_verification_code_store = MemoryVerificationCodeStore()
@@ -1,8 +1,16 @@
+import logging
+import threading
+from typing import Callable, List, Sequence, Tuple
+from sqlalchemy import and_, insert
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from app.crud.crud_base import CRUDBase
 from ..database import models
 from ..schemas import wechat
 
+logger = logging.getLogger(__name__)
+
 
 class WechatMessageCRUD(
     CRUDBase[
@@ -12,9 +20,219 @@ class WechatMessageCRUD(
     def __init__(self, model: type[models.WechatMessage]):
         super().__init__(model)
 
+    def create_many(
+        self, db: Session, objs_in: Sequence[wechat.WechatMessageCreate]
+    ) -> int:
+        """
+        批量插入多条记录，使用一条多行 INSERT 语句和一个事务。
+
+        :param db: SQLAlchemy 的 Session 对象，用于数据库操作。
+        :param objs_in: 包含新记录数据的 Pydantic Schema 对象列表。
+        :return: 插入的记录数量。
+        """
+        if not objs_in:
+            return 0
+        db.execute(insert(self.model), [obj.model_dump() for obj in objs_in])
+        db.commit()
+        return len(objs_in)
+
+    def get_room_messages(
+        self,
+        db: Session,
+        roomid: str,
+        start_ts: int | None = None,
+        end_ts: int | None = None,
+        sender: str | None = None,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> Tuple[List[models.WechatMessage], str | None]:
+        """
+        按时间倒序查询群聊消息，使用 (roomid, ts) 或 (sender, ts) 索引。
+
+        :param db: SQLAlchemy 的 Session 对象，用于数据库操作。
+        :param roomid: 群聊 ID。
+        :param start_ts: 起始时间戳（包含）。
+        :param end_ts: 结束时间戳（不包含）。
+        :param sender: 只查询该发送者的消息。
+        :param cursor: 上一页返回的游标，None 表示第一页。
+        :param limit: 每页的最大条数。
+        :return: 包含消息列表和下一页游标的元组：(data, next_cursor)。
+        """
+        conditions = [self.model.roomid == roomid]
+        if sender is not None:
+            conditions.append(self.model.sender == sender)
+        if start_ts is not None:
+            conditions.append(self.model.ts >= start_ts)
+        if end_ts is not None:
+            conditions.append(self.model.ts < end_ts)
+        return self.get_multi_by_cursor(
+            db, and_(*conditions), cursor, limit, order_by="ts", desc=True
+        )
+
+    def search_content(
+        self,
+        db: Session,
+        query: str,
+        roomid: str | None = None,
+        sender: str | None = None,
+        start_ts: int | None = None,
+        end_ts: int | None = None,
+        cursor: str | None = None,
+        limit: int = 20,
+    ) -> Tuple[List[Tuple[models.WechatMessage, float]], str | None]:
+        """
+        使用 content 上的 FULLTEXT（ngram）索引全文搜索，按相关度倒序排列，
+        相关度相同时按 id 倒序，游标为 (相关度, id)。仅支持 MySQL。
+
+        :param db: SQLAlchemy 的 Session 对象，用于数据库操作。
+        :param query: 搜索内容（自然语言模式）。
+        :param roomid: 只搜索该群聊的消息。
+        :param sender: 只搜索该发送者的消息。
+        :param start_ts: 起始时间戳（包含）。
+        :param end_ts: 结束时间戳（不包含）。
+        :param cursor: 上一页返回的游标，None 表示第一页。
+        :param limit: 每页的最大条数。
+        :return: 包含 (消息, 相关度) 列表和下一页游标的元组：(data, next_cursor)。
+        :raises ValueError: 游标格式不正确。
+        """
+        score = match(self.model.content, against=query).in_natural_language_mode()
+        conditions = []
+        if roomid is not None:
+            conditions.append(self.model.roomid == roomid)
+        if sender is not None:
+            conditions.append(self.model.sender == sender)
+        if start_ts is not None:
+            conditions.append(self.model.ts >= start_ts)
+        if end_ts is not None:
+            conditions.append(self.model.ts < end_ts)
+        return self.get_multi_by_relevance(
+            db, score, and_(*conditions) if conditions else None, cursor, limit
+        )
+
 
 class WechatUserCRUD(
     CRUDBase[models.WechatUser, wechat.WechatMessageCreate, wechat.WechatUserUpdate]
 ):
     def __init__(self, model: type[models.WechatUser]):
         super().__init__(model)
+
+
+class WechatMessageWriteBuffer:
+    """
+    微信消息的写缓冲区。
+    消息先进入内存，按条数或时间间隔批量写入数据库，停机时写入剩余消息。
+    """
+
+    def __init__(
+        self,
+        crud: WechatMessageCRUD,
+        session_factory: Callable[[], Session],
+        max_size: int = 200,
+        flush_interval: float = 1,
+    ):
+        """
+        初始化 WechatMessageWriteBuffer。
+
+        :param crud: 用于写入的 WechatMessageCRUD。
+        :param session_factory: 创建 Session 的函数，后台线程使用独立的 Session。
+        :param max_size: 缓冲区达到该条数时立即写入。
+        :param flush_interval: 定时写入间隔（秒）。
+        """
+        self.crud = crud
+        self.session_factory = session_factory
+        self.max_size = max_size
+        # 数据库不可用时缓冲区最多积压的条数，超过后调用方改为同步写入
+        self.max_pending = max_size * 10
+        self.flush_interval = flush_interval
+        self._pending: list[wechat.WechatMessageCreate] = []
+        self._lock = threading.Lock()
+        # 同一时间只允许一个线程写库，保证写入顺序
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, obj_in: wechat.WechatMessageCreate) -> bool:
+        """
+        加入缓冲区。
+
+        :return: 是否已加入缓冲区，未启动或积压过多时返回 False，调用方应同步写入。
+        """
+        with self._lock:
+            if self._thread is None or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.append(obj_in)
+            if len(self._pending) >= self.max_size:
+                self._wakeup.set()
+        return True
+
+    def flush(self) -> int:
+        """
+        立即写入缓冲区中的所有消息。
+
+        :return: 写入的记录数量。
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            db = self.session_factory()
+            try:
+                written = 0
+                for i in range(0, len(batch), self.max_size):
+                    written += self._write(db, batch[i : i + self.max_size])
+                return written
+            finally:
+                db.close()
+
+    def _write(self, db: Session, batch: list[wechat.WechatMessageCreate]) -> int:
+        try:
+            return self.crud.create_many(db, batch)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(
+                f"Batch insert of {len(batch)} wechat messages failed, "
+                f"falling back to row by row: {e}"
+            )
+        # 批量写入失败（例如重复推送的消息主键冲突）时逐条写入，跳过失败的记录
+        written = 0
+        for obj_in in batch:
+            try:
+                self.crud.create_many(db, [obj_in])
+                written += 1
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error(f"Failed to save wechat message {obj_in.id}: {e}")
+        return written
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush wechat message buffer")
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="wechat-message-buffer", daemon=True
+            )
+            self._thread.start()
+
+    def close(self):
+        """停止后台线程并写入剩余消息"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        thread.join()
+        written = self.flush()
+        logger.info(f"Wechat message buffer closed, flushed {written} messages")
@@ -1,5 +1,6 @@
-from sqlalchemy import create_engine
-from sqlalchemy.engine import URL
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import CONFIG
@@ -25,6 +26,39 @@ class DbStore:
         return self.SessionLocal()
 
 
+class AsyncDbStore:
+    def __init__(self, db_url: str | URL):
+        self.db_url = make_url(db_url)
+        if self.db_url.get_backend_name() == "sqlite":
+            # sqlite+aiosqlite（测试用）不支持连接池参数
+            self.engine = create_async_engine(self.db_url, echo=False)
+        else:
+            self.engine = create_async_engine(
+                self.db_url,
+                pool_size=10,  # 设置连接池大小为10
+                max_overflow=20,  # 设置允许的最大连接数（超出连接池大小时）
+                pool_timeout=30,  # 设置获取连接的超时时间（秒）
+                pool_recycle=3600,  # 设置连接的回收时间（秒）
+                pool_pre_ping=True,  # 启用连接保活机制，自动检查连接是否有效
+                echo=False,  # 当为True时，将打印所有与数据库交互的SQL语句
+            )
+        # 提交后不让对象过期，避免在响应序列化时触发隐式的异步加载
+        self.SessionLocal = async_sessionmaker(
+            bind=self.engine, autoflush=False, expire_on_commit=False
+        )
+
+    def get_db(self) -> AsyncSession:
+        return self.SessionLocal()
+
+    async def create_all(self, metadata: MetaData):
+        """建表，主要用于 sqlite+aiosqlite 测试库"""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+
 main_db = DbStore(
     URL.create(
         "mysql",
@@ -35,3 +69,15 @@ main_db = DbStore(
         database=CONFIG.MYSQL.DATABASE,
     )
 )
+
+main_async_db = AsyncDbStore(
+    CONFIG.MYSQL.ASYNC_URL
+    or URL.create(
+        f"mysql+{CONFIG.MYSQL.ASYNC_DRIVER}",
+        username=CONFIG.MYSQL.USER,
+        password=CONFIG.MYSQL.PASSWORD,
+        host=CONFIG.MYSQL.HOST,
+        port=CONFIG.MYSQL.PORT,
+        database=CONFIG.MYSQL.DATABASE,
+    )
+)
@@ -0,0 +1,46 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_fulltext_index(
+    engine: Engine, table: str, name: str, columns: list[str]
+) -> bool:
+    """
+    创建使用 ngram 分词的 FULLTEXT 索引（支持中文），已存在时跳过。
+
+    分词长度由 MySQL 服务端的 ngram_token_size 决定（默认 2）。
+    大表上创建 FULLTEXT 索引耗时较长，只在配置开启时于启动阶段执行。
+
+    :param engine: MySQL 引擎。
+    :param table: 表名。
+    :param name: 索引名。
+    :param columns: 索引包含的列。
+    :return: 索引是否可用，非 MySQL 数据库返回 False。
+    """
+    if engine.dialect.name != "mysql":
+        logger.warning(
+            f"Skip FULLTEXT index {name}: {engine.dialect.name} is not supported"
+        )
+        return False
+    with engine.connect() as conn:
+        exists = conn.execute(
+            text(
+                "SELECT 1 FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                "AND INDEX_NAME = :name LIMIT 1"
+            ),
+            {"table": table, "name": name},
+        ).first()
+        if exists:
+            return True
+        conn.execute(
+            text(
+                f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} "
+                f"({', '.join(columns)}) WITH PARSER ngram"
+            )
+        )
+        logger.info(f"Created FULLTEXT index {name} on {table}")
+    return True
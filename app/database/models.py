@@ -8,6 +8,7 @@ from sqlalchemy import (
     Integer,
     String,
     DateTime,
+    Index,
     func,
     DECIMAL,
 )
@@ -45,7 +46,10 @@ class User(Base):
 
 class VerificationCode(Base):
     __tablename__ = "verification_codes"
-    __table_args__ = {"comment": "验证码表，存储用户验证码信息"}
+    __table_args__ = (
+        Index("ix_verification_codes_email_created_at", "email", "created_at"),
+        {"comment": "验证码表，存储用户验证码信息"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, comment="验证码ID")
     email = Column(String(40), nullable=False, comment="邮箱")
@@ -79,6 +83,10 @@ class WechatUser(Base):
 
 class WechatMessage(Base):
     __tablename__ = "wechat_message"
+    __table_args__ = (
+        Index("ix_wechat_message_roomid_ts", "roomid", "ts"),
+        Index("ix_wechat_message_sender_ts", "sender", "ts"),
+    )
 
     id = Column(BigInteger, primary_key=True)
     is_self = Column(Boolean, nullable=False)
@@ -102,5 +110,19 @@ class RoomidChatidDict(Base):
     chat_id = Column(String(255), nullable=False, comment="chat_id")
 
 
-# 创建表
-Base.metadata.create_all(bind=main_db.engine)
+def ensure_indexes():
+    """
+    create_all 不会给已存在的表补建索引，这里逐个检查并创建缺失的索引
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=main_db.engine, checkfirst=True)
+
+
+def init_db():
+    """
+    创建表并补建缺失的索引，在应用启动时调用。
+    导入本模块不再连接数据库，测试可以把模型建在 sqlite 上。
+    """
+    Base.metadata.create_all(bind=main_db.engine)
+    ensure_indexes()
@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "wechat_message_partition"
+
+
+def _month_start(year: int, month: int) -> datetime:
+    while month > 12:
+        year, month = year + 1, month - 12
+    return datetime(year, month, 1)
+
+
+def _partition_name(month_start: datetime) -> str:
+    return f"p{month_start:%Y%m}"
+
+
+def _partition_def(month_start: datetime) -> str:
+    # 分区 pYYYYMM 存放该月之前的数据，上界为下个月第一天的时间戳
+    upper = _month_start(month_start.year, month_start.month + 1)
+    return (
+        f"PARTITION {_partition_name(month_start)} "
+        f"VALUES LESS THAN ({int(upper.timestamp())})"
+    )
+
+
+def _existing_partitions(conn: Connection, table: str) -> list[str]:
+    rows = conn.execute(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+            "AND PARTITION_NAME IS NOT NULL"
+        ),
+        {"table": table},
+    )
+    return [row[0] for row in rows]
+
+
+def ensure_monthly_partitions(
+    engine: Engine, table: str = "wechat_message", months_ahead: int = 3
+):
+    """
+    按月对 ts（秒级时间戳）做范围分区，并提前创建未来几个月的分区。
+
+    MySQL 要求分区键包含在主键中，首次分区时主键会从 (id) 改为 (id, ts)。
+    多个 worker 同时启动时通过 GET_LOCK 保证只有一个执行 DDL。
+
+    :param engine: MySQL 引擎。
+    :param table: 表名。
+    :param months_ahead: 提前创建的月份数。
+    """
+    now = datetime.now()
+    months = [_month_start(now.year, now.month + i) for i in range(months_ahead + 1)]
+    with engine.connect() as conn:
+        locked = conn.execute(
+            text("SELECT GET_LOCK(:name, 10)"), {"name": LOCK_NAME}
+        ).scalar()
+        if not locked:
+            logger.warning(f"Skip partitioning {table}: lock not acquired")
+            return
+        try:
+            existing = _existing_partitions(conn, table)
+            if not existing:
+                partitions = ",\n".join(
+                    [_partition_def(m) for m in months]
+                    + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+                )
+                # 第一个分区同时容纳当前月份之前的所有历史数据
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table} "
+                        f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, ts)"
+                    )
+                )
+                conn.execute(
+                    text(f"ALTER TABLE {table} PARTITION BY RANGE (ts) ({partitions})")
+                )
+                logger.info(f"Partitioned {table} by month on ts")
+                return
+            # 只能在 pmax 之前追加比现有分区更晚的月份
+            last = max((p for p in existing if p != "pmax"), default="")
+            missing = [m for m in months if _partition_name(m) > last]
+            if missing and "pmax" in existing:
+                partitions = ",\n".join(
+                    [_partition_def(m) for m in missing]
+                    + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+                )
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table} REORGANIZE PARTITION pmax "
+                        f"INTO ({partitions})"
+                    )
+                )
+                logger.info(
+                    f"Added partitions to {table}: "
+                    f"{', '.join(_partition_name(m) for m in missing)}"
+                )
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
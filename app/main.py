@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi.staticfiles import StaticFiles
@@ -5,17 +6,108 @@ from app.core.config import CONFIG
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api._router import v1_router
-from .core.log import init_logger
+from .api import metrics
+from .core.log import init_logger, stop_logger
 import logging
 from app.service.user import UserService
+from app.service.wechat import message_buffer, reply_pool
+from app.service.wcf_cache import wcf_directory
+from app.service.clients import http_clients
+from app.database.db import main_async_db, main_db
+from app.database.partition import ensure_monthly_partitions
+from app.database.fulltext import ensure_fulltext_index
+from app.service.chat_session import warm_up_chat_id_map
+from app.service.user_state import user_state_cache
+from app.core.security import password_hasher
+from app.core.email import email_queue
+from app.core.metrics import MetricsMiddleware, registry
+from app.core.tracing import TracingMiddleware, tracer
+from app.core.scheduler import add_interval_job, scheduler
+from app.service.verification_code import VerificationCodeService
+from app.service.vector_index import message_index
+from app.service.document import document_extractor
+from app.crud.wechat import WechatMessageCRUD
+from app.database import models
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_logger()
+    await asyncio.to_thread(models.init_db)
     UserService.create_admin()
+    if CONFIG.MYSQL.PARTITION_WECHAT_MESSAGE:
+        await asyncio.to_thread(
+            ensure_monthly_partitions,
+            main_db.engine,
+            months_ahead=CONFIG.MYSQL.PARTITION_MONTHS_AHEAD,
+        )
+    if CONFIG.MYSQL.FULLTEXT_WECHAT_MESSAGE:
+        if CONFIG.MYSQL.PARTITION_WECHAT_MESSAGE:
+            logging.error("FULLTEXT index is not supported on partitioned tables")
+        else:
+            await asyncio.to_thread(
+                ensure_fulltext_index,
+                main_db.engine,
+                "wechat_message",
+                "ft_wechat_message_content",
+                ["content"],
+            )
+    if CONFIG.MYSQL.FULLTEXT_USERS:
+        await asyncio.to_thread(
+            ensure_fulltext_index,
+            main_db.engine,
+            "users",
+            "ft_users_search",
+            ["username", "nickname", "email"],
+        )
+    await http_clients.astart()
+    await asyncio.to_thread(wcf_directory.start)
+    await asyncio.to_thread(warm_up_chat_id_map)
+    if CONFIG.JWT.TRUST_CLAIMS:
+        await asyncio.to_thread(user_state_cache.start)
+    if message_index is not None:
+        await asyncio.to_thread(
+            message_index.start,
+            main_db.get_db,
+            WechatMessageCRUD(models.WechatMessage),
+        )
+    message_buffer.start()
+    reply_pool.start()
+    email_queue.start()
+    add_interval_job(
+        "purge_verification_codes",
+        VerificationCodeService.purge_expired,
+        CONFIG.VERIFICATION_CODE.PURGE_INTERVAL,
+    )
+    if CONFIG.MYSQL.PARTITION_WECHAT_MESSAGE:
+        # 每天检查一次，保证未来月份的分区始终存在
+        add_interval_job(
+            "ensure_wechat_message_partitions",
+            ensure_monthly_partitions,
+            24 * 3600,
+            args=[main_db.engine],
+            kwargs={"months_ahead": CONFIG.MYSQL.PARTITION_MONTHS_AHEAD},
+        )
+    scheduler.start()
+    registry.start()
+    tracer.start()
     logging.info("Starting up OK")
     yield
+    scheduler.shutdown()
+    await asyncio.to_thread(registry.stop)
+    await asyncio.to_thread(reply_pool.shutdown, CONFIG.WEBHOOK.DRAIN_TIMEOUT)
+    await asyncio.to_thread(message_buffer.close)
+    if message_index is not None:
+        await asyncio.to_thread(message_index.stop)
+    await asyncio.to_thread(email_queue.shutdown, CONFIG.EMAIL.DRAIN_TIMEOUT)
+    wcf_directory.stop()
+    user_state_cache.stop()
+    await http_clients.aclose()
+    await main_async_db.dispose()
+    await asyncio.to_thread(password_hasher.shutdown)
+    await asyncio.to_thread(document_extractor.shutdown)
+    await asyncio.to_thread(tracer.shutdown, CONFIG.WEBHOOK.DRAIN_TIMEOUT)
+    stop_logger()
 
 
 app = FastAPI(
@@ -34,4 +126,10 @@ app.add_middleware(
 )
 
 app.include_router(v1_router)
+if CONFIG.METRICS.ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
+if CONFIG.TRACING.ENABLED:
+    # 最后添加的中间件最先执行，请求 ID 对其他中间件中的日志同样可见
+    app.add_middleware(TracingMiddleware)
 # app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -0,0 +1,7 @@
+from typing import Literal
+
+# exact: COUNT(*) 精确计数
+# cached: 按过滤条件缓存精确计数若干秒
+# estimated: 使用表统计信息或执行计划估算
+# none: 不计数，只返回是否还有下一页
+CountStrategy = Literal["exact", "cached", "estimated", "none"]
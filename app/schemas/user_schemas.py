@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import Literal, Sequence
 from datetime import datetime
+from .pagination import CountStrategy
 
 
 class UserRegister(BaseModel):
@@ -64,7 +65,14 @@ class UserInResponse(BaseModel):
 
 class UsersResponse(BaseModel):
     data: Sequence[UserInResponse]
-    total: int
+    total: int | None = Field(
+        default=None, description="总数，游标分页或 count=none 时不返回"
+    )
+    next_cursor: str | None = Field(default=None, description="下一页游标")
+    has_more: bool | None = Field(default=None, description="是否还有下一页")
+    count_strategy: CountStrategy | None = Field(
+        default=None, description="总数的计算方式"
+    )
 
 
 class UserChangePassword(BaseModel):
@@ -1,6 +1,7 @@
 from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel
+from typing import Sequence
+from pydantic import BaseModel, ConfigDict
 
 
 class MessageType(Enum):
@@ -67,6 +68,37 @@ class WechatMessageUpdate(WechatMessage):
     pass
 
 
+class WechatMessageInResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    is_self: bool
+    is_group: bool
+    type: int
+    ts: int
+    roomid: str | None = None
+    content: str | None = None
+    sender: str
+    sign: str | None = None
+    thumb: str | None = None
+    extra: str | None = None
+
+
+class WechatMessagesResponse(BaseModel):
+    data: Sequence[WechatMessageInResponse]
+    next_cursor: str | None = None
+
+
+class ScoredWechatMessage(BaseModel):
+    score: float
+    message: WechatMessageInResponse
+
+
+class WechatMessageSearchResponse(BaseModel):
+    data: Sequence[ScoredWechatMessage]
+    next_cursor: str | None = None
+
+
 class WechatUserCreate(BaseModel):
     wxid: str
     nickname: str
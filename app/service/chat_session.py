@@ -0,0 +1,136 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import CONFIG
+from app.crud.roomid_chatid_dict import RoomidChatidDictCRUD
+from app.database import models
+from app.database.db import main_db
+from app.schemas.roomid_chatid_dict import RoomidChatidDictCreate
+
+logger = logging.getLogger(__name__)
+
+
+class ChatIdMap:
+    """
+    roomid -> GingAI chat_id 的内存 LRU 映射，写穿到 roomid_chatid_dict 表。
+
+    同一个 roomid 同一时间只有一个调用方创建会话，其余调用方等待其结果，
+    避免并发 @ 时重复打开 GingAI 会话或主键冲突。
+    """
+
+    def __init__(self, crud: RoomidChatidDictCRUD, maxsize: int = 10000):
+        """
+        初始化 ChatIdMap。
+
+        :param crud: roomid_chatid_dict 表的 CRUD。
+        :param maxsize: 内存中最多缓存的映射数量。
+        """
+        self.crud = crud
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, str] = OrderedDict()
+        self._inflight: dict[str, Future[str]] = {}
+        self._lock = threading.Lock()
+
+    def _put(self, roomid: str, chat_id: str):
+        # 调用方需持有 self._lock
+        self._data[roomid] = chat_id
+        self._data.move_to_end(roomid)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def warm_up(self, db: Session):
+        """启动时从数据库加载映射"""
+        rows = self.crud.list(db)
+        with self._lock:
+            for row in rows[-self.maxsize :]:
+                self._put(str(row.roomid), str(row.chat_id))
+        logger.info(f"Loaded {len(self._data)} roomid -> chat_id mappings")
+
+    def get(self, roomid: str) -> str | None:
+        with self._lock:
+            chat_id = self._data.get(roomid)
+            if chat_id is not None:
+                self._data.move_to_end(roomid)
+            return chat_id
+
+    def invalidate(self, roomid: str):
+        with self._lock:
+            self._data.pop(roomid, None)
+
+    def get_or_create(
+        self, db: Session, roomid: str, create_chat_id: Callable[[], str]
+    ) -> str:
+        """
+        获取 roomid 对应的 chat_id，不存在时调用 create_chat_id 创建并写入数据库。
+
+        :param db: SQLAlchemy 的 Session 对象，用于数据库操作。
+        :param roomid: 群聊 ID。
+        :param create_chat_id: 打开新 GingAI 会话并返回 chat_id 的函数。
+        :return: chat_id。
+        """
+        with self._lock:
+            chat_id = self._data.get(roomid)
+            if chat_id is not None:
+                self._data.move_to_end(roomid)
+                return chat_id
+            future = self._inflight.get(roomid)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[roomid] = future
+        assert future is not None
+        if not owner:
+            return future.result()
+
+        try:
+            chat_id = self._load_or_create(db, roomid, create_chat_id)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(roomid, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._put(roomid, chat_id)
+            self._inflight.pop(roomid, None)
+        future.set_result(chat_id)
+        return chat_id
+
+    def _load_or_create(
+        self, db: Session, roomid: str, create_chat_id: Callable[[], str]
+    ) -> str:
+        # 缓存容量不足被淘汰，或由其他进程创建的映射
+        row = self.crud.get_by_filter(db, self.crud.model.roomid == roomid)
+        if row is not None:
+            return str(row.chat_id)
+        chat_id = create_chat_id()
+        try:
+            self.crud.create(
+                db, RoomidChatidDictCreate(chat_id=chat_id, roomid=roomid)
+            )
+        except IntegrityError:
+            # 其他 worker 进程抢先写入，以数据库中的记录为准
+            db.rollback()
+            row = self.crud.get_by_filter(db, self.crud.model.roomid == roomid)
+            if row is None:
+                raise
+            logger.warning(f"chat_id for room {roomid} was created concurrently")
+            return str(row.chat_id)
+        return chat_id
+
+
+chat_id_map = ChatIdMap(
+    RoomidChatidDictCRUD(models.RoomidChatidDict),
+    maxsize=CONFIG.GINGAI.CHAT_ID_CACHE_SIZE,
+)
+
+
+def warm_up_chat_id_map():
+    db = main_db.get_db()
+    try:
+        chat_id_map.warm_up(db)
+    finally:
+        db.close()
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine, TypeVar
+import httpx
+from app.core.config import CONFIG, HTTPClientSettings
+from .gingai import AsyncGingAIClient, GingAIClient, GingAIOptions
+from .wcf import WcfClient
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HTTPClients:
+    """
+    进程内共享的 WCF / GingAI 客户端。
+
+    每个 worker 进程只创建一份客户端，请求之间复用同一个连接池，
+    避免每次请求都重新建立 TCP/TLS 连接。在 lifespan 中创建和关闭。
+    """
+
+    def __init__(self, settings: HTTPClientSettings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._wcf: WcfClient | None = None
+        self._gingai: dict[tuple[str, str, str], GingAIClient] = {}
+        self._async_gingai: AsyncGingAIClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _pool_kwargs(self):
+        return {
+            "pool_connections": self.settings.POOL_CONNECTIONS,
+            "pool_maxsize": self.settings.POOL_MAXSIZE,
+            "pool_block": self.settings.POOL_BLOCK,
+            "timeout": self.settings.TIMEOUT,
+        }
+
+    def wcf(self) -> WcfClient:
+        if self._wcf is None:
+            with self._lock:
+                if self._wcf is None:
+                    self._wcf = WcfClient(CONFIG.WCF.API_BASE, **self._pool_kwargs())
+        return self._wcf
+
+    def gingai(self, options: GingAIOptions | None = None) -> GingAIClient:
+        """
+        获取 GingAI 客户端，相同配置的调用方共享同一个客户端。
+
+        :param options: GingAI 配置，None 表示使用配置文件中的默认应用。
+        """
+        if options is None:
+            options = GingAIOptions(
+                api_base=CONFIG.GINGAI.API_BASE,
+                api_key=CONFIG.GINGAI.API_KEY,
+                application_id=CONFIG.GINGAI.APP_ID,
+            )
+        key = (options.api_base, options.api_key, options.application_id)
+        client = self._gingai.get(key)
+        if client is None:
+            with self._lock:
+                client = self._gingai.get(key)
+                if client is None:
+                    client = GingAIClient(
+                        api_base=options.api_base,
+                        api_key=options.api_key,
+                        application_id=options.application_id,
+                        **self._pool_kwargs(),
+                    )
+                    self._gingai[key] = client
+        return client
+
+    def async_gingai(self) -> AsyncGingAIClient | None:
+        """默认应用的异步客户端，未在 lifespan 中启动时返回 None"""
+        return self._async_gingai
+
+    def run_coroutine(self, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        在应用事件循环中执行协程并等待结果，供后台线程调用异步客户端。
+        不能在事件循环线程中调用。
+        """
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError("Event loop is not bound, call astart() first")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def start(self):
+        """预先创建默认客户端"""
+        self.wcf()
+        self.gingai()
+
+    async def astart(self):
+        """创建异步客户端并绑定当前事件循环"""
+        self.start()
+        self._loop = asyncio.get_running_loop()
+        self._async_gingai = AsyncGingAIClient(
+            api_base=CONFIG.GINGAI.API_BASE,
+            api_key=CONFIG.GINGAI.API_KEY,
+            application_id=CONFIG.GINGAI.APP_ID,
+            limits=httpx.Limits(
+                max_connections=self.settings.MAX_CONNECTIONS,
+                max_keepalive_connections=self.settings.POOL_MAXSIZE,
+                keepalive_expiry=self.settings.KEEPALIVE_EXPIRY,
+            ),
+            timeout=self.settings.TIMEOUT,
+        )
+
+    async def aclose(self):
+        """关闭同步和异步客户端"""
+        if self._async_gingai is not None:
+            await self._async_gingai.aclose()
+            self._async_gingai = None
+        self._loop = None
+        self.close()
+
+    def close(self):
+        """关闭所有客户端的连接池"""
+        with self._lock:
+            clients: list[WcfClient | GingAIClient] = list(self._gingai.values())
+            if self._wcf is not None:
+                clients.append(self._wcf)
+            self._wcf = None
+            self._gingai = {}
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close http client: {e}")
+        logger.info("HTTP clients closed")
+
+
+http_clients = HTTPClients(CONFIG.HTTP_CLIENT)
@@ -0,0 +1,300 @@
+import codecs
+import hashlib
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Iterator
+import docx2txt
+import PyPDF2
+from PyPDF2 import PdfReader
+from app.core.config import CONFIG
+from .document_cache import ExtractionCache
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+# 修改提取逻辑时递增，使缓存中旧版本的结果失效
+EXTRACTOR_VERSION = 1
+EXTRACTORS = {
+    "pdf": ("pdf", f"{EXTRACTOR_VERSION}/PyPDF2-{PyPDF2.__version__}"),
+    "doc": ("docx", f"{EXTRACTOR_VERSION}/docx2txt"),
+    "docx": ("docx", f"{EXTRACTOR_VERSION}/docx2txt"),
+    "md": ("text", f"{EXTRACTOR_VERSION}/utf-8"),
+    "txt": ("text", f"{EXTRACTOR_VERSION}/utf-8"),
+}
+
+# 工作进程内缓存最近打开的 PDF，同一个文档的多页只解析一次 xref。
+# 键为内容的 SHA-256：临时文件名可能被复用，PdfReader 已将内容读入内存
+_reader_cache: tuple[str, PdfReader] | None = None
+
+
+class DocumentError(ValueError):
+    """文档无法解析"""
+
+
+class DocumentTooLarge(DocumentError):
+    """文档超过大小限制"""
+
+
+class PageTimeout(Exception):
+    """单页解析超时"""
+
+
+def _raise_timeout(signum, frame):
+    raise PageTimeout()
+
+
+@contextmanager
+def _alarm(timeout: float):
+    """超时后通过 SIGALRM 抛出 PageTimeout，只能在工作进程的主线程中使用"""
+    use_alarm = timeout > 0 and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _get_reader(path: str, digest: str) -> PdfReader:
+    global _reader_cache
+    if _reader_cache is None or _reader_cache[0] != digest:
+        _reader_cache = (digest, PdfReader(path))
+    return _reader_cache[1]
+
+
+def _count_pdf_pages(path: str, digest: str, timeout: float) -> int:
+    """在工作进程中解析 xref 并返回页数，之后同一进程解析各页时复用"""
+    with _alarm(timeout):
+        return len(_get_reader(path, digest).pages)
+
+
+def _extract_pdf_page(path: str, digest: str, page_number: int, timeout: float) -> str:
+    """在工作进程中解析单页，超时通过 SIGALRM 中断"""
+    with _alarm(timeout):
+        return _get_reader(path, digest).pages[page_number].extract_text() or ""
+
+
+class DocumentExtractor:
+    """
+    上传文件的文本提取。
+
+    上传内容先按块写入磁盘临时文件（不整体读入内存），PDF 各页在进程池中并行解析，
+    按页序以生成器的形式返回文本；单页解析超时或失败时跳过该页。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 20 * 1024 * 1024,
+        max_pages: int = 500,
+        page_timeout: float = 10,
+        workers: int = 2,
+        spool_dir: str | None = None,
+        cache: ExtractionCache | None = None,
+    ):
+        """
+        初始化 DocumentExtractor。
+
+        :param max_bytes: 上传文件大小上限（字节）。
+        :param max_pages: PDF 最多解析的页数，超过的部分忽略。
+        :param page_timeout: 单页解析超时时间（秒）。
+        :param workers: 解析 PDF 的进程数。
+        :param spool_dir: 临时文件目录，None 表示系统临时目录。
+        :param cache: 提取结果缓存，None 表示不缓存。
+        """
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self.workers = workers
+        self.spool_dir = spool_dir
+        self.cache = cache
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 服务进程中有多个线程，使用 spawn 避免 fork 时复制锁的状态
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        # 工作进程异常退出（例如内存不足被杀）后进程池不可再用，下次使用时重新创建
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def spool(self, file: BinaryIO, suffix: str = "") -> tuple[str, str]:
+        """
+        将上传内容按块写入临时文件，同时计算 SHA-256。
+
+        :return: (临时文件路径, 内容的 SHA-256)，调用方负责删除临时文件。
+        :raises DocumentTooLarge: 超过大小限制。
+        """
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.spool_dir)
+        digest = hashlib.sha256()
+        try:
+            size = 0
+            with os.fdopen(fd, "wb") as out:
+                while chunk := file.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        limit = self.max_bytes // 1024 // 1024
+                        raise DocumentTooLarge(f"File size exceeds {limit}MB limit.")
+                    out.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path, digest.hexdigest()
+
+    def _count_pages(self, executor: ProcessPoolExecutor, path: str, digest: str):
+        """在进程池中读取页数，和单页解析使用相同的超时"""
+        try:
+            future = executor.submit(_count_pdf_pages, path, digest, self.page_timeout)
+            return future.result(timeout=self.page_timeout * 2 + 5)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise DocumentError("PDF extraction worker exited unexpectedly")
+        except (PageTimeout, FutureTimeoutError):
+            raise DocumentError("Timeout reading PDF structure")
+        except Exception as e:
+            raise DocumentError(f"Invalid PDF: {e}")
+
+    def iter_pdf(
+        self, path: str, digest: str, failed_pages: list[int] | None = None
+    ) -> Iterator[str]:
+        """
+        按页序返回各页文本（以换行结尾），同时在解析中的页数不超过进程数的两倍。
+
+        :param digest: 文件内容的 SHA-256，工作进程以此复用已打开的 PdfReader。
+        :param failed_pages: 传入列表时，记录超时或解析失败而被跳过的页码。
+        """
+        executor = self._get_executor()
+        page_count = min(self._count_pages(executor, path, digest), self.max_pages)
+        pending: deque[tuple[int, Future]] = deque()
+        next_page = 0
+        try:
+            while pending or next_page < page_count:
+                while next_page < page_count and len(pending) < self.workers * 2:
+                    try:
+                        future = executor.submit(
+                            _extract_pdf_page,
+                            path,
+                            digest,
+                            next_page,
+                            self.page_timeout,
+                        )
+                    except BrokenProcessPool:
+                        self._discard_executor(executor)
+                        raise DocumentError("PDF extraction worker exited unexpectedly")
+                    pending.append((next_page, future))
+                    next_page += 1
+                page_number, future = pending.popleft()
+                try:
+                    # 工作进程内的超时之外再加一层保护，避免无限等待
+                    yield future.result(timeout=self.page_timeout * 2 + 5) + "\n"
+                except (PageTimeout, FutureTimeoutError):
+                    logger.warning(f"Timeout extracting page {page_number} of {path}")
+                    if failed_pages is not None:
+                        failed_pages.append(page_number)
+                except BrokenProcessPool:
+                    self._discard_executor(executor)
+                    raise DocumentError("PDF extraction worker exited unexpectedly")
+                except Exception as e:
+                    logger.warning(f"Failed to extract page {page_number}: {e}")
+                    if failed_pages is not None:
+                        failed_pages.append(page_number)
+        finally:
+            # 调用方提前停止读取时取消尚未开始的页
+            for _, future in pending:
+                future.cancel()
+
+    @staticmethod
+    def iter_plain_text(path: str) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+    def iter_text(self, file: BinaryIO, filename: str) -> Iterator[str]:
+        """
+        提取上传文件的文本，以生成器的形式分段返回。
+        命中缓存时直接返回缓存的文本；完整提取（没有跳过任何页）后写入缓存。
+
+        :param file: 上传文件对象。
+        :param filename: 文件名，用于判断文件类型。
+        :raises DocumentError: 文件类型不支持、超过大小限制或无法解析。
+        """
+        ext = filename.split(".")[-1].lower()
+        if ext not in EXTRACTORS:
+            raise DocumentError(f"Unsupported file type: .{ext}")
+        extractor, version = EXTRACTORS[ext]
+        if extractor == "pdf":
+            # 超过 max_pages 的部分不提取，页数上限不同时结果不同
+            version = f"{version}/max_pages={self.max_pages}"
+        path, digest = self.spool(file, suffix=f".{ext}")
+        try:
+            if self.cache is not None:
+                cached = self.cache.get(digest, extractor, version)
+                if cached is not None:
+                    yield cached
+                    return
+            failed_pages: list[int] = []
+            if extractor == "pdf":
+                parts = self.iter_pdf(path, digest, failed_pages)
+            elif extractor == "docx":
+                parts = iter([docx2txt.process(path)])
+            else:
+                parts = self.iter_plain_text(path)
+            extracted = []
+            for part in parts:
+                extracted.append(part)
+                yield part
+            if self.cache is not None and not failed_pages:
+                self.cache.put(digest, extractor, version, "".join(extracted))
+        finally:
+            os.remove(path)
+
+    def extract_text(self, file: BinaryIO, filename: str) -> str:
+        """提取上传文件的全部文本"""
+        return "".join(self.iter_text(file, filename))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+
+document_extractor = DocumentExtractor(
+    max_bytes=CONFIG.DOCUMENT.MAX_BYTES,
+    max_pages=CONFIG.DOCUMENT.MAX_PAGES,
+    page_timeout=CONFIG.DOCUMENT.PAGE_TIMEOUT,
+    workers=CONFIG.DOCUMENT.WORKERS,
+    spool_dir=CONFIG.DOCUMENT.SPOOL_DIR,
+    cache=(
+        ExtractionCache(CONFIG.DOCUMENT.CACHE_DIR, CONFIG.DOCUMENT.CACHE_MAX_BYTES)
+        if CONFIG.DOCUMENT.CACHE_ENABLED
+        else None
+    ),
+)
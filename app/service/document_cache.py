@@ -0,0 +1,174 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    按上传内容的 SHA-256 缓存提取出的文本。
+
+    文本保存在 <directory>/<前两位>/<digest>.txt，元数据（大小、提取器及版本、
+    访问时间）保存在同目录的 SQLite 中。总大小超过上限时按最近访问时间淘汰；
+    提取器或版本与当前不一致的条目视为失效。
+    读写缓存出错时只记录日志，按未命中处理，不影响提取本身。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        初始化 ExtractionCache。
+
+        :param directory: 缓存目录。
+        :param max_bytes: 缓存文本总大小上限（字节）。
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(
+                os.path.join(self.directory, "index.sqlite3"),
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "digest TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                "extractor TEXT NOT NULL, version TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entries_accessed_at "
+                "ON entries (accessed_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.txt")
+
+    def _remove(self, db: sqlite3.Connection, digest: str):
+        db.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def get(self, digest: str, extractor: str, version: str) -> str | None:
+        """
+        读取缓存。
+
+        :return: 缓存的文本，未命中、由其他提取器/版本生成或读取出错时返回 None。
+        """
+        try:
+            return self._get(digest, extractor, version)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Failed to read extraction cache {digest}: {e}")
+            self.misses += 1
+            return None
+
+    def _get(self, digest: str, extractor: str, version: str) -> str | None:
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT extractor, version FROM entries WHERE digest = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row != (extractor, version):
+                # 提取器升级后旧结果不再使用
+                self._remove(db, digest)
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(digest), encoding="utf-8") as f:
+                    text = f.read()
+            except FileNotFoundError:
+                self._remove(db, digest)
+                self.misses += 1
+                return None
+            db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE digest = ?",
+                (time.time(), digest),
+            )
+            self.hits += 1
+            return text
+
+    def put(self, digest: str, extractor: str, version: str, text: str):
+        """写入缓存，超过大小上限时淘汰最久未访问的条目；写入出错时跳过"""
+        data = text.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        try:
+            self._put(digest, extractor, version, data)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Failed to write extraction cache {digest}: {e}")
+
+    def _put(self, digest: str, extractor: str, version: str, data: bytes):
+        path = self._path(digest)
+        with self._lock:
+            db = self._db()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 多个进程共用缓存目录，每次写入使用独立的临时文件
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, len(data), extractor, version, now, now),
+            )
+            self._evict(db)
+
+    def _evict(self, db: sqlite3.Connection):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with closing(
+            db.execute("SELECT digest, size FROM entries ORDER BY accessed_at")
+        ) as rows:
+            victims = []
+            for digest, size in rows:
+                if total <= self.max_bytes:
+                    break
+                victims.append(digest)
+                total -= size
+        for digest in victims:
+            self._remove(db, digest)
+        logger.info(f"Evicted {len(victims)} entries from extraction cache")
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            return {
+                "entries": count,
+                "size": total,
+                "max_size": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,9 +1,15 @@
+import json
+import time
+import httpx
 import requests
-from typing import Any, TypedDict
+from typing import Any, AsyncIterator, TypedDict
 from pydantic import BaseModel
 import logging
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from app.core.log import log_payload
+from app.core.metrics import stage_latency
+from app.core.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -65,7 +71,16 @@ class GingAIClient:
     GingAI客户端类，用于与GingAI API进行交互。
     """
 
-    def __init__(self, api_base: str, api_key: str, application_id: str):
+    def __init__(
+        self,
+        api_base: str,
+        api_key: str,
+        application_id: str,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        timeout: float | None = None,
+    ):
         """
         初始化GingAIClient。
 
@@ -73,10 +88,15 @@ class GingAIClient:
         api_base (str): API的基础URL。
         api_key (str): 用于身份验证的API密钥。
         application_id (str): 应用程序的ID。
+        pool_connections (int, 可选): 连接池缓存的主机数。
+        pool_maxsize (int, 可选): 每个主机保持的长连接数。
+        pool_block (bool, 可选): 连接数达到pool_maxsize时是否等待空闲连接。
+        timeout (float, 可选): 请求超时时间（秒）。
         """
         self.api_base = api_base
         self.api_key = api_key
         self.application_id = application_id
+        self.timeout = timeout
         self.session = requests.Session()
         self.session.headers.update({"Content-Type": "application/json"})
         self.session.headers.update({"AUTHORIZATION": f"{self.api_key}"})
@@ -88,10 +108,21 @@ class GingAIClient:
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["HEAD", "GET", "POST"],
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
 
+    def close(self):
+        """
+        关闭会话，释放连接池中的连接。
+        """
+        self.session.close()
+
     def _handle_response(self, response: requests.Response) -> GingAIResponseBase:
         """
         处理请求响应，检查状态码和响应内容。
@@ -118,6 +149,7 @@ class GingAIClient:
             logger.error(f"Invalid JSON response: {e}")
             raise GingAIError(f"Invalid JSON response: {e}")
 
+    @traced("gingai.get_chat_id")
     def get_chat_id(self) -> str:
         """
         获取聊天ID。
@@ -129,11 +161,12 @@ class GingAIClient:
         GingAIError: 如果请求失败或返回非预期结果。
         """
         url = f"{self.api_base}/application/{self.application_id}/chat/open"
-        logger.info(f"Sending request to {url}")
-        response = self.session.get(url)
+        logger.debug(f"Sending request to {url}")
+        response = self.session.get(url, timeout=self.timeout)
         ging_resp = self._handle_response(response)
         return ging_resp["data"]
 
+    @traced("gingai.chat")
     def chat(self, chat_id: str, message: str, re_chat: bool = False):
         """
         发送聊天消息并获取响应。
@@ -151,12 +184,251 @@ class GingAIClient:
         """
         url = f"{self.api_base}/application/chat_message/{chat_id}"
         data = {"message": message, "re_chat": re_chat, "stream": False}
-        logger.info(f"Sending request to {url} with data: {data}")
-        response = self.session.post(url, json=data)
-        ging_resp = self._handle_response(response)
+        log_payload(
+            logger, "Sending request to %s with data: %s", url, build=lambda: data
+        )
+        with stage_latency.time(stage="gingai_chat"):
+            response = self.session.post(url, json=data, timeout=self.timeout)
+            ging_resp = self._handle_response(response)
         return GingAIChatResponse(ging_resp)
 
 
+# 句子结束标点，流式回复在这些位置分段
+SENTENCE_BOUNDARIES = "。！？；!?;\n"
+
+
+class AsyncGingAIClient:
+    """
+    基于httpx的异步GingAI客户端，支持流式聊天接口。
+    """
+
+    def __init__(
+        self,
+        api_base: str,
+        api_key: str,
+        application_id: str,
+        limits: httpx.Limits | None = None,
+        timeout: float | None = None,
+    ):
+        """
+        初始化AsyncGingAIClient。
+
+        参数:
+        api_base (str): API的基础URL。
+        api_key (str): 用于身份验证的API密钥。
+        application_id (str): 应用程序的ID。
+        limits (httpx.Limits, 可选): 连接池限制。
+        timeout (float, 可选): 请求超时时间（秒）。
+        """
+        self.api_base = api_base
+        self.api_key = api_key
+        self.application_id = application_id
+        self.client = httpx.AsyncClient(
+            headers={
+                "Content-Type": "application/json",
+                "AUTHORIZATION": f"{self.api_key}",
+            },
+            limits=limits or httpx.Limits(),
+            timeout=timeout,
+        )
+        # 首字延迟统计
+        self._first_token_count = 0
+        self._first_token_total = 0.0
+        self._first_token_max = 0.0
+
+    async def aclose(self):
+        """
+        关闭客户端，释放连接池中的连接。
+        """
+        await self.client.aclose()
+
+    def _handle_json(self, json_data: Any) -> GingAIResponseBase:
+        if not isinstance(json_data, dict):
+            raise GingAIError(f"Unexpected response: {json_data}")
+        if json_data.get("code") != 200:
+            raise GingAIError(json_data.get("message", "Unknown error"))
+        return GingAIResponseBase(**json_data)
+
+    def _handle_response(self, response: httpx.Response) -> GingAIResponseBase:
+        try:
+            response.raise_for_status()
+            return self._handle_json(response.json())
+        except httpx.HTTPError as e:
+            logger.error(f"Request failed: {e}")
+            raise GingAIError(f"Request failed: {e}")
+        except ValueError as e:
+            logger.error(f"Invalid JSON response: {e}")
+            raise GingAIError(f"Invalid JSON response: {e}")
+
+    @traced("gingai.get_chat_id")
+    async def get_chat_id(self) -> str:
+        """
+        获取聊天ID。
+
+        返回:
+        str: 聊天ID。
+
+        抛出:
+        GingAIError: 如果请求失败或返回非预期结果。
+        """
+        url = f"{self.api_base}/application/{self.application_id}/chat/open"
+        logger.debug(f"Sending request to {url}")
+        try:
+            response = await self.client.get(url)
+        except httpx.HTTPError as e:
+            raise GingAIError(f"Request failed: {e}")
+        return self._handle_response(response)["data"]
+
+    @traced("gingai.chat")
+    async def chat(self, chat_id: str, message: str, re_chat: bool = False):
+        """
+        发送聊天消息并等待完整响应。
+
+        参数:
+        chat_id (str): 聊天ID。
+        message (str): 要发送的消息内容。
+        re_chat (bool, 可选): 是否重新开始聊天，默认为False。
+
+        返回:
+        GingAIChatResponse: 聊天响应信息。
+        """
+        url = f"{self.api_base}/application/chat_message/{chat_id}"
+        data = {"message": message, "re_chat": re_chat, "stream": False}
+        log_payload(
+            logger, "Sending request to %s with data: %s", url, build=lambda: data
+        )
+        try:
+            response = await self.client.post(url, json=data)
+        except httpx.HTTPError as e:
+            raise GingAIError(f"Request failed: {e}")
+        return GingAIChatResponse(self._handle_response(response))
+
+    @traced("gingai.chat_stream")
+    async def chat_stream(
+        self, chat_id: str, message: str, re_chat: bool = False
+    ) -> AsyncIterator[ChatInfo]:
+        """
+        以流式模式发送聊天消息，逐块返回增量内容。
+
+        参数:
+        chat_id (str): 聊天ID。
+        message (str): 要发送的消息内容。
+        re_chat (bool, 可选): 是否重新开始聊天，默认为False。
+
+        返回:
+        AsyncIterator[ChatInfo]: 增量聊天信息，content为本块新增的内容。
+
+        抛出:
+        GingAIError: 如果请求失败或返回非预期结果。
+        """
+        url = f"{self.api_base}/application/chat_message/{chat_id}"
+        data = {"message": message, "re_chat": re_chat, "stream": True}
+        log_payload(
+            logger, "Sending stream request to %s with data: %s", url, build=lambda: data
+        )
+        started_at = time.perf_counter()
+        first_token = True
+        try:
+            async with self.client.stream("POST", url, json=data) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise GingAIError(
+                        f"Request failed: {response.status_code} {response.text}"
+                    )
+                if not response.headers.get("content-type", "").startswith(
+                    "text/event-stream"
+                ):
+                    # 服务端没有按流式返回时，按普通响应处理
+                    await response.aread()
+                    yield self._handle_response(response)["data"]
+                    return
+                async for line in response.aiter_lines():
+                    chunk = self._parse_event(line)
+                    if chunk is None:
+                        continue
+                    if first_token and chunk.get("content"):
+                        first_token = False
+                        self._record_first_token(time.perf_counter() - started_at)
+                    yield chunk
+                    if chunk.get("is_end"):
+                        return
+        except httpx.HTTPError as e:
+            logger.error(f"Stream request failed: {e}")
+            raise GingAIError(f"Request failed: {e}")
+
+    def _parse_event(self, line: str) -> ChatInfo | None:
+        """
+        解析一行SSE数据，非data行返回None。
+        """
+        line = line.strip()
+        if not line.startswith("data:"):
+            return None
+        payload = line[len("data:") :].strip()
+        if not payload:
+            return None
+        try:
+            json_data = json.loads(payload)
+        except ValueError as e:
+            logger.error(f"Invalid stream chunk: {e}")
+            raise GingAIError(f"Invalid stream chunk: {e}")
+        # 出错时服务端会在流中返回带code的普通响应
+        if "code" in json_data and "content" not in json_data:
+            return self._handle_json(json_data)["data"]
+        return ChatInfo(**json_data)
+
+    def _record_first_token(self, latency: float):
+        self._first_token_count += 1
+        self._first_token_total += latency
+        self._first_token_max = max(self._first_token_max, latency)
+        logger.info(f"GingAI first token latency: {latency * 1000:.0f} ms")
+
+    def stats(self) -> dict[str, Any]:
+        """
+        返回首字延迟统计。
+        """
+        count = self._first_token_count
+        return {
+            "first_token_count": count,
+            "first_token_avg_ms": (
+                self._first_token_total / count * 1000 if count else 0.0
+            ),
+            "first_token_max_ms": self._first_token_max * 1000,
+        }
+
+
+async def iter_sentences(
+    chunks: AsyncIterator[ChatInfo],
+    min_length: int = 30,
+    max_length: int = 500,
+) -> AsyncIterator[str]:
+    """
+    将流式响应按句子边界合并为若干段，便于分段发送。
+
+    参数:
+    chunks (AsyncIterator[ChatInfo]): chat_stream返回的增量内容。
+    min_length (int, 可选): 每段的最小字数，不足时继续累积。
+    max_length (int, 可选): 没有句子边界时，累积超过该字数也会输出。
+
+    返回:
+    AsyncIterator[str]: 分段后的文本。
+    """
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk.get("content") or ""
+        while len(buffer) >= min_length:
+            cut = max(buffer.rfind(c) for c in SENTENCE_BOUNDARIES)
+            if cut + 1 >= min_length:
+                segment, buffer = buffer[: cut + 1], buffer[cut + 1 :]
+            elif len(buffer) >= max_length:
+                segment, buffer = buffer[:max_length], buffer[max_length:]
+            else:
+                break
+            if segment.strip():
+                yield segment.strip()
+    if buffer.strip():
+        yield buffer.strip()
+
+
 if __name__ == "__main__":
     gingai_client = GingAIClient(
         api_base="http://101.126.146.36:8080/api",
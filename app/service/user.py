@@ -1,16 +1,22 @@
 from datetime import datetime, timedelta
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+import logging
 import requests
 from app.core import security
 from app.core.config import CONFIG
 from app.database import models
 from app.schemas import user_schemas
+from app.schemas.pagination import CountStrategy
 from app.database.db import main_db
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from app.crud.user import UserCRUD
 from .verification_code import VerificationCodeService
 from app.core.config import GOOGLESettings
 
+logger = logging.getLogger(__name__)
+
 
 class UserService:
 
@@ -33,7 +39,7 @@ class UserService:
                     username="admin",
                     email="admin@admin.com",
                     nickname="管理员",
-                    password="admin123",
+                    password=security.hash_password("admin123"),
                     role="admin",
                     level=3,
                 )
@@ -75,10 +81,30 @@ class UserService:
         if user:
             raise HTTPException(status_code=400, detail="Email already exists")
 
-    def create(self, db: Session, new_user: user_schemas.UserCreate):
-        self.cheack_username_exists(db, new_user.username)
-        self.cheack_email_exists(db, new_user.email)
-        return self.user_crud.create(db, new_user)
+    async def hash_password(self, password: str) -> str:
+        """在 password_hasher 中计算哈希，不占用 API 线程池，排队已满时返回 503"""
+        try:
+            return await security.password_hasher.hash(password)
+        except security.PasswordHasherBusy:
+            raise HTTPException(status_code=503, detail="Server is busy, try again")
+
+    async def verify_password(self, plain_password: str, hashed_password: str):
+        """在 password_hasher 中校验密码，排队已满时返回 503"""
+        try:
+            return await security.password_hasher.verify(
+                plain_password, hashed_password
+            )
+        except security.PasswordHasherBusy:
+            raise HTTPException(status_code=503, detail="Server is busy, try again")
+
+    async def create(self, db: Session, new_user: user_schemas.UserCreate):
+        await run_in_threadpool(self.cheack_username_exists, db, new_user.username)
+        await run_in_threadpool(self.cheack_email_exists, db, new_user.email)
+        # 哈希值超过 schema 中的长度限制，使用 model_copy 跳过校验
+        new_user = new_user.model_copy(
+            update={"password": await self.hash_password(new_user.password)}
+        )
+        return await run_in_threadpool(self.user_crud.create, db, new_user)
 
     def search(
         self,
@@ -86,30 +112,92 @@ class UserService:
         keyword: str | None = None,
         page: int = 1,
         per_page: int = 100,
+        count: CountStrategy = "exact",
     ):
-        if keyword is None:
-            total, data = self.user_crud.get_multi(db, page, per_page)
-        else:
-            total, data = self.user_crud.get_multi_by_filter(
-                db, self.user_crud.model.username.like(f"%{keyword}%"), page, per_page
+        filter = None
+        if keyword is not None:
+            filter = self.user_crud.model.username.like(f"%{keyword}%")
+        result = self.user_crud.get_page(
+            db, filter, page, per_page, count, CONFIG.PAGINATION.COUNT_CACHE_TTL
+        )
+        return {
+            "total": result.total,
+            "data": result.data,
+            "has_more": result.has_more,
+            "count_strategy": result.count_strategy,
+        }
+
+    def search_by_cursor(
+        self,
+        db: Session,
+        keyword: str | None = None,
+        cursor: str | None = None,
+        per_page: int = 100,
+    ):
+        filter = None
+        if keyword is not None:
+            filter = self.user_crud.model.username.like(f"%{keyword}%")
+        try:
+            data, next_cursor = self.user_crud.get_multi_by_cursor(
+                db, filter, cursor, per_page
             )
-        return {"total": total, "data": data}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {"data": data, "next_cursor": next_cursor}
 
-    def update(self, db: Session, user_id: int, update_data: user_schemas.UserUpdate):
+    def search_ranked(
+        self,
+        db: Session,
+        keyword: str,
+        cursor: str | None = None,
+        per_page: int = 20,
+    ):
+        """
+        全文索引搜索用户名、昵称和邮箱，按相关度排序，不计算总数。
+        """
+        try:
+            data, next_cursor = self.user_crud.search_ranked(
+                db, keyword, cursor, per_page
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Full-text user search failed: {e}")
+            raise HTTPException(
+                status_code=503, detail="Full-text search is not available"
+            )
+        return {
+            "data": [user for user, _ in data],
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+        }
+
+    async def update(
+        self, db: Session, user_id: int, update_data: user_schemas.UserUpdate
+    ):
         if update_data.username:
-            self.cheack_username_exists(db, update_data.username)
+            await run_in_threadpool(
+                self.cheack_username_exists, db, update_data.username
+            )
         if update_data.email:
-            self.cheack_email_exists(db, update_data.email)
-        updated_user = self.user_crud.update(db, user_id, update_data)
+            await run_in_threadpool(self.cheack_email_exists, db, update_data.email)
+        if update_data.password:
+            update_data = update_data.model_copy(
+                update={"password": await self.hash_password(update_data.password)}
+            )
+        updated_user = await run_in_threadpool(
+            self.user_crud.update, db, user_id, update_data
+        )
         if updated_user is None:
             raise HTTPException(status_code=404, detail="User not found")
         return updated_user
 
-    def ban(self, db: Session, user_id: int):
+    async def ban(self, db: Session, user_id: int):
         """
         封禁用户
         """
-        return self.update(db, user_id, user_schemas.UserUpdate(is_banned=True))
+        return await self.update(db, user_id, user_schemas.UserUpdate(is_banned=True))
 
     def _generate_token(self, user: models.User):
         expires_delta = timedelta(minutes=CONFIG.JWT.EXPIRE_MINUTES)
@@ -122,28 +210,48 @@ class UserService:
             expire_at=datetime.now() + expires_delta,
         )
 
-    def _authenticate_user(self, user: models.User | None, password: str):
+    def _save_password_hash(self, db: Session, user: models.User, hashed: str):
+        # 直接写入哈希值，不经过 update 的唯一性检查和重复哈希
+        self.user_crud.update(
+            db, user.id, user_schemas.UserUpdate.model_construct(password=hashed)
+        )
+
+    async def _authenticate_user(
+        self, db: Session, user: models.User | None, password: str
+    ):
+        """
+        校验密码并签发 token，哈希计算在 password_hasher 中执行，不占用 API 线程池。
+        """
         if not user:
             raise HTTPException(
                 status_code=404,
                 detail="User not found",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        if (password == str(user.password)) is False:
+        if not await self.verify_password(password, str(user.password)):
             raise HTTPException(
                 status_code=401,
                 detail="Password is incorrect",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        if security.password_hasher.needs_rehash(str(user.password)):
+            # 明文或成本因子过低的密码在登录成功时重新哈希，失败不影响本次登录
+            try:
+                hashed = await security.password_hasher.hash(password)
+                await run_in_threadpool(self._save_password_hash, db, user, hashed)
+            except Exception:
+                logger.exception(f"Failed to rehash password for user {user.id}")
         return self._generate_token(user)
 
-    def login_by_email(self, db: Session, params: user_schemas.UserLoginByEmail):
-        user = self.get_by_email(db, params.email)
-        return self._authenticate_user(user, params.password)
+    async def login_by_email(
+        self, db: Session, params: user_schemas.UserLoginByEmail
+    ):
+        user = await run_in_threadpool(self.get_by_email, db, params.email)
+        return await self._authenticate_user(db, user, params.password)
 
-    def login(self, db: Session, username: str, password: str):
-        user = self.get_by_username(db, username)
-        return self._authenticate_user(user, password)
+    async def login(self, db: Session, username: str, password: str):
+        user = await run_in_threadpool(self.get_by_username, db, username)
+        return await self._authenticate_user(db, user, password)
 
     def login_with_code(
         self,
@@ -163,14 +271,16 @@ class UserService:
             expire_at=datetime.now() + expires_delta,
         )
 
-    def register_user(
+    async def register_user(
         self,
         db: Session,
         user: user_schemas.UserRegister,
         verification_code_service: VerificationCodeService,
     ) -> user_schemas.User:
-        verification_code_service.verify_code(db, user.email, user.code)
-        return self.create(
+        await run_in_threadpool(
+            verification_code_service.verify_code, db, user.email, user.code
+        )
+        return await self.create(
             db,
             user_schemas.UserCreate(
                 username=user.username,
@@ -180,13 +290,12 @@ class UserService:
             ),
         )
 
-    def login_with_google(
+    def _fetch_google_user_info(
         self,
-        db: Session,
         google_code: str,
         google_config: GOOGLESettings,
         redirect_uri: str | None = None,
-    ) -> security.Token:
+    ) -> dict:
         response = requests.post(
             google_config.TOKEN_URI,
             data={
@@ -222,16 +331,29 @@ class UserService:
                 status_code=400, detail="Failed to fetch user information"
             )
 
-        user_info = response.json()
+        return response.json()
+
+    async def login_with_google(
+        self,
+        db: Session,
+        google_code: str,
+        google_config: GOOGLESettings,
+        redirect_uri: str | None = None,
+    ) -> security.Token:
+        user_info = await run_in_threadpool(
+            self._fetch_google_user_info, google_code, google_config, redirect_uri
+        )
 
         email = user_info["email"]
 
-        db_user = self.user_crud.get_by_filter(db, self.user_crud.model.email == email)
+        db_user = await run_in_threadpool(
+            self.user_crud.get_by_filter, db, self.user_crud.model.email == email
+        )
         if db_user:
             return self._generate_token(db_user)
         else:
             # 创建新用户
-            user = self.create(
+            user = await self.create(
                 db,
                 user_schemas.UserCreate(
                     username=user_info["sub"],
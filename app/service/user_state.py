@@ -0,0 +1,148 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from sqlalchemy import select
+from app.core.config import CONFIG
+from app.core.security import TokenData
+from app.database import models
+from app.database.db import main_db
+
+logger = logging.getLogger(__name__)
+
+
+class UserState(NamedTuple):
+    role: str
+    level: int
+    is_banned: bool
+
+
+class UserStateCache:
+    """
+    信任 token 中用户信息时使用的封禁/变更列表。
+
+    只保存已封禁用户和最近（token 有效期内）修改过的用户的状态，
+    后台线程按 users.updated_at 增量同步，token 中的角色、等级、封禁状态
+    与最新状态不一致时拒绝该 token。
+    """
+
+    def __init__(
+        self, refresh_interval: float = 5, token_ttl: timedelta | None = None
+    ):
+        """
+        初始化 UserStateCache。
+
+        :param refresh_interval: 增量同步间隔（秒）。
+        :param token_ttl: token 有效期，早于该时间的修改不会影响仍有效的 token。
+        """
+        self.refresh_interval = refresh_interval
+        self.token_ttl = token_ttl or timedelta(minutes=CONFIG.JWT.EXPIRE_MINUTES)
+        self._states: dict[int, tuple[UserState, datetime]] = {}
+        self._watermark: datetime | None = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _apply(self, rows):
+        with self._lock:
+            for row in rows:
+                self._states[row.id] = (
+                    UserState(row.role, row.level, row.is_banned),
+                    row.updated_at,
+                )
+                if self._watermark is None or row.updated_at > self._watermark:
+                    self._watermark = row.updated_at
+
+    def _prune(self):
+        # 修改时间早于 token 有效期的记录不再需要，封禁用户一直保留
+        if self._watermark is None:
+            return
+        expire_before = self._watermark - self.token_ttl
+        with self._lock:
+            for user_id in [
+                k
+                for k, (state, updated_at) in self._states.items()
+                if not state.is_banned and updated_at < expire_before
+            ]:
+                del self._states[user_id]
+
+    def refresh(self):
+        """从数据库增量同步用户状态"""
+        model = models.User
+        columns = (
+            model.id,
+            model.role,
+            model.level,
+            model.is_banned,
+            model.updated_at,
+        )
+        db = main_db.get_db()
+        try:
+            if self._watermark is None:
+                # 首次加载：所有封禁用户和有效期内修改过的用户
+                rows = db.execute(
+                    select(*columns).where(
+                        model.is_banned.is_(True)
+                        | (model.updated_at >= datetime.now() - self.token_ttl)
+                    )
+                ).all()
+            else:
+                # updated_at 精度为秒，使用 >= 避免漏掉同一秒内的修改
+                rows = db.execute(
+                    select(*columns).where(model.updated_at >= self._watermark)
+                ).all()
+        finally:
+            db.close()
+        self._apply(rows)
+        if self._watermark is None:
+            self._watermark = datetime.now() - self.token_ttl
+        self._prune()
+
+    def check(self, token_data: TokenData) -> bool:
+        """
+        token 中的用户信息是否仍然有效。
+
+        :return: 用户已封禁，或角色、等级与 token 中不一致时返回 False。
+        """
+        if token_data.is_banned:
+            return False
+        with self._lock:
+            item = self._states.get(token_data.id)
+        if item is None:
+            return True
+        state = item[0]
+        return (
+            not state.is_banned
+            and state.role == token_data.role
+            and state.level == token_data.level
+        )
+
+    def _run(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh user state cache")
+
+    def start(self):
+        """首次同步并启动后台同步线程"""
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="user-state-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+
+user_state_cache = UserStateCache(
+    refresh_interval=CONFIG.JWT.STATE_REFRESH_INTERVAL
+)
@@ -0,0 +1,461 @@
+import fcntl
+import hashlib
+import importlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, NamedTuple, Protocol, Sequence
+import faiss
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import CONFIG
+from app.crud.wechat import WechatMessageCRUD
+from app.schemas.wechat import MessageType
+
+logger = logging.getLogger(__name__)
+
+
+class Embedder(Protocol):
+    """本地向量化模型，返回 L2 归一化后的 float32 向量"""
+
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray: ...
+
+
+class HashingEmbedder:
+    """
+    字符 n-gram 哈希向量，不依赖模型文件，可离线运行。
+    对中文按字切分，相似度接近于共享字词的比例，适合作为默认实现。
+    """
+
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self, dim: int = 256, ngram_range: tuple[int, int] = (1, 3)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _bucket(self, gram: str) -> tuple[int, float]:
+        # 使用稳定的哈希，保证重启前后同一个 n-gram 落在同一个维度
+        digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        low, high = self.ngram_range
+        for row, text in enumerate(texts):
+            text = self._WHITESPACE.sub(" ", text.lower()).strip()
+            for n in range(low, high + 1):
+                for i in range(len(text) - n + 1):
+                    column, sign = self._bucket(text[i : i + n])
+                    vectors[row, column] += sign
+        faiss.normalize_L2(vectors)
+        return vectors
+
+
+def load_embedder(name: str, dim: int) -> Embedder:
+    """
+    加载向量化模型。
+
+    :param name: hashing 使用 HashingEmbedder，或 "模块路径:工厂函数"，
+        工厂函数接收 dim 参数并返回 Embedder。
+    """
+    if name == "hashing":
+        return HashingEmbedder(dim)
+    module_name, _, factory_name = name.partition(":")
+    factory: Callable[[int], Embedder] = getattr(
+        importlib.import_module(module_name), factory_name
+    )
+    return factory(dim)
+
+
+class SearchHit(NamedTuple):
+    id: int
+    score: float
+
+
+class MessageVectorIndex:
+    """
+    wechat_message.content 的本地 FAISS 向量索引（内积，向量已归一化即余弦相似度）。
+
+    多进程部署时通过索引旁的 .lock 文件选出一个写入进程（leader）：
+    leader 将本进程收到的新消息批量向量化后加入索引，并定期从数据库补齐其他进程
+    收到的消息，定期保存到磁盘；其他进程只读，在索引文件更新后重新加载，
+    并在 leader 退出后接替。水位只根据从数据库读到的消息推进。
+    每条向量记录所属的群，搜索时可以只在某个群内查找。
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        path: str,
+        batch_size: int = 64,
+        flush_interval: float = 2,
+        save_interval: float = 60,
+        max_pending: int = 10000,
+        mmap: bool = True,
+        sync_interval: float = 10,
+        backfill_overlap: int = 60,
+    ):
+        """
+        初始化 MessageVectorIndex。
+
+        :param embedder: 向量化模型。
+        :param path: 索引文件路径，元数据保存在同名的 .meta.npz 文件中。
+        :param batch_size: 每批向量化的消息数。
+        :param flush_interval: 后台线程批量加入索引的间隔（秒）。
+        :param save_interval: 保存到磁盘的间隔（秒）。
+        :param max_pending: 待加入索引的消息数上限，超过时丢弃新消息。
+        :param mmap: 以 mmap 方式加载索引文件。
+        :param sync_interval: leader 从数据库补齐、其他进程检查索引文件更新的间隔（秒）。
+        :param backfill_overlap: 从数据库补齐时向前多读的秒数，覆盖延迟入库的消息。
+        """
+        self.embedder = embedder
+        self.path = path
+        self.meta_path = f"{path}.meta.npz"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.save_interval = save_interval
+        self.max_pending = max_pending
+        self.mmap = mmap
+        self.sync_interval = sync_interval
+        self.backfill_overlap = backfill_overlap
+        self.lock_path = f"{path}.lock"
+        self._index = self._new_index()
+        self._ids: set[int] = set()
+        self._rooms: dict[str, list[int]] = {}
+        # 每个群的 IDSelectorBatch，群内加入新消息或重新加载时失效
+        self._selectors: dict[str, faiss.IDSelectorBatch] = {}
+        # 从数据库补齐到的最大时间戳，之后从该时间开始补齐
+        self._watermark = 0
+        self._dirty = False
+        # 持有 .lock 文件的排他锁时为 leader
+        self._lock_file = None
+        self._loaded_mtime: float | None = None
+        self._session_factory: Callable[[], Session] | None = None
+        self._crud: WechatMessageCRUD | None = None
+        self._pending: list[tuple[int, str, str, int]] = []
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _new_index(self):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.embedder.dim))
+
+    def __len__(self) -> int:
+        return self._index.ntotal
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None
+
+    def _try_become_leader(self) -> bool:
+        """尝试获取 .lock 文件的排他锁，进程退出时锁自动释放"""
+        if self._lock_file is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Process {os.getpid()} is the vector index writer")
+        return True
+
+    def _release_leader(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _index_mtime(self) -> float | None:
+        try:
+            return os.stat(self.meta_path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """从磁盘加载索引，文件不存在或维度不匹配时使用空索引"""
+        if not (os.path.exists(self.path) and os.path.exists(self.meta_path)):
+            return
+        # 元数据文件最后替换，以它的修改时间判断索引是否更新
+        mtime = self._index_mtime()
+        flags = faiss.IO_FLAG_MMAP if self.mmap else 0
+        index = faiss.read_index(self.path, flags)
+        if index.d != self.embedder.dim:
+            logger.warning(
+                f"Vector index dim {index.d} does not match embedder dim "
+                f"{self.embedder.dim}, rebuilding"
+            )
+            self._loaded_mtime = mtime
+            return
+        meta = np.load(self.meta_path)
+        ids = meta["ids"].tolist()
+        room_names = meta["room_names"].tolist()
+        rooms: dict[str, list[int]] = {}
+        for message_id, room in zip(ids, meta["room_idx"].tolist()):
+            rooms.setdefault(room_names[room], []).append(message_id)
+        with self._lock:
+            self._index = index
+            self._ids = set(ids)
+            self._rooms = rooms
+            self._selectors = {}
+            self._watermark = int(meta["watermark"])
+            self._loaded_mtime = mtime
+        logger.info(f"Loaded vector index with {index.ntotal} messages")
+
+    def save(self):
+        """写入临时文件后替换，避免进程退出时留下不完整的索引文件"""
+        with self._lock:
+            if not self._dirty:
+                return
+            room_names = list(self._rooms)
+            ids = [i for room in room_names for i in self._rooms[room]]
+            room_idx = [
+                n for n, room in enumerate(room_names) for _ in self._rooms[room]
+            ]
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # 临时文件名带上进程号，避免多个进程同时写入同一个临时文件
+            suffix = f".{os.getpid()}.tmp"
+            faiss.write_index(self._index, f"{self.path}{suffix}")
+            with open(f"{self.meta_path}{suffix}", "wb") as f:
+                np.savez(
+                    f,
+                    ids=np.array(ids, dtype=np.int64),
+                    room_names=np.array(room_names, dtype=str),
+                    room_idx=np.array(room_idx, dtype=np.int32),
+                    watermark=np.int64(self._watermark),
+                )
+            os.replace(f"{self.path}{suffix}", self.path)
+            os.replace(f"{self.meta_path}{suffix}", self.meta_path)
+            self._loaded_mtime = self._index_mtime()
+            self._dirty = False
+
+    def add(self, message_id: int, roomid: str, content: str, ts: int) -> bool:
+        """
+        加入待索引队列，由后台线程批量加入索引。
+
+        :return: 是否已加入队列，未启动、不是 leader 或积压过多时返回 False。
+            其他进程收到的消息由 leader 从数据库补齐。
+        """
+        if not content:
+            return False
+        with self._pending_lock:
+            if (
+                self._thread is None
+                or not self.is_leader
+                or len(self._pending) >= self.max_pending
+            ):
+                return False
+            self._pending.append((message_id, roomid or "", content, ts))
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+        return True
+
+    def add_batch(self, items: Sequence[tuple[int, str, str, int]]) -> int:
+        """
+        立即向量化并加入索引，已存在的消息会被跳过。
+
+        :param items: (消息 id, 群 id, 内容, 时间戳) 列表。
+        :return: 加入的数量。
+        """
+        with self._lock:
+            items = [item for item in items if item[0] not in self._ids]
+        if not items:
+            return 0
+        vectors = self.embedder.embed([content for _, _, content, _ in items])
+        ids = np.array([message_id for message_id, _, _, _ in items], dtype=np.int64)
+        with self._lock:
+            self._index.add_with_ids(vectors, ids)
+            for message_id, roomid, _, _ in items:
+                self._ids.add(message_id)
+                self._rooms.setdefault(roomid, []).append(message_id)
+                self._selectors.pop(roomid, None)
+            self._dirty = True
+        return len(items)
+
+    def flush(self) -> int:
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        added = 0
+        for i in range(0, len(pending), self.batch_size):
+            added += self.add_batch(pending[i : i + self.batch_size])
+        return added
+
+    def search(
+        self, query: str, k: int = 5, roomid: str | None = None
+    ) -> list[SearchHit]:
+        """
+        查找与 query 最相似的消息。
+
+        :param roomid: 只在该群（私聊为空字符串）的消息中查找，None 表示不限。
+        :return: 按相似度从高到低排列的 (消息 id, 相似度)。
+        """
+        vector = self.embedder.embed([query])
+        params = None
+        if roomid is not None:
+            selector = self._room_selector(roomid)
+            if selector is None:
+                return []
+            params = faiss.SearchParameters(sel=selector)
+        with self._lock:
+            scores, ids = self._index.search(vector, k, params=params)
+        return [
+            SearchHit(int(i), float(s))
+            for i, s in zip(ids[0], scores[0])
+            if i != -1
+        ]
+
+    def _room_selector(self, roomid: str) -> faiss.IDSelectorBatch | None:
+        """取群的 IDSelectorBatch，没有缓存时在锁外根据 id 列表的快照构建"""
+        with self._lock:
+            selector = self._selectors.get(roomid)
+            room_ids = self._rooms.get(roomid)
+            if selector is not None or not room_ids:
+                return selector
+            # 列表只会追加，记下长度即可在锁外读取快照
+            count = len(room_ids)
+        selector = faiss.IDSelectorBatch(np.array(room_ids[:count], dtype=np.int64))
+        with self._lock:
+            # 构建期间群内加入了新消息或重新加载过时不缓存，本次查询仍使用快照
+            if self._rooms.get(roomid) is room_ids and len(room_ids) == count:
+                self._selectors[roomid] = selector
+        return selector
+
+    def backfill(self, db: Session, crud: WechatMessageCRUD, batch_size: int = 1000):
+        """
+        从数据库补齐水位之后的文本消息，并用读到的最大时间戳推进水位。
+        向前多读 backfill_overlap 秒，已在索引中的消息会被跳过。
+        """
+        model = crud.model
+        since = max(self._watermark - self.backfill_overlap, 0)
+        filter = (model.type == MessageType.TEXT.value) & (model.ts >= since)
+        cursor = None
+        added = 0
+        watermark = self._watermark
+        while True:
+            rows, cursor = crud.get_multi_by_cursor(
+                db, filter, cursor, batch_size, order_by="ts"
+            )
+            for row in rows:
+                watermark = max(watermark, row.ts)
+            for i in range(0, len(rows), self.batch_size):
+                added += self.add_batch(
+                    [
+                        (r.id, r.roomid or "", r.content, r.ts)
+                        for r in rows[i : i + self.batch_size]
+                        if r.content
+                    ]
+                )
+            if cursor is None:
+                break
+        with self._lock:
+            if watermark != self._watermark:
+                self._watermark = watermark
+                self._dirty = True
+        if added:
+            logger.info(f"Backfilled {added} messages into vector index")
+
+    def _backfill(self):
+        db = self._session_factory()
+        try:
+            self.backfill(db, self._crud)
+        finally:
+            db.close()
+
+    def _sync(self):
+        """leader 从数据库补齐；其他进程尝试接替 leader，否则在索引文件更新后重新加载"""
+        if not self.is_leader and self._try_become_leader():
+            # 接替时先加载上一个 leader 保存的索引
+            if self._index_mtime() != self._loaded_mtime:
+                self.load()
+        if self.is_leader:
+            self._backfill()
+        elif self._index_mtime() != self._loaded_mtime:
+            self.load()
+
+    def _run(self):
+        last_saved = last_synced = time.monotonic()
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                if self.is_leader:
+                    self.flush()
+                if time.monotonic() - last_synced >= self.sync_interval:
+                    self._sync()
+                    last_synced = time.monotonic()
+                if (
+                    self.is_leader
+                    and time.monotonic() - last_saved >= self.save_interval
+                ):
+                    self.save()
+                    last_saved = time.monotonic()
+            except Exception:
+                logger.exception("Failed to update vector index")
+
+    def start(self, session_factory: Callable[[], Session], crud: WechatMessageCRUD):
+        """加载索引并启动后台线程，leader 还会从数据库补齐并保存"""
+        if self._thread is not None:
+            return
+        self._session_factory = session_factory
+        self._crud = crud
+        self.load()
+        if self._try_become_leader():
+            self._backfill()
+            self.save()
+        with self._pending_lock:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="vector-index", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """停止后台线程，leader 写入剩余消息并保存"""
+        with self._pending_lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        thread.join()
+        if self.is_leader:
+            self.flush()
+            self.save()
+            self._release_leader()
+
+    def stats(self):
+        with self._pending_lock:
+            pending = len(self._pending)
+        with self._lock:
+            return {
+                "leader": self.is_leader,
+                "messages": self._index.ntotal,
+                "rooms": len(self._rooms),
+                "pending": pending,
+                "watermark": self._watermark,
+            }
+
+
+message_index = (
+    MessageVectorIndex(
+        load_embedder(CONFIG.VECTOR_INDEX.EMBEDDER, CONFIG.VECTOR_INDEX.DIM),
+        CONFIG.VECTOR_INDEX.PATH,
+        batch_size=CONFIG.VECTOR_INDEX.BATCH_SIZE,
+        flush_interval=CONFIG.VECTOR_INDEX.FLUSH_INTERVAL,
+        save_interval=CONFIG.VECTOR_INDEX.SAVE_INTERVAL,
+        max_pending=CONFIG.VECTOR_INDEX.MAX_PENDING,
+        mmap=CONFIG.VECTOR_INDEX.MMAP,
+        sync_interval=CONFIG.VECTOR_INDEX.SYNC_INTERVAL,
+        backfill_overlap=CONFIG.VECTOR_INDEX.BACKFILL_OVERLAP,
+    )
+    if CONFIG.VECTOR_INDEX.ENABLED
+    else None
+)
@@ -1,57 +1,102 @@
+import logging
 from datetime import datetime, timedelta
 from fastapi import HTTPException
 from app.core.config import CONFIG
-from app.core.email import EmailVerification
-from app.crud.verification_code import VerificationCodeCRUD
+from app.core.email import email_queue, generate_verification_code
+from app.crud.verification_code import (
+    MemoryVerificationCodeStore,
+    VerificationCodeCRUD,
+    memory_verification_code_store,
+)
+from app.database import models
+from app.database.db import main_db
 from app.schemas import verification_code_schemas
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+
+logger = logging.getLogger(__name__)
+
+PURGE_LOCK_NAME = "verification_code_purge"
 
 
 class VerificationCodeService:
 
-    def __init__(self, verification_code_crud: VerificationCodeCRUD):
+    def __init__(
+        self,
+        verification_code_crud: VerificationCodeCRUD | MemoryVerificationCodeStore,
+    ):
         self.verification_code_crud = verification_code_crud
 
+    @staticmethod
+    def _expired_before() -> datetime:
+        expire_minutes = CONFIG.VERIFICATION_CODE.EXPIRE_MINUTES
+        return datetime.now() - timedelta(minutes=expire_minutes)
+
     def send_code(self, db: Session, email: str):
-        # 检查该邮箱1分钟内是否发送过验证码
-        db_code = self.verification_code_crud.get_by_filter(
-            db, self.verification_code_crud.model.email == email
-        )
-        if db_code and db_code.created_at > datetime.now() - timedelta(minutes=1):  # type: ignore
+        # 检查该邮箱最近是否发送过验证码
+        interval = CONFIG.VERIFICATION_CODE.RESEND_INTERVAL
+        db_code = self.verification_code_crud.get_latest(db, email)
+        if db_code and db_code.created_at > datetime.now() - timedelta(seconds=interval):  # type: ignore
             raise HTTPException(
                 status_code=400,
-                detail="Please wait for 1 minute before sending another verification code.",
+                detail=f"Please wait for {interval} seconds before sending another verification code.",
             )
-        verification = EmailVerification(
-            CONFIG.EMAIL.HOST,
-            CONFIG.EMAIL.PORT,
-            CONFIG.EMAIL.USER,
-            CONFIG.EMAIL.PASSWORD,
-        )
-
-        new_code = verification.generate_verification_code()
-        self.verification_code_crud.create(
+        new_code = generate_verification_code()
+        db_code = self.verification_code_crud.create(
             db,
             verification_code_schemas.VerificationCodeCreate(
                 email=email, code=new_code
             ),
         )
-        if verification.send_verification_email(email):
+        # 邮件在后台发送，验证码入库后立即返回
+        if email_queue.send_verification_code(email, new_code):
             return {"message": "ok"}
-        raise HTTPException(status_code=500, detail="Error in sending email")
+        self.verification_code_crud.delete(db, db_code.id)  # type: ignore
+        raise HTTPException(
+            status_code=503, detail="Too many emails pending, try again later"
+        )
 
     def verify_code(self, db: Session, email: str, code: str):
-        code = self.verification_code_crud.get_by_filter(
-            db,
-            and_(
-                self.verification_code_crud.model.email == email,
-                self.verification_code_crud.model.code == code,
-                self.verification_code_crud.model.is_used == False,
-                self.verification_code_crud.model.created_at
-                > datetime.now() - timedelta(minutes=5),  # 验证码有效时间 5分钟
-            ),
-        )
-        if code is None:
+        if not self.verification_code_crud.consume(
+            db, email, code, self._expired_before()
+        ):
             raise HTTPException(status_code=400, detail="Invalid verification code")
-        self.verification_code_crud.update(db, code.id, verification_code_schemas.VerificationCodeUpdate(is_used=True))  # type: ignore
+
+    @staticmethod
+    def get_store() -> VerificationCodeCRUD | MemoryVerificationCodeStore:
+        """根据配置返回验证码存储"""
+        if CONFIG.VERIFICATION_CODE.BACKEND == "memory":
+            return memory_verification_code_store
+        return VerificationCodeCRUD(models.VerificationCode)
+
+    @classmethod
+    def purge_expired(cls):
+        """
+        清理过期和已使用的验证码，由定时任务调用。
+
+        每个 worker 都会调度该任务：内存存储只属于本进程，各自清理；
+        数据库存储通过 GET_LOCK 只让一个 worker 执行，其余本轮跳过。
+        """
+        store = cls.get_store()
+        if isinstance(store, MemoryVerificationCodeStore):
+            deleted = store.purge(None, cls._expired_before())
+        else:
+            with main_db.engine.connect() as conn:
+                locked = conn.execute(
+                    text("SELECT GET_LOCK(:name, 0)"), {"name": PURGE_LOCK_NAME}
+                ).scalar()
+                if not locked:
+                    logger.debug("Skip purging verification codes: lock not acquired")
+                    return
+                try:
+                    db = main_db.get_db()
+                    try:
+                        deleted = store.purge(db, cls._expired_before())
+                    finally:
+                        db.close()
+                finally:
+                    conn.execute(
+                        text("SELECT RELEASE_LOCK(:name)"), {"name": PURGE_LOCK_NAME}
+                    )
+        if deleted:
+            logger.info(f"Purged {deleted} expired verification codes")
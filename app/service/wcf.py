@@ -2,6 +2,9 @@ from functools import wraps
 from typing import Any, Callable, TypedDict
 from fastapi import Body
 import requests
+from requests.adapters import HTTPAdapter
+from app.core.metrics import stage_latency
+from app.core.tracing import traced
 
 
 class WcfError(Exception):
@@ -27,10 +30,39 @@ class UserInfo(TypedDict):
     big_head_url: str
 
 
+class Contact(TypedDict):
+    wxid: str
+    code: str
+    remark: str
+    name: str
+    country: str
+    province: str
+    city: str
+    gender: str
+
+
 class WcfClient:
-    def __init__(self, api_base: str):
+    def __init__(
+        self,
+        api_base: str,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        timeout: float | None = None,
+    ):
         self.api_base = api_base
+        self.timeout = timeout
         self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
 
     def _url(self, path: str) -> str:
         return f"{self.api_base}{path}"
@@ -46,17 +78,36 @@ class WcfClient:
         except Exception as e:
             raise WcfError(str(e))
 
+    @traced("wcf.send_text")
     def send_text(self,msg: str,receiver: str,aters: str="",):
         json_data = {
         "aters":aters,
         "msg": msg,
         "receiver": receiver
         }
-        resp = self.session.post(self._url("/text"),json=json_data)
-        self._handle_response(resp)
+        with stage_latency.time(stage="wcf_send_text"):
+            resp = self.session.post(self._url("/text"),json=json_data,timeout=self.timeout)
+            self._handle_response(resp)
 
+    @traced("wcf.get_userinfo")
     def get_userinfo(self):
-        resp = self.session.get(self._url("/userinfo"))
+        resp = self.session.get(self._url("/userinfo"), timeout=self.timeout)
         data = self._handle_response(resp)
         return UserInfo(data["data"])
-        
\ No newline at end of file
+
+    @traced("wcf.get_contacts")
+    def get_contacts(self) -> list[Contact]:
+        resp = self.session.get(self._url("/contacts"), timeout=self.timeout)
+        data = self._handle_response(resp)
+        return [Contact(c) for c in data["data"]["contacts"]]
+
+    @traced("wcf.get_chatroom_members")
+    def get_chatroom_members(self, roomid: str) -> dict[str, str]:
+        """返回群成员 wxid 到群昵称的映射"""
+        resp = self.session.get(
+            self._url("/chatroom-member"),
+            params={"roomid": roomid},
+            timeout=self.timeout,
+        )
+        data = self._handle_response(resp)
+        return dict(data["data"]["members"])
@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Generic, TypeVar
+from app.core.config import CONFIG
+from .clients import http_clients
+from .wcf import Contact, UserInfo, WcfClient
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _CacheEntry(Generic[T]):
+    def __init__(self, value: T, loaded_at: float):
+        self.value = value
+        self.loaded_at = loaded_at
+        self.read_at = loaded_at
+        self.stale = False
+
+
+class WcfDirectory:
+    """
+    WcfClient 的缓存层，缓存机器人自身信息、联系人和群成员。
+
+    读取只访问内存：缓存过期后继续返回旧值，同时由后台线程刷新；
+    只有首次读取（缓存未命中）时才会同步请求 WCF。
+    """
+
+    SELF_KEY = "self"
+    CONTACTS_KEY = "contacts"
+    ROOM_PREFIX = "room:"
+
+    def __init__(
+        self,
+        wcf_client: WcfClient,
+        ttl: float = 300,
+        refresh_interval: float = 30,
+    ):
+        """
+        初始化 WcfDirectory。
+
+        :param wcf_client: 用于加载数据的 WcfClient。
+        :param ttl: 缓存有效期（秒）。
+        :param refresh_interval: 后台刷新线程的检查间隔（秒）。
+        """
+        self.wcf_client = wcf_client
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._entries: dict[str, _CacheEntry[Any]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _loader(self, key: str) -> Callable[[], Any]:
+        if key == self.SELF_KEY:
+            return self.wcf_client.get_userinfo
+        if key == self.CONTACTS_KEY:
+            return lambda: {c["wxid"]: c for c in self.wcf_client.get_contacts()}
+        roomid = key[len(self.ROOM_PREFIX) :]
+        return lambda: self.wcf_client.get_chatroom_members(roomid)
+
+    def _load(self, key: str) -> Any:
+        value = self._loader(key)()
+        with self._lock:
+            self._entries[key] = _CacheEntry(value, time.monotonic())
+        return value
+
+    def _get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.read_at = time.monotonic()
+                if time.monotonic() - entry.loaded_at > self.ttl or entry.stale:
+                    # 返回旧值，交给后台线程刷新
+                    self._wakeup.set()
+                return entry.value
+        return self._load(key)
+
+    def self_info(self) -> UserInfo:
+        """机器人自身信息"""
+        return self._get(self.SELF_KEY)
+
+    def contacts(self) -> dict[str, Contact]:
+        """联系人，wxid 到联系人信息的映射"""
+        return self._get(self.CONTACTS_KEY)
+
+    def room_members(self, roomid: str) -> dict[str, str]:
+        """群成员，wxid 到群昵称的映射"""
+        return self._get(f"{self.ROOM_PREFIX}{roomid}")
+
+    def display_name(self, wxid: str, roomid: str | None = None) -> str:
+        """
+        获取发送者显示名称，优先群昵称，其次联系人备注和昵称，找不到时返回 wxid。
+        """
+        try:
+            if roomid:
+                name = self.room_members(roomid).get(wxid)
+                if name:
+                    return name
+            contact = self.contacts().get(wxid)
+        except Exception as e:
+            logger.warning(f"Failed to load wcf directory: {e}")
+            return wxid
+        if contact:
+            return contact.get("remark") or contact.get("name") or wxid
+        return wxid
+
+    def invalidate(self, key: str | None = None):
+        """
+        标记缓存失效，下次读取时由后台线程刷新。
+
+        :param key: 缓存键，None 表示全部失效。
+        """
+        with self._lock:
+            entries = (
+                self._entries.values()
+                if key is None
+                else [e for k, e in self._entries.items() if k == key]
+            )
+            for entry in entries:
+                entry.stale = True
+        self._wakeup.set()
+
+    def invalidate_room(self, roomid: str):
+        self.invalidate(f"{self.ROOM_PREFIX}{roomid}")
+
+    def warm_up(self):
+        """预加载机器人信息和联系人，失败时只记录日志"""
+        for key in (self.SELF_KEY, self.CONTACTS_KEY):
+            try:
+                self._load(key)
+            except Exception as e:
+                logger.warning(f"Failed to warm up wcf directory [{key}]: {e}")
+
+    def _refresh_due(self):
+        now = time.monotonic()
+        with self._lock:
+            # 长时间没有读取的群成员缓存直接丢弃，不再刷新
+            for k in [
+                k
+                for k, e in self._entries.items()
+                if k.startswith(self.ROOM_PREFIX) and now - e.read_at > self.ttl
+            ]:
+                del self._entries[k]
+            keys = [
+                k
+                for k, e in self._entries.items()
+                # 提前刷新，尽量避免读取到过期数据
+                if e.stale or now - e.loaded_at > self.ttl - self.refresh_interval
+            ]
+        for key in keys:
+            try:
+                self._load(key)
+            except Exception as e:
+                logger.warning(f"Failed to refresh wcf directory [{key}]: {e}")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.refresh_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            self._refresh_due()
+
+    def start(self):
+        """预热缓存并启动后台刷新线程"""
+        if self._thread is not None:
+            return
+        self.warm_up()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="wcf-directory-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+
+
+wcf_directory = WcfDirectory(
+    http_clients.wcf(),
+    ttl=CONFIG.WCF.CACHE_TTL,
+    refresh_interval=CONFIG.WCF.CACHE_REFRESH_INTERVAL,
+)
@@ -1,15 +1,55 @@
+import asyncio
 from typing import Callable
-from app.crud.wechat import WechatMessageCRUD, WechatUserCRUD
+from fastapi import HTTPException
+from app.core.config import CONFIG
+from app.core.metrics import stage_latency
+from app.core.tracing import current_request_id, tracer
+from app.core.worker import KeyedExecutor
+from app.crud.wechat import (
+    WechatMessageCRUD,
+    WechatMessageWriteBuffer,
+    WechatUserCRUD,
+)
 from app.crud.roomid_chatid_dict import RoomidChatidDictCRUD
-from app.schemas.roomid_chatid_dict import RoomidChatidDictCreate
-from app.schemas.wechat import MessageType, WechatMessage, WechatMessageCreate
+from app.schemas.wechat import (
+    MessageType,
+    WechatMessage,
+    WechatMessageCreate,
+    WechatMessageUpdate,
+)
+from app.crud.async_crud_base import AsyncCRUDBase
 from .wcf import WcfClient
+from .wcf_cache import WcfDirectory
+from .chat_session import ChatIdMap
+from .vector_index import MessageVectorIndex
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
-from .gingai import GingAIClient
+from .gingai import AsyncGingAIClient, GingAIClient, iter_sentences
+from .clients import http_clients
+from app.database.db import main_db
+from app.database import models
 
 looger = logging.getLogger(__name__)
 
+# 机器人回复后台线程池，同一个群（私聊为同一个发送者）的回复按顺序处理，
+# 不同群之间并行。在 lifespan 中启动和排空
+reply_pool = KeyedExecutor(
+    "wechat-reply",
+    workers=CONFIG.WEBHOOK.REPLY_WORKERS,
+    queue_size=CONFIG.WEBHOOK.REPLY_QUEUE_SIZE,
+    queue_size_per_key=CONFIG.WEBHOOK.REPLY_QUEUE_SIZE_PER_KEY,
+)
+
+# 不需要立即回复的消息批量入库，在 lifespan 中启动和关闭
+message_buffer = WechatMessageWriteBuffer(
+    WechatMessageCRUD(models.WechatMessage),
+    main_db.get_db,
+    max_size=CONFIG.WEBHOOK.BUFFER_MAX_SIZE,
+    flush_interval=CONFIG.WEBHOOK.BUFFER_FLUSH_INTERVAL,
+)
+
 
 class WechatService:
 
@@ -20,20 +60,170 @@ class WechatService:
         wcf_client: WcfClient,
         gingai_client: GingAIClient,
         roomid_chatid_dict_crud: RoomidChatidDictCRUD,
+        wcf_directory: WcfDirectory,
+        chat_id_map: ChatIdMap,
+        async_gingai_client: AsyncGingAIClient | None = None,
+        message_index: MessageVectorIndex | None = None,
     ):
 
         self.wechat_user_crud = wechat_user_crud
         self.wechat_message_crud = wechat_message_crud
+        self.async_wechat_message_crud: AsyncCRUDBase[
+            models.WechatMessage, WechatMessageCreate, WechatMessageUpdate
+        ] = AsyncCRUDBase(wechat_message_crud.model)
         self.wcf_client = wcf_client
         self.gingai = gingai_client
         self.roomid_chatid_dict_crud = roomid_chatid_dict_crud
+        self.wcf_directory = wcf_directory
+        self.chat_id_map = chat_id_map
+        self.async_gingai = async_gingai_client
+        self.message_index = message_index
         self.process_message_handlers: dict[
             MessageType, Callable[[Session, WechatMessage], None]
         ] = {}
         self.process_message_handlers[MessageType.TEXT] = self._handle_text_message
+        self.process_message_handlers[MessageType.SYSTEM_MESSAGE] = (
+            self._handle_system_message
+        )
+
+    def save_message(
+        self, db: Session, message: WechatMessageCreate, buffered: bool = False
+    ) -> WechatMessage | None:
+        """
+        保存消息。buffered 为 True 时写入缓冲区批量入库，返回 None。
+        """
+        self._index_message(message)
+        with stage_latency.time(stage="save_message"):
+            if buffered and message_buffer.add(message):
+                return None
+            return self.wechat_message_crud.create(db, message)
+
+    def list_room_messages(
+        self,
+        db: Session,
+        roomid: str,
+        start_ts: int | None = None,
+        end_ts: int | None = None,
+        sender: str | None = None,
+        cursor: str | None = None,
+        limit: int = 50,
+    ):
+        try:
+            data, next_cursor = self.wechat_message_crud.get_room_messages(
+                db, roomid, start_ts, end_ts, sender, cursor, limit
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {"data": data, "next_cursor": next_cursor}
+
+    def search_messages(
+        self,
+        db: Session,
+        query: str,
+        roomid: str | None = None,
+        sender: str | None = None,
+        start_ts: int | None = None,
+        end_ts: int | None = None,
+        cursor: str | None = None,
+        limit: int = 20,
+    ):
+        try:
+            data, next_cursor = self.wechat_message_crud.search_content(
+                db, query, roomid, sender, start_ts, end_ts, cursor, limit
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        except SQLAlchemyError as e:
+            db.rollback()
+            looger.error(f"Full-text search failed: {e}")
+            raise HTTPException(
+                status_code=503, detail="Full-text search is not available"
+            )
+        return {
+            "data": [
+                {"score": score, "message": message} for message, score in data
+            ],
+            "next_cursor": next_cursor,
+        }
 
-    def save_message(self, db: Session, message: WechatMessageCreate) -> WechatMessage:
-        return self.wechat_message_crud.create(db, message)
+    async def save_message_async(
+        self, db: AsyncSession, message: WechatMessageCreate, buffered: bool = False
+    ) -> WechatMessage | None:
+        """
+        save_message 的异步版本，使用 AsyncSession 同步入库。
+        """
+        self._index_message(message)
+        with stage_latency.time(stage="save_message"):
+            if buffered and message_buffer.add(message):
+                return None
+            return await self.async_wechat_message_crud.create(db, message)
+
+    def _index_message(self, message: WechatMessageCreate):
+        if self.message_index is not None and message.type == MessageType.TEXT.value:
+            self.message_index.add(
+                message.id, message.roomid, message.content, message.ts
+            )
+
+    def search_similar_messages(
+        self, db: Session, query: str, roomid: str | None = None, k: int = 10
+    ):
+        """
+        在向量索引中查找与 query 相似的历史消息。
+
+        :return: 按相似度从高到低排列的 {"score": 相似度, "message": 消息}。
+        """
+        if self.message_index is None:
+            raise HTTPException(status_code=404, detail="Vector index is disabled")
+        hits = self.message_index.search(query, k, roomid)
+        if not hits:
+            return []
+        model = self.wechat_message_crud.model
+        rows = {
+            row.id: row
+            for row in self.wechat_message_crud.list_by_filter(
+                db, model.id.in_([hit.id for hit in hits])
+            )
+        }
+        return [
+            {"score": hit.score, "message": rows[hit.id]}
+            for hit in hits
+            if hit.id in rows
+        ]
+
+    def _with_context(self, db: Session, message: WechatMessage) -> str:
+        """在发给 GingAI 的内容前附上同一个群中相关的历史消息"""
+        top_k = CONFIG.VECTOR_INDEX.CONTEXT_TOP_K
+        if self.message_index is None or top_k <= 0:
+            return message.content
+        try:
+            hits = self.search_similar_messages(
+                db, message.content, message.roomid, top_k + 1
+            )
+        except Exception as e:
+            looger.warning(f"Failed to search related messages: {e}")
+            return message.content
+        related = [
+            hit["message"]
+            for hit in hits
+            if hit["message"].id != message.id
+            and hit["score"] >= CONFIG.VECTOR_INDEX.CONTEXT_MIN_SCORE
+        ][:top_k]
+        if not related:
+            return message.content
+        names = self.wcf_directory.display_name
+        history = "\n".join(
+            f"{names(m.sender, m.roomid or None)}: {m.content}"
+            for m in sorted(related, key=lambda m: m.ts)
+        )
+        return f"相关历史消息：\n{history}\n\n当前消息：\n{message.content}"
+
+    def needs_reply(self, message: WechatMessage) -> bool:
+        """消息是否会触发机器人回复，这类消息需要同步入库"""
+        if message.type != MessageType.TEXT:
+            return False
+        return "testreply" in message.content or (
+            message.is_group and self.is_at_bot(message)
+        )
 
     def bot_reply_process(self, db: Session, message: WechatMessage):
         handler_func = self.process_message_handlers.get(message.type)
@@ -42,9 +232,48 @@ class WechatService:
         else:
             logging.warning(f"No support message type: {message.type}")
 
+    def submit_bot_reply(self, message: WechatMessage) -> bool:
+        """
+        将机器人回复交给后台线程池处理，不阻塞 webhook 响应。
+        """
+        if message.type not in self.process_message_handlers:
+            return True
+        key = message.roomid if message.is_group else message.sender
+        if not reply_pool.submit(
+            key, self.bot_reply_in_new_session, message, current_request_id()
+        ):
+            logging.warning(f"Bot reply dropped for message {message.id}")
+            return False
+        return True
+
+    def bot_reply_in_new_session(
+        self, message: WechatMessage, request_id: str | None = None
+    ):
+        """
+        :param request_id: 提交回复任务的请求 ID，后台线程中的日志和 trace 沿用该 ID。
+        """
+        # 请求的 Session 在响应返回后即关闭，后台任务使用独立的 Session
+        with tracer.trace("wechat.reply", request_id, message_type=message.type.name):
+            db = main_db.get_db()
+            try:
+                self.bot_reply_process(db, message)
+            finally:
+                db.close()
+
     def is_at_bot(self, message: WechatMessage) -> bool:
-        botname = self.wcf_client.get_userinfo()["name"]
-        return message.content.startswith(f"@{botname}")
+        with stage_latency.time(stage="is_at_bot"):
+            botname = self.wcf_directory.self_info()["name"]
+            return message.content.startswith(f"@{botname}")
+
+    def sender_name(self, message: WechatMessage) -> str:
+        return self.wcf_directory.display_name(
+            message.sender, message.roomid if message.is_group else None
+        )
+
+    def _handle_system_message(self, db: Session, message: WechatMessage):
+        # 入群、退群、改群昵称等系统消息，刷新群成员缓存
+        if message.is_group:
+            self.wcf_directory.invalidate_room(message.roomid)
 
     def _handle_text_message(self, db: Session, message: WechatMessage):
         # 测试如果包含关键字 testreply
@@ -56,22 +285,17 @@ class WechatService:
             )
         if message.is_group and self.is_at_bot(message):
             # 获取chatid
-            roomid_chatid_dict = self.roomid_chatid_dict_crud.get_by_filter(
-                db,
-                self.roomid_chatid_dict_crud.model.roomid == message.roomid,
-            )
-            if roomid_chatid_dict is None:
-                chat_id = self.gingai.get_chat_id()
-                self.roomid_chatid_dict_crud.create(
-                    db,
-                    RoomidChatidDictCreate(
-                        chat_id=chat_id,
-                        roomid=message.roomid,
-                    ),
+            with stage_latency.time(stage="chat_id_lookup"):
+                chat_id = self.chat_id_map.get_or_create(
+                    db, message.roomid, self.gingai.get_chat_id
+                )
+            content = self._with_context(db, message)
+            if CONFIG.GINGAI.STREAM and self.async_gingai is not None:
+                http_clients.run_coroutine(
+                    self._stream_reply(chat_id, message, content)
                 )
-            else:
-                chat_id = str(roomid_chatid_dict.chat_id)
-            chat_resp = self.gingai.chat(chat_id, message.content)
+                return
+            chat_resp = self.gingai.chat(chat_id, content)
 
             self.wcf_client.send_text(
                 chat_resp["data"]["content"],
@@ -80,3 +304,20 @@ class WechatService:
             )
         else:
             pass
+
+    async def _stream_reply(
+        self, chat_id: str, message: WechatMessage, content: str | None = None
+    ):
+        """流式获取回复，每凑够一句就发送一段，只在第一段 @ 发送者"""
+        assert self.async_gingai is not None
+        aters = message.sender
+        segments = iter_sentences(
+            self.async_gingai.chat_stream(chat_id, content or message.content),
+            min_length=CONFIG.GINGAI.STREAM_MIN_SEGMENT,
+            max_length=CONFIG.GINGAI.STREAM_MAX_SEGMENT,
+        )
+        async for segment in segments:
+            await asyncio.to_thread(
+                self.wcf_client.send_text, segment, message.roomid, aters=aters
+            )
+            aters = ""
@@ -0,0 +1,13 @@
+"""
+webhook 压测工具。
+
+1. 启动假的 WCF 和 GingAI 服务：
+       python -m bench.fakes --wcf-port 9001 --gingai-port 9002 --latency-ms 50
+
+2. 将 config.yaml 中的 WCF.API_BASE 指向 http://127.0.0.1:9001，
+   GINGAI.API_BASE 指向 http://127.0.0.1:9002，然后启动服务。
+
+3. 向 /v1/wechat/webhook 发送模拟消息：
+       python -m bench.load --url http://127.0.0.1:8000 --rate 200 --duration 30
+       python -m bench.load --url http://127.0.0.1:8000 --find-max
+"""
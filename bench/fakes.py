@@ -0,0 +1,307 @@
+"""
+假的 WCF 和 GingAI 服务，只依赖标准库，可以注入延迟和错误。
+
+    python -m bench.fakes --wcf-port 9001 --gingai-port 9002 \\
+        --latency-ms 50 --jitter-ms 20 --error-rate 0.01
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+BOT_WXID = "wxid_bench_bot"
+BOT_NAME = "bench-bot"
+
+
+@dataclass
+class FaultConfig:
+    """延迟和错误注入配置"""
+
+    latency_ms: float = 0  # 每个请求的固定延迟
+    jitter_ms: float = 0  # 在固定延迟上叠加 0~jitter_ms 的随机延迟
+    error_rate: float = 0  # 返回错误的比例（0~1）
+    http_error_ratio: float = 0.5  # 错误中返回 HTTP 500 的比例，其余返回业务错误
+
+    def delay(self):
+        seconds = (self.latency_ms + random.random() * self.jitter_ms) / 1000
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def pick_error(self) -> str | None:
+        """返回 None（正常）、"http" 或 "app" """
+        if self.error_rate <= 0 or random.random() >= self.error_rate:
+            return None
+        return "http" if random.random() < self.http_error_ratio else "app"
+
+
+@dataclass
+class RequestCounter:
+    counts: dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def inc(self, key: str):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return dict(self.counts)
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    """路由表由子类提供：{(方法, 路径前缀): 处理函数}"""
+
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分开写入，不关闭 Nagle 时 keep-alive 连接上每个请求会多出约 40ms
+    disable_nagle_algorithm = True
+    faults: FaultConfig
+    counter: RequestCounter
+    routes: dict[tuple[str, str], Callable[["_FakeHandler", dict], None]]
+
+    def log_message(self, format: str, *args: Any):
+        logger.debug(format, *args)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def send_json(self, data: Any, status: int = 200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def app_error(self, message: str):
+        """业务错误：HTTP 200，错误信息在响应体中。子类按被模拟服务的格式覆盖"""
+        self.send_json({"error": message})
+
+    def _dispatch(self, method: str):
+        path = urlsplit(self.path).path
+        body = self._body() if method == "POST" else {}
+        for (route_method, prefix), handler in self.routes.items():
+            if route_method == method and path.startswith(prefix):
+                break
+        else:
+            self.send_json({"error": f"not found: {path}"}, 404)
+            return
+        self.counter.inc(prefix)
+        self.faults.delay()
+        error = self.faults.pick_error()
+        if error == "http":
+            self.counter.inc("http_error")
+            self.send_json({"error": "injected"}, 500)
+        elif error == "app":
+            self.counter.inc("app_error")
+            self.app_error("injected error")
+        else:
+            handler(self, body)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+class WcfHandler(_FakeHandler):
+    def app_error(self, message: str):
+        self.send_json({"status": -1, "error": message, "data": None})
+
+    def ok(self, data: Any):
+        self.send_json({"status": 0, "error": None, "data": data})
+
+    def text(self, body: dict):
+        self.ok(None)
+
+    def userinfo(self, body: dict):
+        self.ok(
+            {
+                "wxid": BOT_WXID,
+                "name": BOT_NAME,
+                "mobile": "",
+                "home": "",
+                "small_head_url": "",
+                "big_head_url": "",
+            }
+        )
+
+    def contacts(self, body: dict):
+        self.ok({"contacts": []})
+
+    def chatroom_member(self, body: dict):
+        query = parse_qs(urlsplit(self.path).query)
+        roomid = query.get("roomid", [""])[0]
+        self.ok({"members": {f"wxid_{roomid}_{i}": f"member{i}" for i in range(20)}})
+
+    routes = {
+        ("POST", "/text"): text,
+        ("GET", "/userinfo"): userinfo,
+        ("GET", "/contacts"): contacts,
+        ("GET", "/chatroom-member"): chatroom_member,
+    }
+
+
+class GingAIHandler(_FakeHandler):
+    # 流式响应每块之间的间隔，由 make_server 设置
+    chunk_delay_ms: float = 0
+    reply = "收到，这是压测用的回复。内容会被分成几段返回！最后一句。"
+
+    def app_error(self, message: str):
+        self.send_json({"code": 500, "message": message, "data": None})
+
+    def chat_open(self, body: dict):
+        self.send_json({"code": 200, "message": "ok", "data": str(uuid.uuid4())})
+
+    def chat_message(self, body: dict):
+        chat_id = urlsplit(self.path).path.rsplit("/", 1)[-1]
+        message_id = str(uuid.uuid4())
+        if not body.get("stream"):
+            self.send_json(
+                {
+                    "code": 200,
+                    "message": "ok",
+                    "data": {
+                        "chat_id": chat_id,
+                        "id": message_id,
+                        "operate": True,
+                        "content": self.reply,
+                        "is_end": True,
+                    },
+                }
+            )
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        pieces = [self.reply[i : i + 8] for i in range(0, len(self.reply), 8)]
+        for n, piece in enumerate(pieces):
+            chunk = {
+                "chat_id": chat_id,
+                "id": message_id,
+                "operate": True,
+                "content": piece,
+                "is_end": n == len(pieces) - 1,
+            }
+            line = f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            self.wfile.write(line.encode("utf-8"))
+            self.wfile.flush()
+            if self.chunk_delay_ms:
+                time.sleep(self.chunk_delay_ms / 1000)
+
+    routes = {
+        ("GET", "/application/"): chat_open,
+        ("POST", "/application/chat_message/"): chat_message,
+    }
+
+
+def make_server(
+    handler: type[_FakeHandler],
+    host: str,
+    port: int,
+    faults: FaultConfig,
+    **attributes: Any,
+) -> ThreadingHTTPServer:
+    """
+    创建服务（未启动）。每个服务使用独立的 handler 子类，互不影响。
+
+    :param attributes: 额外设置到 handler 子类上的属性，例如 chunk_delay_ms。
+    """
+    handler_class = type(
+        handler.__name__,
+        (handler,),
+        {"faults": faults, "counter": RequestCounter(), **attributes},
+    )
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(server: ThreadingHTTPServer) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="假的 WCF 和 GingAI 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--wcf-port", type=int, default=9001)
+    parser.add_argument("--gingai-port", type=int, default=9002)
+    parser.add_argument("--latency-ms", type=float, default=0, help="WCF 固定延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="WCF 随机延迟上限")
+    parser.add_argument("--error-rate", type=float, default=0, help="WCF 错误比例")
+    parser.add_argument(
+        "--gingai-latency-ms", type=float, default=None, help="默认同 --latency-ms"
+    )
+    parser.add_argument(
+        "--gingai-jitter-ms", type=float, default=None, help="默认同 --jitter-ms"
+    )
+    parser.add_argument(
+        "--gingai-error-rate", type=float, default=None, help="默认同 --error-rate"
+    )
+    parser.add_argument(
+        "--chunk-delay-ms", type=float, default=0, help="GingAI 流式响应每块的间隔"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    def pick(value, default):
+        return default if value is None else value
+
+    wcf = make_server(
+        WcfHandler,
+        args.host,
+        args.wcf_port,
+        FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate),
+    )
+    gingai = make_server(
+        GingAIHandler,
+        args.host,
+        args.gingai_port,
+        FaultConfig(
+            pick(args.gingai_latency_ms, args.latency_ms),
+            pick(args.gingai_jitter_ms, args.jitter_ms),
+            pick(args.gingai_error_rate, args.error_rate),
+        ),
+        chunk_delay_ms=args.chunk_delay_ms,
+    )
+    start_in_thread(wcf)
+    start_in_thread(gingai)
+    logger.info(f"Fake WCF listening on http://{args.host}:{args.wcf_port}")
+    logger.info(f"Fake GingAI listening on http://{args.host}:{args.gingai_port}")
+    logger.info(f"Bot name for mentions: @{BOT_NAME}")
+    try:
+        while True:
+            time.sleep(10)
+            logger.info(
+                f"requests wcf={wcf.RequestHandlerClass.counter.snapshot()} "
+                f"gingai={gingai.RequestHandlerClass.counter.snapshot()}"
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        wcf.shutdown()
+        gingai.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+按目标速率向 /v1/wechat/webhook 发送模拟的 WechatMessage，统计延迟和吞吐。
+
+    # 固定速率
+    python -m bench.load --url http://127.0.0.1:8000 --rate 200 --duration 30
+    # 逐步提高速率，找出满足延迟和错误率要求的最大吞吐
+    python -m bench.load --url http://127.0.0.1:8000 --find-max --slo-p99-ms 500
+
+发送按固定间隔排期（开环），服务变慢时不会降低发送速率，测到的延迟包含排队时间。
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, field
+import httpx
+from .fakes import BOT_NAME
+
+WEBHOOK_PATH = "/v1/wechat/webhook"
+
+
+@dataclass
+class MessageMix:
+    """模拟消息的构成"""
+
+    group_ratio: float = 0.8  # 群消息比例，其余为私聊
+    mention_ratio: float = 0.1  # 群消息中 @机器人 的比例（会触发回复）
+    rooms: int = 50  # 群数量
+    senders: int = 500  # 发送者数量
+    bot_name: str = BOT_NAME
+
+
+class MessageFactory:
+    def __init__(self, mix: MessageMix, seed: int | None = None):
+        self.mix = mix
+        self.random = random.Random(seed)
+        # 消息 id 是主键，用时间做起点避免多次运行之间冲突
+        self._ids = itertools.count(time.time_ns() // 1000)
+
+    def make(self) -> tuple[str, dict]:
+        """
+        :return: (类型, 消息)，类型为 group_mention、group 或 dm。
+        """
+        rnd = self.random
+        sender = f"wxid_bench_{rnd.randrange(self.mix.senders)}"
+        is_group = rnd.random() < self.mix.group_ratio
+        text = f"压测消息 {rnd.randrange(1_000_000)}"
+        if is_group:
+            roomid = f"{rnd.randrange(self.mix.rooms)}@chatroom"
+            mention = rnd.random() < self.mix.mention_ratio
+            kind = "group_mention" if mention else "group"
+            if mention:
+                text = f"@{self.mix.bot_name} {text}"
+        else:
+            roomid = sender
+            kind = "dm"
+        return kind, {
+            "is_self": False,
+            "is_group": is_group,
+            "id": next(self._ids),
+            "type": 1,
+            "ts": int(time.time()),
+            "roomid": roomid,
+            "content": text,
+            "sender": sender,
+            "sign": "",
+            "thumb": "",
+            "extra": "",
+            "xml": "",
+        }
+
+
+@dataclass
+class Result:
+    rate: float
+    duration: float = 0
+    sent: int = 0
+    errors: int = 0
+    # 超过 max_in_flight 而未发送的请求
+    skipped: int = 0
+    latencies: list[float] = field(default_factory=list)
+    by_kind: dict[str, list[float]] = field(default_factory=dict)
+    statuses: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        """每秒成功的请求数"""
+        return len(self.latencies) / self.duration if self.duration else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        total = self.sent + self.skipped
+        return (self.errors + self.skipped) / total if total else 0.0
+
+    def summary(self) -> dict:
+        data = {
+            "target_rate": self.rate,
+            "throughput": round(self.throughput, 1),
+            "sent": self.sent,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "error_rate": round(self.error_rate, 4),
+            "statuses": self.statuses,
+            **latency_summary(self.latencies),
+            "by_kind": {
+                kind: {"count": len(values), **latency_summary(values)}
+                for kind, values in sorted(self.by_kind.items())
+            },
+        }
+        return data
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """最近秩法的分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(latencies: list[float]) -> dict[str, float]:
+    values = sorted(latencies)
+    return {
+        f"{name}_ms": round(percentile(values, q) * 1000, 2)
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    factory: MessageFactory,
+    rate: float,
+    duration: float,
+    max_in_flight: int = 1000,
+) -> Result:
+    """
+    以 rate 条每秒的速率发送 duration 秒。
+
+    :param max_in_flight: 同时未完成的请求数上限，超过时跳过并计为错误。
+    """
+    result = Result(rate)
+    in_flight: set[asyncio.Task] = set()
+    total = int(rate * duration)
+
+    async def send(kind: str, message: dict):
+        started_at = time.perf_counter()
+        try:
+            response = await client.post(WEBHOOK_PATH, json=message)
+            status = str(response.status_code)
+            ok = response.status_code == 200
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+            ok = False
+        latency = time.perf_counter() - started_at
+        result.statuses[status] = result.statuses.get(status, 0) + 1
+        if ok:
+            result.latencies.append(latency)
+            result.by_kind.setdefault(kind, []).append(latency)
+        else:
+            result.errors += 1
+
+    started_at = time.perf_counter()
+    for n in range(total):
+        delay = started_at + n / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            result.skipped += 1
+            continue
+        task = asyncio.create_task(send(*factory.make()))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        result.sent += 1
+    if in_flight:
+        await asyncio.wait(in_flight)
+    result.duration = time.perf_counter() - started_at
+    return result
+
+
+def sustained(result: Result, slo_p99_ms: float, max_error_rate: float) -> bool:
+    """吞吐达到目标速率的 95%，且 p99 延迟和错误率都在要求之内"""
+    p99_ms = percentile(sorted(result.latencies), 0.99) * 1000
+    return (
+        result.throughput >= result.rate * 0.95
+        and p99_ms <= slo_p99_ms
+        and result.error_rate <= max_error_rate
+    )
+
+
+async def find_max(
+    client: httpx.AsyncClient,
+    factory: MessageFactory,
+    start_rate: float,
+    step: float,
+    max_rate: float,
+    duration: float,
+    slo_p99_ms: float,
+    max_error_rate: float,
+    max_in_flight: int,
+) -> tuple[Result | None, list[Result]]:
+    """
+    从 start_rate 开始每轮乘以 step 提高速率，直到不满足要求或达到 max_rate。
+
+    :return: (满足要求的最高一轮, 每一轮的结果)。
+    """
+    best = None
+    results = []
+    rate = start_rate
+    while rate <= max_rate:
+        result = await run_load(client, factory, rate, duration, max_in_flight)
+        results.append(result)
+        print(json.dumps(result.summary(), ensure_ascii=False))
+        if not sustained(result, slo_p99_ms, max_error_rate):
+            break
+        best = result
+        rate *= step
+    return best, results
+
+
+async def main_async(args: argparse.Namespace):
+    mix = MessageMix(
+        group_ratio=args.group_ratio,
+        mention_ratio=args.mention_ratio,
+        rooms=args.rooms,
+        senders=args.senders,
+        bot_name=args.bot_name,
+    )
+    factory = MessageFactory(mix, args.seed)
+    limits = httpx.Limits(
+        max_connections=args.max_in_flight, max_keepalive_connections=100
+    )
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout, limits=limits
+    ) as client:
+        if args.warmup > 0:
+            await run_load(client, factory, args.warmup_rate, args.warmup)
+        if not args.find_max:
+            result = await run_load(
+                client, factory, args.rate, args.duration, args.max_in_flight
+            )
+            print(json.dumps(result.summary(), ensure_ascii=False, indent=2))
+            return
+        best, _ = await find_max(
+            client,
+            factory,
+            args.start_rate,
+            args.step,
+            args.max_rate,
+            args.duration,
+            args.slo_p99_ms,
+            args.max_error_rate,
+            args.max_in_flight,
+        )
+        if best is None:
+            print(f"No rate met the SLO, lowest tried: {args.start_rate}/s")
+        else:
+            print(
+                f"Max sustained throughput: {best.throughput:.1f}/s "
+                f"(target {best.rate:.1f}/s)"
+            )
+            print(json.dumps(best.summary(), ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="webhook 压测")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--rate", type=float, default=100, help="每秒发送条数")
+    parser.add_argument("--duration", type=float, default=30, help="每轮持续时间（秒）")
+    parser.add_argument("--timeout", type=float, default=30, help="单个请求超时（秒）")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--warmup", type=float, default=5, help="预热时间（秒）")
+    parser.add_argument("--warmup-rate", type=float, default=20)
+    parser.add_argument("--group-ratio", type=float, default=0.8)
+    parser.add_argument("--mention-ratio", type=float, default=0.1)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--senders", type=int, default=500)
+    parser.add_argument("--bot-name", default=BOT_NAME)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--find-max", action="store_true", help="逐步提高速率")
+    parser.add_argument("--start-rate", type=float, default=50)
+    parser.add_argument("--step", type=float, default=1.5, help="每轮速率的倍数")
+    parser.add_argument("--max-rate", type=float, default=10000)
+    parser.add_argument("--slo-p99-ms", type=float, default=500)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+
+# app.core.config 在导入时读取当前目录下的 config.yaml，测试统一使用 tests/config.yaml
+sys.path.insert(0, ROOT_DIR)
+os.chdir(TESTS_DIR)
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    """每个测试独立的 sqlite 文件库，可以在多个线程中使用"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(sqlite_engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)
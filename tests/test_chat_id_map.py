@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+# app.database.db 在导入时创建 MySQL 引擎，需要 mysqlclient
+pytest.importorskip("MySQLdb")
+
+from app.crud.roomid_chatid_dict import RoomidChatidDictCRUD
+from app.database import models
+from app.service.chat_session import ChatIdMap
+
+
+@pytest.fixture
+def crud(sqlite_engine):
+    models.Base.metadata.create_all(
+        sqlite_engine, tables=[models.RoomidChatidDict.__table__]
+    )
+    return RoomidChatidDictCRUD(models.RoomidChatidDict)
+
+
+@pytest.fixture
+def chat_id_map(crud):
+    return ChatIdMap(crud, maxsize=2)
+
+
+def stored(session_factory) -> dict[str, str]:
+    with session_factory() as db:
+        rows = db.query(models.RoomidChatidDict).all()
+        return {str(row.roomid): str(row.chat_id) for row in rows}
+
+
+def get_or_create(chat_id_map, session_factory, roomid, create):
+    with session_factory() as db:
+        return chat_id_map.get_or_create(db, roomid, create)
+
+
+def test_concurrent_callers_share_one_creation(chat_id_map, session_factory):
+    calls = []
+    release = threading.Event()
+
+    def create():
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        return "chat-1"
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [
+            pool.submit(get_or_create, chat_id_map, session_factory, "room", create)
+            for _ in range(8)
+        ]
+        # 等其余调用方都进入等待后再让创建完成
+        time.sleep(0.2)
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert results == ["chat-1"] * 8
+    assert len(calls) == 1
+    assert stored(session_factory) == {"room": "chat-1"}
+    assert chat_id_map.get("room") == "chat-1"
+
+
+def test_failure_is_shared_and_not_cached(chat_id_map, session_factory):
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("GingAI unavailable")
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [
+            pool.submit(get_or_create, chat_id_map, session_factory, "room", fail)
+            for _ in range(4)
+        ]
+        time.sleep(0.2)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=5)
+
+    # 失败后不留下进行中的记录，下一次调用重新创建
+    assert get_or_create(chat_id_map, session_factory, "room", lambda: "chat-2") == (
+        "chat-2"
+    )
+
+
+def test_existing_row_is_used_without_creating(chat_id_map, session_factory):
+    with session_factory() as db:
+        db.add(models.RoomidChatidDict(roomid="room", chat_id="from-db"))
+        db.commit()
+
+    def create():
+        raise AssertionError("should not open a new session")
+
+    assert get_or_create(chat_id_map, session_factory, "room", create) == "from-db"
+
+
+def test_concurrent_insert_by_other_worker_wins(chat_id_map, session_factory):
+    def create():
+        # 模拟其他 worker 在查询之后、写入之前抢先写入
+        with session_factory() as db:
+            db.add(models.RoomidChatidDict(roomid="room", chat_id="other-worker"))
+            db.commit()
+        return "mine"
+
+    assert get_or_create(chat_id_map, session_factory, "room", create) == (
+        "other-worker"
+    )
+    assert chat_id_map.get("room") == "other-worker"
+
+
+def test_lru_eviction_and_invalidate(chat_id_map, session_factory):
+    for n in range(3):
+        get_or_create(chat_id_map, session_factory, f"room{n}", lambda: f"chat{n}")
+    # maxsize=2，最早的映射被淘汰，但数据库中仍然存在
+    assert chat_id_map.get("room0") is None
+    assert chat_id_map.get("room2") == "chat2"
+    chat_id_map.invalidate("room2")
+    assert chat_id_map.get("room2") is None
+    assert stored(session_factory)["room0"] == "chat0"
+
+
+def test_warm_up_loads_rows(crud, session_factory):
+    with session_factory() as db:
+        db.add_all(
+            models.RoomidChatidDict(roomid=f"room{n}", chat_id=f"chat{n}")
+            for n in range(3)
+        )
+        db.commit()
+        chat_id_map = ChatIdMap(crud, maxsize=10)
+        chat_id_map.warm_up(db)
+    assert [chat_id_map.get(f"room{n}") for n in range(3)] == [
+        "chat0",
+        "chat1",
+        "chat2",
+    ]
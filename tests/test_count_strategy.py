@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.orm import declarative_base
+from app.crud import crud_base
+from app.crud.crud_base import CRUDBase, _CountCache
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "count_items"
+
+    id = Column(Integer, primary_key=True)
+    group = Column(String(10), nullable=False)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(crud_base, "time", clock)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def fresh_count_cache(monkeypatch):
+    monkeypatch.setattr(crud_base, "count_cache", _CountCache())
+
+
+@pytest.fixture
+def db(session_factory, sqlite_engine):
+    Base.metadata.create_all(sqlite_engine)
+    with session_factory() as db:
+        db.add_all(Item(id=i, group="a" if i % 2 else "b") for i in range(1, 12))
+        db.commit()
+        yield db
+
+
+@pytest.fixture
+def crud():
+    return CRUDBase(Item)
+
+
+def add_items(db, *ids: int):
+    db.add_all(Item(id=i, group="a") for i in ids)
+    db.commit()
+
+
+def test_exact(crud, db):
+    page = crud.get_page(db, page=1, per_page=5, count="exact")
+    assert [item.id for item in page.data] == [1, 2, 3, 4, 5]
+    assert page.total == 11
+    assert page.has_more is True
+    assert page.count_strategy == "exact"
+
+
+def test_none_skips_count_but_reports_has_more(crud, db):
+    page = crud.get_page(db, page=3, per_page=5, count="none")
+    assert [item.id for item in page.data] == [11]
+    assert page.total is None
+    assert page.has_more is False
+    page = crud.get_page(db, page=2, per_page=5, count="none")
+    assert page.has_more is True
+
+
+def test_cached_count_is_reused_until_ttl(crud, db, clock):
+    assert crud.get_page(db, count="cached", cache_ttl=30).total == 11
+    add_items(db, 100)
+    assert crud.get_page(db, count="cached", cache_ttl=30).total == 11
+    clock.now += 31
+    assert crud.get_page(db, count="cached", cache_ttl=30).total == 12
+
+
+def test_cached_count_is_keyed_by_filter_and_params(crud, db, clock):
+    assert crud.get_page(db, Item.group == "a", count="cached").total == 6
+    assert crud.get_page(db, Item.group == "b", count="cached").total == 5
+    assert crud.get_page(db, count="cached").total == 11
+
+
+def test_estimated_falls_back_to_exact_off_mysql(crud, db):
+    page = crud.get_page(db, Item.group == "b", count="estimated")
+    assert page.total == 5
+    assert page.count_strategy == "exact"
+
+
+def test_count_cache_evicts_least_recently_used(clock):
+    cache = _CountCache(maxsize=2)
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    assert cache.get("a") == 1
+    cache.set("c", 3, 60)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
@@ -0,0 +1,132 @@
+import base64
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.orm import declarative_base
+from app.crud.crud_base import CRUDBase, decode_cursor, encode_cursor
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    group = Column(String(10), nullable=False)
+    rank = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+START = datetime(2024, 1, 1)
+# rank 有大量重复值，翻页需要依靠 id 作为次序
+ROWS = [
+    (i, "a" if i % 3 else "b", i // 4, START + timedelta(hours=i // 2))
+    for i in range(1, 24)
+]
+
+
+@pytest.fixture
+def db(session_factory, sqlite_engine):
+    Base.metadata.create_all(sqlite_engine)
+    with session_factory() as db:
+        db.add_all(Item(id=i, group=g, rank=r, created_at=c) for i, g, r, c in ROWS)
+        db.commit()
+        yield db
+
+
+@pytest.fixture
+def crud():
+    return CRUDBase(Item)
+
+
+def collect(crud, db, per_page, **kwargs) -> list[int]:
+    ids, cursor, pages = [], None, 0
+    while True:
+        data, cursor = crud.get_multi_by_cursor(
+            db, cursor=cursor, per_page=per_page, **kwargs
+        )
+        assert len(data) <= per_page
+        ids.extend(item.id for item in data)
+        pages += 1
+        assert pages <= len(ROWS) + 1
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip():
+    values = [3, "abc", START, None, 1.5]
+    assert decode_cursor(encode_cursor(values)) == [
+        3,
+        "abc",
+        START.isoformat(),
+        None,
+        1.5,
+    ]
+    # URL 安全且去掉了填充
+    assert "=" not in encode_cursor(values)
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90IGpzb24", encode_cursor([1])[:-2]])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_decode_rejects_non_list():
+    cursor = base64.urlsafe_b64encode(b'{"id": 1}').decode().rstrip("=")
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("per_page", [1, 4, 7, 100])
+@pytest.mark.parametrize("desc", [False, True])
+def test_pages_cover_every_row_once_in_order(crud, db, per_page, desc):
+    ids = collect(crud, db, per_page, order_by="rank", desc=desc)
+    expected = sorted(ROWS, key=lambda row: (row[2], row[0]), reverse=desc)
+    assert ids == [row[0] for row in expected]
+
+
+def test_datetime_order_key(crud, db):
+    ids = collect(crud, db, 5, order_by="created_at", desc=True)
+    expected = sorted(ROWS, key=lambda row: (row[3], row[0]), reverse=True)
+    assert ids == [row[0] for row in expected]
+
+
+def test_filter_is_applied_to_every_page(crud, db):
+    ids = collect(crud, db, 2, filter=Item.group == "b")
+    assert ids == [row[0] for row in ROWS if row[1] == "b"]
+
+
+def test_cursor_with_wrong_arity_is_rejected(crud, db):
+    _, cursor = crud.get_multi_by_cursor(db, per_page=2, order_by="rank")
+    with pytest.raises(ValueError):
+        crud.get_multi_by_cursor(db, cursor=cursor, per_page=2, order_by="id")
+
+
+@pytest.mark.parametrize(
+    "order_by, values",
+    [
+        ("id", [{"a": 1}]),
+        ("id", [[1]]),
+        ("id", ["1"]),
+        ("id", [1.5]),
+        ("id", [True]),
+        ("rank", ["x", 1]),
+        ("created_at", [1, 1]),
+        ("created_at", ["not a date", 1]),
+    ],
+)
+def test_cursor_with_wrong_value_types_is_rejected(crud, db, order_by, values):
+    # 手工构造的游标不能把非法的值传给数据库
+    cursor = encode_cursor(values)
+    with pytest.raises(ValueError):
+        crud.get_multi_by_cursor(db, cursor=cursor, per_page=2, order_by=order_by)
+
+
+def test_after_builds_lexicographic_condition(crud, db):
+    condition = CRUDBase._after([Item.rank, Item.id], [2, 9], desc=False)
+    ids = sorted(item.id for item in db.query(Item).filter(condition))
+    assert ids == sorted(i for i, _, r, _ in ROWS if (r, i) > (2, 9))
+    condition = CRUDBase._after([Item.rank, Item.id], [2, 9], desc=True)
+    ids = sorted(item.id for item in db.query(Item).filter(condition))
+    assert ids == sorted(i for i, _, r, _ in ROWS if (r, i) < (2, 9))
@@ -0,0 +1,133 @@
+import io
+import os
+import sqlite3
+import pytest
+from app.service import document_cache
+from app.service.document import DocumentExtractor
+from app.service.document_cache import ExtractionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        # 每次读取前进一秒，保证访问时间有先后
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_cache, "time", FakeClock())
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=10)
+    yield cache
+    cache.close()
+
+
+def digest(n: int) -> str:
+    return f"{n:02d}" + "0" * 62
+
+
+def test_get_put(cache):
+    assert cache.get(digest(1), "text", "1") is None
+    cache.put(digest(1), "text", "1", "你好")
+    assert cache.get(digest(1), "text", "1") == "你好"
+    stats = cache.stats()
+    assert (stats["entries"], stats["size"]) == (1, len("你好".encode("utf-8")))
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_evicts_least_recently_accessed(cache):
+    cache.put(digest(1), "text", "1", "aaaa")
+    cache.put(digest(2), "text", "1", "bbbb")
+    # 读取后 1 比 2 更近被访问
+    assert cache.get(digest(1), "text", "1") == "aaaa"
+    cache.put(digest(3), "text", "1", "cccc")
+    assert cache.get(digest(2), "text", "1") is None
+    assert cache.get(digest(1), "text", "1") == "aaaa"
+    assert cache.get(digest(3), "text", "1") == "cccc"
+    assert cache.stats()["size"] <= cache.max_bytes
+
+
+def test_skips_text_larger_than_limit(cache):
+    cache.put(digest(1), "text", "1", "x" * 11)
+    assert cache.stats()["entries"] == 0
+
+
+def test_version_mismatch_invalidates(cache):
+    cache.put(digest(1), "pdf", "1", "old")
+    assert cache.get(digest(1), "pdf", "2") is None
+    # 不一致的条目被删除，旧版本也不再命中
+    assert cache.get(digest(1), "pdf", "1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_missing_file_is_a_miss(cache):
+    cache.put(digest(1), "text", "1", "text")
+    os.remove(cache._path(digest(1)))
+    assert cache.get(digest(1), "text", "1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_persists_across_instances(cache):
+    cache.put(digest(1), "text", "1", "text")
+    cache.close()
+    reopened = ExtractionCache(cache.directory, max_bytes=10)
+    try:
+        assert reopened.get(digest(1), "text", "1") == "text"
+    finally:
+        reopened.close()
+
+
+def test_pdf_cache_version_includes_max_pages(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    calls = []
+
+    def extractor(max_pages: int) -> DocumentExtractor:
+        extractor = DocumentExtractor(
+            max_pages=max_pages, spool_dir=str(tmp_path), cache=cache
+        )
+
+        def iter_pdf(path, digest, failed_pages=None):
+            # 不启动进程池，按页数上限返回文本
+            calls.append(max_pages)
+            yield f"pages={max_pages}"
+
+        monkeypatch.setattr(extractor, "iter_pdf", iter_pdf)
+        return extractor
+
+    try:
+        assert extractor(1).extract_text(io.BytesIO(b"%PDF"), "a.pdf") == "pages=1"
+        assert extractor(1).extract_text(io.BytesIO(b"%PDF"), "a.pdf") == "pages=1"
+        # 页数上限不同，不能使用之前截断的结果
+        assert extractor(2).extract_text(io.BytesIO(b"%PDF"), "a.pdf") == "pages=2"
+        assert calls == [1, 2]
+    finally:
+        cache.close()
+
+
+def test_cache_errors_do_not_fail_extraction(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    extractor = DocumentExtractor(spool_dir=str(tmp_path), cache=cache)
+
+    def fail(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "_db", fail)
+    try:
+        assert extractor.extract_text(io.BytesIO(b"hello"), "a.txt") == "hello"
+        assert cache.misses == 1
+    finally:
+        cache.close()
+
+
+def test_failed_write_removes_temp_file(cache, monkeypatch):
+    def fail(src, dst):
+        raise FileNotFoundError(src)
+
+    with monkeypatch.context() as m:
+        m.setattr(document_cache.os, "replace", fail)
+        cache.put(digest(1), "text", "1", "text")
+    assert os.listdir(os.path.dirname(cache._path(digest(1)))) == []
+    assert cache.get(digest(1), "text", "1") is None
@@ -0,0 +1,147 @@
+import random
+import threading
+import time
+import pytest
+from app.core.worker import KeyedExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = KeyedExecutor("test", workers=4, queue_size=100, queue_size_per_key=50)
+    executor.start()
+    yield executor
+    executor.shutdown(timeout=5)
+
+
+def test_same_key_runs_in_submission_order(executor):
+    results: dict[str, list[int]] = {}
+    lock = threading.Lock()
+
+    def task(key: str, n: int):
+        # 随机耗时，如果同一个 key 并行执行，顺序会被打乱
+        time.sleep(random.random() / 1000)
+        with lock:
+            results.setdefault(key, []).append(n)
+
+    for n in range(20):
+        for key in ("a", "b", "c"):
+            assert executor.submit(key, task, key, n)
+    executor.shutdown(timeout=5)
+    assert results == {key: list(range(20)) for key in ("a", "b", "c")}
+
+
+def test_same_key_never_runs_concurrently(executor):
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def task():
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.005)
+        with lock:
+            running -= 1
+
+    for _ in range(10):
+        executor.submit("room", task)
+    executor.shutdown(timeout=5)
+    assert max_running == 1
+
+
+def test_different_keys_run_in_parallel(executor):
+    barrier = threading.Barrier(3, timeout=5)
+    passed = []
+
+    def task(key: str):
+        # 三个 key 必须同时在执行才能通过屏障
+        barrier.wait()
+        passed.append(key)
+
+    for key in ("a", "b", "c"):
+        executor.submit(key, task, key)
+    executor.shutdown(timeout=5)
+    assert sorted(passed) == ["a", "b", "c"]
+
+
+def test_rejects_before_start_and_after_shutdown():
+    executor = KeyedExecutor("test", workers=1)
+    assert executor.submit("a", lambda: None) is False
+    executor.start()
+    assert executor.submit("a", lambda: None) is True
+    executor.shutdown(timeout=5)
+    assert executor.submit("a", lambda: None) is False
+
+
+def test_rejects_when_key_queue_is_full():
+    executor = KeyedExecutor("test", workers=1, queue_size=100, queue_size_per_key=2)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    executor.start()
+    try:
+        # 第一个任务开始执行后才离开队列
+        assert executor.submit("a", blocker)
+        assert started.wait(5)
+        assert executor.submit("a", lambda: None)
+        assert executor.submit("a", lambda: None)
+        assert executor.submit("a", lambda: None) is False
+        # 其他 key 不受影响
+        assert executor.submit("b", lambda: None)
+        assert executor.stats()["rejected"] == 1
+    finally:
+        release.set()
+        executor.shutdown(timeout=5)
+
+
+def test_rejects_when_total_queue_is_full():
+    executor = KeyedExecutor("test", workers=1, queue_size=3, queue_size_per_key=10)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    executor.start()
+    try:
+        assert executor.submit("a", blocker)
+        assert started.wait(5)
+        assert executor.submit("a", lambda: None)
+        assert executor.submit("b", lambda: None)
+        assert executor.submit("c", lambda: None)
+        assert executor.submit("d", lambda: None) is False
+    finally:
+        release.set()
+        executor.shutdown(timeout=5)
+
+
+def test_failed_task_does_not_block_key(executor):
+    done = threading.Event()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    executor.submit("a", fail)
+    executor.submit("a", done.set)
+    assert done.wait(5)
+    executor.shutdown(timeout=5)
+    stats = executor.stats()
+    assert stats["failed"] == 1
+    assert stats["completed"] == 1
+
+
+def test_shutdown_drains_queued_tasks():
+    executor = KeyedExecutor("test", workers=2)
+    executor.start()
+    finished = []
+    for n in range(10):
+        executor.submit(n % 3, lambda n=n: (time.sleep(0.001), finished.append(n)))
+    executor.shutdown(timeout=5)
+    assert sorted(finished) == list(range(10))
+    assert executor.stats()["queue_depth"] == 0
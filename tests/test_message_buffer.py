@@ -0,0 +1,109 @@
+import time
+import pytest
+
+# app.database.db 在导入时创建 MySQL 引擎，需要 mysqlclient
+pytest.importorskip("MySQLdb")
+
+from app.crud.wechat import WechatMessageCRUD, WechatMessageWriteBuffer
+from app.database import models
+from app.schemas import wechat
+
+
+def make_message(message_id: int, content: str = "hello") -> wechat.WechatMessageCreate:
+    return wechat.WechatMessageCreate(
+        is_self=False,
+        is_group=True,
+        id=message_id,
+        type=1,
+        ts=1700000000 + message_id,
+        roomid="room@chatroom",
+        content=content,
+        sender="wxid_sender",
+        sign="",
+        thumb="",
+        extra="",
+        xml="",
+    )
+
+
+@pytest.fixture
+def crud(sqlite_engine):
+    models.Base.metadata.create_all(
+        sqlite_engine, tables=[models.WechatMessage.__table__]
+    )
+    return WechatMessageCRUD(models.WechatMessage)
+
+
+@pytest.fixture
+def buffer(crud, session_factory):
+    # 定时写入间隔足够长，由测试显式调用 flush
+    buffer = WechatMessageWriteBuffer(
+        crud, session_factory, max_size=100, flush_interval=60
+    )
+    yield buffer
+    buffer.close()
+
+
+def stored_ids(session_factory) -> list[int]:
+    with session_factory() as db:
+        return sorted(row.id for row in db.query(models.WechatMessage).all())
+
+
+def test_add_before_start_is_rejected(buffer):
+    assert buffer.add(make_message(1)) is False
+
+
+def test_flush_writes_pending(buffer, session_factory):
+    buffer.start()
+    for i in range(1, 8):
+        assert buffer.add(make_message(i))
+    assert buffer.flush() == 7
+    assert stored_ids(session_factory) == list(range(1, 8))
+    assert buffer.flush() == 0
+
+
+def test_full_batch_wakes_up_writer(crud, session_factory):
+    buffer = WechatMessageWriteBuffer(
+        crud, session_factory, max_size=3, flush_interval=60
+    )
+    buffer.start()
+    try:
+        for i in range(1, 4):
+            buffer.add(make_message(i))
+        deadline = time.monotonic() + 5
+        while stored_ids(session_factory) != [1, 2, 3]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        buffer.close()
+
+
+def test_duplicate_falls_back_to_row_by_row(buffer, crud, session_factory):
+    with session_factory() as db:
+        crud.create_many(db, [make_message(2)])
+    buffer.start()
+    for i in (1, 2, 3):
+        buffer.add(make_message(i))
+    # 批量插入因主键冲突失败后逐条写入，只跳过重复的一条
+    assert buffer.flush() == 2
+    assert stored_ids(session_factory) == [1, 2, 3]
+
+
+def test_add_rejected_when_backlog_is_full(buffer):
+    buffer.max_pending = 5
+    buffer.start()
+    for i in range(buffer.max_pending):
+        assert buffer.add(make_message(i + 1))
+    assert buffer.add(make_message(buffer.max_pending + 1)) is False
+
+
+def test_close_flushes_remaining(crud, session_factory):
+    buffer = WechatMessageWriteBuffer(
+        crud, session_factory, max_size=100, flush_interval=60
+    )
+    buffer.start()
+    buffer.add(make_message(1))
+    buffer.add(make_message(2))
+    buffer.close()
+    assert stored_ids(session_factory) == [1, 2]
+    assert buffer.add(make_message(3)) is False
@@ -0,0 +1,96 @@
+import pytest
+from app.core.metrics import MetricsRegistry, _merge, _render
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry(None)
+
+
+def test_counter_render(registry):
+    counter = registry.counter("messages_total", "Messages received", ["type"])
+    counter.inc(type="text")
+    counter.inc(2, type="text")
+    counter.inc(type="image")
+    assert registry.render() == (
+        "# HELP messages_total Messages received\n"
+        "# TYPE messages_total counter\n"
+        'messages_total{type="image"} 1\n'
+        'messages_total{type="text"} 3\n'
+    )
+
+
+def test_counter_name_must_end_with_total(registry):
+    with pytest.raises(ValueError):
+        registry.counter("messages", "Messages received")
+
+
+def test_histogram_render(registry):
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=[0.1, 1])
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    assert registry.render() == (
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1"} 2\n'
+        'latency_seconds_bucket{le="+Inf"} 3\n'
+        "latency_seconds_sum 5.55\n"
+        "latency_seconds_count 3\n"
+    )
+
+
+def test_gauge_function_and_label_escaping(registry):
+    gauge = registry.gauge("queue_depth", 'Depth of "queue"', ["name"])
+    gauge.set_function(lambda: {('a"b\\c\n',): 2})
+    assert registry.render() == (
+        '# HELP queue_depth Depth of \\"queue\\"\n'
+        "# TYPE queue_depth gauge\n"
+        'queue_depth{name="a\\"b\\\\c\\n"} 2\n'
+    )
+
+
+def test_labels_must_match(registry):
+    counter = registry.counter("messages_total", "Messages received", ["type"])
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(type="text", room="r")
+
+
+def test_register_returns_existing_metric(registry):
+    counter = registry.counter("messages_total", "Messages received")
+    assert registry.counter("messages_total", "Messages received") is counter
+    with pytest.raises(ValueError):
+        registry.gauge("messages_total", "Messages received")
+
+
+def snapshot(pid: int, registry: MetricsRegistry) -> dict:
+    return {**registry.snapshot(), "pid": pid}
+
+
+def test_merge_sums_counters_and_histograms_across_processes():
+    worker1, worker2 = MetricsRegistry(None), MetricsRegistry(None)
+    for n, worker in enumerate((worker1, worker2), 1):
+        worker.counter("messages_total", "Messages").inc(n)
+        worker.histogram("latency_seconds", "Latency", buckets=[1]).observe(n)
+        worker.gauge("queue_depth", "Depth").set(n * 10)
+
+    merged = _merge([snapshot(1, worker1), snapshot(2, worker2)], gauge_pid=True)
+    text = _render(merged)
+    assert "messages_total 3\n" in text
+    assert 'latency_seconds_bucket{le="1"} 1\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2\n' in text
+    assert "latency_seconds_sum 3\n" in text
+    # 瞬时值按进程分别输出
+    assert 'queue_depth{pid="1"} 10\n' in text
+    assert 'queue_depth{pid="2"} 20\n' in text
+
+
+def test_merge_skips_histograms_with_different_buckets():
+    old, new = MetricsRegistry(None), MetricsRegistry(None)
+    old.histogram("latency_seconds", "Latency", buckets=[1, 2]).observe(1)
+    new.histogram("latency_seconds", "Latency", buckets=[1]).observe(1)
+    merged = _merge([snapshot(1, new), snapshot(2, old)])
+    assert "latency_seconds_count 1\n" in _render(merged)
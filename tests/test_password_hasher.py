@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import bcrypt
+import pytest
+from app.core.security import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=2)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify(hasher):
+    async def run():
+        hashed = await hasher.hash("secret")
+        assert hashed.startswith("$2b$04$")
+        assert await hasher.verify("secret", hashed)
+        assert not await hasher.verify("wrong", hashed)
+
+    asyncio.run(run())
+
+
+def test_verify_legacy_plaintext_without_executor(hasher):
+    async def run():
+        assert await hasher.verify("secret", "secret")
+        assert not await hasher.verify("secret", "other")
+
+    asyncio.run(run())
+    # 明文比较不进入执行器
+    assert hasher._executor is None
+
+
+def test_busy_when_pending_limit_reached(hasher):
+    hashed = bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode()
+    release = threading.Event()
+    blocked = [hasher._submit(release.wait, 5) for _ in range(2)]
+
+    async def run():
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.hash("secret")
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.verify("secret", hashed)
+
+    asyncio.run(run())
+    release.set()
+    for future in blocked:
+        future.result(timeout=5)
+
+    # 任务完成后释放名额
+    async def after():
+        return await hasher.hash("secret")
+
+    assert asyncio.run(after()).startswith("$2b$")
+
+
+def test_needs_rehash(hasher):
+    current = bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode()
+    stronger = PasswordHasher(rounds=5)
+    assert not hasher.needs_rehash(current)
+    assert stronger.needs_rehash(current)
+    assert hasher.needs_rehash("plaintext")
+    assert hasher.needs_rehash("$2b$xx$broken")
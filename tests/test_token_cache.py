@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+import pytest
+from app.core import security
+from app.core.config import CONFIG
+from app.core.security import TokenCache, TokenData
+
+
+def token_data(n: int = 1) -> TokenData:
+    return TokenData(id=n, username=f"user{n}", email=f"user{n}@example.com")
+
+
+def test_hit_until_expiry():
+    cache = TokenCache(maxsize=10)
+    data = token_data()
+    cache.set("t", data, time.time() + 60)
+    assert cache.get("t") is data
+    cache.set("expired", data, time.time() - 1)
+    assert cache.get("expired") is None
+    # 过期的条目在读取时删除
+    assert cache.stats()["size"] == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = TokenCache(maxsize=2)
+    exp = time.time() + 60
+    cache.set("a", token_data(1), exp)
+    cache.set("b", token_data(2), exp)
+    assert cache.get("a") is not None
+    cache.set("c", token_data(3), exp)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_disabled_when_maxsize_is_zero():
+    cache = TokenCache(maxsize=0)
+    cache.set("t", token_data(), time.time() + 60)
+    assert cache.get("t") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_secret_change_clears_cache(monkeypatch):
+    cache = TokenCache(maxsize=10)
+    cache.set("t", token_data(), time.time() + 60)
+    assert cache.get("t") is not None
+    assert cache.stats()["secret_rotations"] == 0
+    monkeypatch.setattr(CONFIG.JWT, "SECRET_KEY", "rotated")
+    # 旧密钥下缓存的 token 不再命中
+    assert cache.get("t") is None
+    assert cache.stats()["secret_rotations"] == 1
+    cache.set("t", token_data(), time.time() + 60)
+    assert cache.get("t") is not None
+    monkeypatch.setattr(CONFIG.JWT, "ALGORITHM", "HS512")
+    assert cache.get("t") is None
+    assert cache.stats()["secret_rotations"] == 2
+
+
+def test_clear():
+    cache = TokenCache(maxsize=10)
+    cache.set("t", token_data(), time.time() + 60)
+    cache.clear()
+    assert cache.get("t") is None
+
+
+def test_verify_access_token_uses_cache(monkeypatch):
+    cache = TokenCache(maxsize=10)
+    monkeypatch.setattr(security, "token_cache", cache)
+    # create_access_token 的 exp 使用本地时间，留足余量避免受时区影响
+    token = security.create_access_token(token_data(), timedelta(days=1))
+    error = ValueError("invalid token")
+    first = security.verify_access_token(token, error)
+    assert first.id == 1
+    assert security.verify_access_token(token, error) is first
+    assert cache.stats()["hits"] == 1
+    with pytest.raises(ValueError):
+        security.verify_access_token(token + "x", error)
+
+
+def test_verify_access_token_rejects_old_secret_after_rotation(monkeypatch):
+    cache = TokenCache(maxsize=10)
+    monkeypatch.setattr(security, "token_cache", cache)
+    token = security.create_access_token(token_data(), timedelta(days=1))
+    error = ValueError("invalid token")
+    assert security.verify_access_token(token, error).id == 1
+    monkeypatch.setattr(CONFIG.JWT, "SECRET_KEY", "rotated")
+    with pytest.raises(ValueError):
+        security.verify_access_token(token, error)
@@ -0,0 +1,29 @@
+import json
+import logging
+import time
+from app.core.config import CONFIG
+from app.core.tracing import Tracer, span
+
+
+def test_every_slow_request_is_logged(caplog, monkeypatch):
+    # 慢请求日志不受 payload 日志采样的影响
+    monkeypatch.setattr(CONFIG.LOG, "PAYLOAD_SAMPLE_RATE", 0.0)
+    tracer = Tracer(slow_threshold_ms=1)
+    with caplog.at_level(logging.WARNING, logger="app.core.tracing"):
+        for _ in range(30):
+            with tracer.trace("GET /slow"):
+                with span("db.query", table="users"):
+                    time.sleep(0.002)
+    records = [r for r in caplog.records if r.getMessage().startswith("Slow request")]
+    assert len(records) == 30
+    tree = json.loads(records[0].args[2])
+    assert tree["name"] == "GET /slow"
+    assert tree["children"][0]["attributes"] == {"table": "users"}
+
+
+def test_fast_request_is_not_logged(caplog):
+    tracer = Tracer(slow_threshold_ms=10_000)
+    with caplog.at_level(logging.WARNING, logger="app.core.tracing"):
+        with tracer.trace("GET /fast"):
+            pass
+    assert not caplog.records
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+
+# app.database.db 在导入时创建 MySQL 引擎，需要 mysqlclient
+pytest.importorskip("MySQLdb")
+
+from app.core import security
+from app.crud.user import UserCRUD
+from app.database import models
+from app.schemas import user_schemas
+from app.service.user import UserService
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    hasher = security.PasswordHasher(rounds=4, workers=1, max_pending=1)
+    monkeypatch.setattr(security, "password_hasher", hasher)
+    yield hasher
+    hasher.shutdown()
+
+
+@pytest.fixture
+def db(session_factory, sqlite_engine):
+    models.Base.metadata.create_all(sqlite_engine, tables=[models.User.__table__])
+    with session_factory() as db:
+        yield db
+
+
+@pytest.fixture
+def user_service():
+    return UserService(UserCRUD(models.User))
+
+
+def new_user(password: str = "secret123") -> user_schemas.UserCreate:
+    return user_schemas.UserCreate(
+        username="alice", email="alice@example.com", password=password, nickname="a"
+    )
+
+
+def test_create_hashes_and_login_verifies(user_service, db, hasher):
+    async def run():
+        user = await user_service.create(db, new_user())
+        assert security.is_password_hash(str(user.password))
+        token = await user_service.login(db, "alice", "secret123")
+        assert token.access_token
+        with pytest.raises(HTTPException) as e:
+            await user_service.login(db, "alice", "wrong")
+        assert e.value.status_code == 401
+
+    asyncio.run(run())
+
+
+def test_login_rehashes_plaintext_password(user_service, db, hasher):
+    db.add(
+        models.User(
+            username="alice",
+            email="alice@example.com",
+            nickname="a",
+            password="legacy-plain",
+            role="user",
+            level=0,
+        )
+    )
+    db.commit()
+
+    asyncio.run(user_service.login(db, "alice", "legacy-plain"))
+    user = user_service.get_by_username(db, "alice")
+    db.refresh(user)
+    assert security.is_password_hash(str(user.password))
+
+
+def test_busy_hasher_maps_to_503(user_service, db, hasher):
+    release = threading.Event()
+    blocked = hasher._submit(release.wait, 5)
+
+    async def run():
+        with pytest.raises(HTTPException) as e:
+            await user_service.create(db, new_user())
+        assert e.value.status_code == 503
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+        blocked.result(timeout=5)
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+import pytest
+
+# app.database.db 在导入时创建 MySQL 引擎，需要 mysqlclient
+pytest.importorskip("MySQLdb")
+
+from app.crud.verification_code import MemoryVerificationCodeStore, VerificationCodeCRUD
+from app.database import models
+from app.schemas.verification_code_schemas import VerificationCodeCreate
+
+EMAIL = "user@example.com"
+
+
+@pytest.fixture
+def crud_store(sqlite_engine, session_factory):
+    models.Base.metadata.create_all(
+        sqlite_engine, tables=[models.VerificationCode.__table__]
+    )
+    with session_factory() as db:
+        yield VerificationCodeCRUD(models.VerificationCode), db
+
+
+@pytest.fixture
+def memory_store():
+    return MemoryVerificationCodeStore(), None
+
+
+@pytest.fixture(params=["crud", "memory"])
+def store(request):
+    return request.getfixturevalue(f"{request.param}_store")
+
+
+def create(store, db, code: str, email: str = EMAIL):
+    return store.create(db, VerificationCodeCreate(email=email, code=code))
+
+
+def age(store, db, record, minutes: int):
+    """把验证码的创建时间提前若干分钟"""
+    created_at = record.created_at - timedelta(minutes=minutes)
+    if isinstance(store, MemoryVerificationCodeStore):
+        records = store._codes[record.email]
+        records[records.index(record)] = record._replace(created_at=created_at)
+    else:
+        record.created_at = created_at
+        db.commit()
+
+
+def valid_since() -> datetime:
+    return datetime.now() - timedelta(minutes=5)
+
+
+def test_consume_once(store):
+    store, db = store
+    create(store, db, "1234")
+    assert store.consume(db, EMAIL, "1234", valid_since())
+    # 同一个验证码只能使用一次
+    assert not store.consume(db, EMAIL, "1234", valid_since())
+
+
+def test_consume_rejects_wrong_code_and_email(store):
+    store, db = store
+    create(store, db, "1234")
+    assert not store.consume(db, EMAIL, "0000", valid_since())
+    assert not store.consume(db, "other@example.com", "1234", valid_since())
+    assert store.consume(db, EMAIL, "1234", valid_since())
+
+
+def test_consume_rejects_expired(store):
+    store, db = store
+    record = create(store, db, "1234")
+    age(store, db, record, 10)
+    assert not store.consume(db, EMAIL, "1234", valid_since())
+
+
+def test_get_latest(store):
+    store, db = store
+    first = create(store, db, "1111")
+    age(store, db, first, 1)
+    create(store, db, "2222")
+    assert store.get_latest(db, EMAIL).code == "2222"
+    assert store.get_latest(db, "other@example.com") is None
+
+
+def test_purge_removes_expired_and_used(store):
+    store, db = store
+    expired = create(store, db, "1111")
+    age(store, db, expired, 10)
+    create(store, db, "2222")
+    create(store, db, "3333", email="other@example.com")
+    assert store.consume(db, "other@example.com", "3333", valid_since())
+
+    # 内存存储在使用验证码时已经删除了记录
+    used = 0 if isinstance(store, MemoryVerificationCodeStore) else 1
+    assert store.purge(db, valid_since()) == 1 + used
+    assert store.get_latest(db, EMAIL).code == "2222"
+    assert store.get_latest(db, "other@example.com") is None
+    assert store.consume(db, EMAIL, "2222", valid_since())
+    assert store.purge(db, valid_since()) == used
+    assert store.get_latest(db, EMAIL) is None
+
+
+def test_crud_purge_in_batches(crud_store):
+    store, db = crud_store
+    records = [create(store, db, f"{n:04d}") for n in range(7)]
+    for record in records:
+        age(store, db, record, 10)
+    assert store.purge(db, valid_since(), batch_size=3) == 7
+    assert store.get_latest(db, EMAIL) is None